@@ -1,89 +1,241 @@
-import json
+import logging
+import os
 import sys
+import threading
 import webbrowser
+from datetime import datetime
+from typing import Any, Callable
 
-from PySide6.QtCore import QEvent
+from PySide6.QtCore import QEvent, QTimer, Signal
 from PySide6.QtGui import QIcon
 from PySide6.QtNetwork import QLocalServer
 from PySide6.QtWidgets import (
     QApplication,
+    QDialog,
     QFrame,
     QHBoxLayout,
     QInputDialog,
     QLabel,
     QMessageBox,
+    QProgressDialog,
     QPushButton,
     QVBoxLayout,
     QWidget,
 )
 
 from config import (
+    APP_LOG_PATH,
     APP_NAME,
     APP_VERSION,
     DISCORD_DIR,
     DISCORD_DLLS_DIR,
     DISCORD_PROXY_CONFIG,
     DISCORD_PROXY_DLLS,
+    ENDPOINT_REFRESH_INTERVAL,
+    GITHUB_API_LATEST_RELEASE,
+    HEALTH_CHECK_COOLDOWN,
+    HEALTH_CHECK_INTERVAL,
+    HEALTH_CHECK_LATENCY_THRESHOLD,
+    HEALTH_CHECK_URL,
     ICON_PATH,
+    LOG_BUFFER_LINES,
     PROXY_IP_ADDR,
     PROXY_PORT,
-    SUBSCRIPTION_PATH,
+    STATS_HISTORY,
+    STATS_INTERVAL,
     TUN_CONFIG_PATH,
+    TUN_CONTROLLER_PORT,
+    TUN_HELPER_ENABLED,
+    TUN_HELPER_DIR,
+    TUN_HELPER_LOG_PATH,
+    TUN_HELPER_PIPE,
+    TUN_HELPER_TASK,
+    TUN_HOME_DIR,
     TUN_LOG_PATH,
     TUN_PATH,
+    UPDATE_CACHE_PATH,
+    UPDATE_CHECK_INTERVAL,
+    UPDATE_CHECK_TIMEOUT,
     USER_AGENT,
-    XRAY_CONFIG_PATH,
-    XRAY_CONFIGS_PATH,
-    XRAY_LOG_DIR,
+    XRAY_LOG_PATH,
+    XRAY_METRICS_PORT,
     XRAY_PATH,
 )
-from core.config import ConfigManager
+from core.config import POOL_STRATEGIES, ConfigManager, ImportCancelledError, Subscription, SubscriptionUpdate
 from core.discord_proxy import DiscordProxyManager
+from core.dns import DnsStats
+from core.health import HealthMonitor
+from core.latency import LatencyResult, LatencyTester
+from core.logs import LogPipeline
+from core.outbound import differs_only_in_proxy
+from core.scheduler import RefreshScheduler
+from core.stats import StatsCollector, TrafficSample
+from core.supervisor import RestartPolicy
+from core.store import ServerInfo
 from core.system_proxy import SystemProxyManager
 from core.tun import TunManager
-from core.xray import XrayManager
+from core.tun_helper import TunHelperClient, run_helper, secure_directory, session_pipe_name
+from core.url_test import UrlTester
+from ui.log_viewer import LogViewer
+from ui.server_picker import ServerPicker
+from ui.traffic_graph import TrafficGraph
 from ui.tray import Tray
+from utils.bootstrap import create_config_manager, create_log, create_xray_manager, setup_logging
+from utils.format import format_bytes
 from utils.i18n import get_current_language, tr
-from utils.ipc import pass_to_main, start_server
-from utils.update import get_latest_version, is_newer_version
+from utils.ipc import IpcServer, pass_to_main, start_server
+from utils.startup import startup_profile
+from utils.update import UpdateChecker, is_newer_version
+from utils.worker import run_in_background
+
+
+def create_tun_helper() -> TunHelperClient | None:
+    if not TUN_HELPER_ENABLED or not getattr(sys, "frozen", False):
+        return None
+
+    return TunHelperClient(
+        session_pipe_name(TUN_HELPER_PIPE),
+        TUN_HELPER_TASK,
+        [sys.executable, "--tun-helper"],
+        [os.path.dirname(TUN_PATH)],
+    )
 
 
 class XrayGUI(QWidget):
-    def __init__(self, server: QLocalServer) -> None:
+    failover_requested = Signal(str)
+    core_exited = Signal(str, object)
+    update_available = Signal(str, str)
+    subscription_fetched = Signal(object)
+
+    def __init__(self, server: QLocalServer, app_log: LogPipeline) -> None:
         super().__init__()
         self.icon = QIcon(ICON_PATH)
 
         self.setWindowIcon(self.icon)
         self.setWindowTitle(APP_NAME)
         self.setFixedWidth(242 if get_current_language() == "ru" else 220)
-        self.setFixedHeight(266)
-
-        self.xray_manager = XrayManager(XRAY_PATH, XRAY_CONFIG_PATH, XRAY_LOG_DIR)
-        self.config_manager = ConfigManager(
-            USER_AGENT, SUBSCRIPTION_PATH, XRAY_CONFIGS_PATH, XRAY_CONFIG_PATH, TUN_CONFIG_PATH
+        self.setFixedHeight(466)
+
+        self.logs: dict[str, LogPipeline] = {
+            "Xray": create_log("xray", XRAY_LOG_PATH),
+            "TUN": create_log("tun", TUN_LOG_PATH),
+            "XrayGUI": app_log,
+        }
+        self.log_viewer: LogViewer | None = None
+        self.xray_manager = create_xray_manager(self.logs["Xray"])
+        self.config_manager = create_config_manager()
+        self._import_cancel_event: threading.Event | None = None
+        self._import_progress: QProgressDialog | None = None
+        self._import_messages: tuple[str | None, str | None] = (None, None)
+        self._import_update = SubscriptionUpdate()
+        self._import_errors: dict[str, str] = {}
+        self.subscription_fetched.connect(self._on_subscription_fetched)
+        self.refresh_scheduler = RefreshScheduler()
+        self.stats_collector = StatsCollector(f"{PROXY_IP_ADDR}:{XRAY_METRICS_PORT}", STATS_HISTORY)
+        self.stats_timer = QTimer(self)
+        self.stats_timer.setInterval(STATS_INTERVAL * 1000)
+        self.stats_timer.timeout.connect(self._poll_stats)
+        self._stats_pending: bool = False
+        self._subscription_text: str = ""
+        self._traffic_text: str = ""
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.timeout.connect(self._refresh_subscription)
+        self.endpoint_timer = QTimer(self)
+        self.endpoint_timer.setInterval(ENDPOINT_REFRESH_INTERVAL * 1000)
+        self.endpoint_timer.timeout.connect(self._refresh_endpoints)
+        self.update_checker = UpdateChecker(
+            GITHUB_API_LATEST_RELEASE, UPDATE_CACHE_PATH, UPDATE_CHECK_INTERVAL, UPDATE_CHECK_TIMEOUT, USER_AGENT
+        )
+        self.update_available.connect(self._prompt_update)
+        self.latency_tester = LatencyTester()
+        self.url_tester = UrlTester(XRAY_PATH, url=HEALTH_CHECK_URL)
+        self.latencies: dict[str, LatencyResult] = {}
+        self._latency_waiters: list[Callable[[dict[str, LatencyResult] | Exception], None]] = []
+        self.health_monitor = HealthMonitor(
+            PROXY_IP_ADDR,
+            PROXY_PORT,
+            self._url_test_all,
+            lambda: self.config_manager.servers,
+            lambda: self.config_manager.current_id,
+            lambda server_id, reason: self.failover_requested.emit(server_id),
+            url=HEALTH_CHECK_URL,
+            interval=HEALTH_CHECK_INTERVAL,
+            latency_threshold=HEALTH_CHECK_LATENCY_THRESHOLD,
+            cooldown=HEALTH_CHECK_COOLDOWN,
+        )
+        self.failover_requested.connect(self._select_server)
+        self.restart_policies = {"xray": RestartPolicy(), "tun": RestartPolicy()}
+        self.core_exited.connect(self._on_core_exited)
+        self.xray_manager.on_exit = lambda returncode: self.core_exited.emit("xray", returncode)
+        self.dns_stats = DnsStats()
+        self.xray_manager.on_line = self._on_xray_line
+        self.tun_manager = TunManager(
+            TUN_PATH,
+            TUN_CONFIG_PATH,
+            self.logs["TUN"],
+            create_tun_helper(),
+            f"{PROXY_IP_ADDR}:{TUN_CONTROLLER_PORT}",
+            TUN_HOME_DIR,
+            self.config_manager.tun_builder,
         )
-        self.tun_manager = TunManager(TUN_PATH, TUN_CONFIG_PATH, TUN_LOG_PATH)
+        self.tun_manager.on_exit = lambda returncode: self.core_exited.emit("tun", returncode)
         self.tun_enabled: bool = self.tun_manager.is_running()
         self.system_proxy_manager = SystemProxyManager(PROXY_IP_ADDR, PROXY_PORT)
         self.discord_proxy_manager = DiscordProxyManager(
             DISCORD_DIR, DISCORD_DLLS_DIR, DISCORD_PROXY_DLLS, DISCORD_PROXY_CONFIG, PROXY_IP_ADDR, PROXY_PORT
         )
         self.tray = Tray(self, self.icon)
+        startup_profile.mark("managers")
 
         self._setup_ui()
+        startup_profile.mark("ui")
 
         self._update_status_info()
         self._update_server_info()
         self._update_tun_info()
         self._update_system_proxy_info()
-        self._update_discord_proxy_info()
+        self._update_discord_proxy_info(False)
+        self._update_subscription_info()
+        startup_profile.mark("state")
+
+        if self.config_manager.subscription_urls:
+            self._schedule_refresh(self._next_refresh_delay())
 
         if self.config_manager.current_remark and not self.xray_manager.is_running():
             self.toggle_xray()
-
+        startup_profile.mark("xray")
+
+        self.ipc_commands: dict[str, Callable[[dict[str, Any], Callable[[Any], None], Callable[[str], None]], None]] = {
+            "open": self._ipc_open,
+            "show": self._ipc_show,
+            "status": self._ipc_status,
+            "servers": self._ipc_servers,
+            "start": self._ipc_start,
+            "stop": self._ipc_stop,
+            "select-server": self._ipc_select_server,
+            "toggle-tun": self._ipc_toggle_tun,
+            "tun-status": self._ipc_tun_status,
+            "latency-test": self._ipc_latency_test,
+            "update": self._ipc_update,
+            "subscriptions": self._ipc_subscriptions,
+            "remove-subscription": self._ipc_remove_subscription,
+            "tuning": self._ipc_tuning,
+            "set-tuning": self._ipc_set_tuning,
+            "dns-stats": self._ipc_dns_stats,
+            "routes": self._ipc_routes,
+            "update-routes": self._ipc_update_routes,
+        }
+        self.ipc_server = IpcServer(server, self._on_ipc_request, self)
+        QTimer.singleShot(0, self._deferred_init)
+
+    def _deferred_init(self) -> None:
+        startup_profile.finish()
+        run_in_background(self.discord_proxy_manager.is_enabled, on_finished=self._update_discord_proxy_info)
+        run_in_background(ConfigManager.get_hwid_headers)
         self._check_updates()
-
-        server.newConnection.connect(self._on_ipc)
+        self.endpoint_timer.start()
+        self._refresh_endpoints()
 
     def _setup_ui(self) -> None:
         status_layout = QHBoxLayout()
@@ -93,8 +245,15 @@ class XrayGUI(QWidget):
         status_layout.addStretch(1)
         status_layout.addWidget(self.server_label)
 
+        self.subscription_label = QLabel()
+        self.traffic_graph = TrafficGraph(STATS_HISTORY)
+        self.traffic_label = QLabel()
+
         buttons_layout = QVBoxLayout()
         buttons_layout.addLayout(status_layout)
+        buttons_layout.addWidget(self.subscription_label)
+        buttons_layout.addWidget(self.traffic_graph)
+        buttons_layout.addWidget(self.traffic_label)
 
         self.toggle_xray_button = QPushButton()
         self.toggle_xray_button.clicked.connect(self.toggle_xray)
@@ -104,6 +263,18 @@ class XrayGUI(QWidget):
         self.select_server_button.clicked.connect(self.select_server)
         buttons_layout.addWidget(self.select_server_button)
 
+        self.select_pool_button = QPushButton(tr("Select server pool"))
+        self.select_pool_button.clicked.connect(self.select_pool)
+        buttons_layout.addWidget(self.select_pool_button)
+
+        self.test_latency_button = QPushButton(tr("Test latency"))
+        self.test_latency_button.clicked.connect(self.test_latency)
+        buttons_layout.addWidget(self.test_latency_button)
+
+        self.url_test_button = QPushButton(tr("URL test"))
+        self.url_test_button.clicked.connect(self.url_test)
+        buttons_layout.addWidget(self.url_test_button)
+
         separator1 = QFrame()
         separator1.setFrameShape(QFrame.HLine)
         separator1.setFrameShadow(QFrame.Sunken)
@@ -134,12 +305,19 @@ class XrayGUI(QWidget):
         update_subscription_button.clicked.connect(self.update_subscription)
         buttons_layout.addWidget(update_subscription_button)
 
+        remove_subscription_button = QPushButton(tr("Remove subscription"))
+        remove_subscription_button.clicked.connect(self.remove_subscription)
+        buttons_layout.addWidget(remove_subscription_button)
+
         self.setLayout(buttons_layout)
 
         self.tray.toggle_xray_action.triggered.connect(self.toggle_xray)
+        self.tray.test_latency_action.triggered.connect(self.test_latency)
+        self.tray.url_test_action.triggered.connect(self.url_test)
         self.tray.toggle_tun_action.triggered.connect(self.toggle_tun)
         self.tray.toggle_system_proxy_action.triggered.connect(self.toggle_system_proxy)
         self.tray.toggle_discord_proxy_action.triggered.connect(self.toggle_discord_proxy)
+        self.tray.show_logs_action.triggered.connect(self.show_logs)
 
     def display_message(self, title: str, message: str) -> None:
         QMessageBox.information(self, title, message)
@@ -148,47 +326,146 @@ class XrayGUI(QWidget):
         QMessageBox.critical(self, title, message)
 
     def _check_updates(self) -> None:
-        try:
-            latest_version, download_url = get_latest_version()
-            if latest_version and is_newer_version(APP_VERSION, latest_version):
-                reply = QMessageBox.question(
-                    self,
-                    tr("Update available"),
-                    tr(
-                        "A new version {version} is available.\nWould you like to download it now?",
-                        version=latest_version,
-                    ),
-                    QMessageBox.Yes | QMessageBox.No,
-                )
-                if reply == QMessageBox.Yes:
-                    webbrowser.open(download_url)
-        except Exception:
-            pass
-
-    def _on_ipc(self) -> None:
+        run_in_background(self.update_checker.check, on_finished=self._on_update_checked)
+
+    def _on_update_checked(self, result: tuple[str | None, str]) -> None:
+        latest_version, download_url = result
+        if latest_version and is_newer_version(APP_VERSION, latest_version):
+            self.update_available.emit(latest_version, download_url)
+
+    def _prompt_update(self, latest_version: str, download_url: str) -> None:
+        reply = QMessageBox.question(
+            self,
+            tr("Update available"),
+            tr(
+                "A new version {version} is available.\nWould you like to download it now?",
+                version=latest_version,
+            ),
+            QMessageBox.Yes | QMessageBox.No,
+        )
+        if reply == QMessageBox.Yes:
+            webbrowser.open(download_url)
+
+    def _on_ipc_request(
+        self, command: str, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]
+    ) -> None:
+        handler = self.ipc_commands.get(command)
+        if handler is None:
+            fail(f"Unknown command: {command}")
+            return
+        handler(args, respond, fail)
+
+    def _ipc_open(self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]) -> None:
+        respond(None)
         self.show()
-        socket = self.sender().nextPendingConnection()
-        if socket and socket.waitForReadyRead(50):
-            try:
-                args = json.loads(bytes(socket.readAll()).decode("utf-8"))
-            except json.JSONDecodeError:
-                args = []
+        for arg in args.get("argv", []):
+            if isinstance(arg, str) and arg.startswith("happ://add/"):
+                self.import_subscription(arg.removeprefix("happ://add/"))
 
-            for arg in args:
-                if arg.startswith("happ://add/"):
-                    self.import_subscription(arg.removeprefix("happ://add/"))
-        socket.close()
+    def _ipc_show(self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]) -> None:
+        self.show()
+        respond(None)
+
+    def _status(self) -> dict[str, Any]:
+        return {
+            "running": self.xray_manager.is_running(),
+            "server_id": self.config_manager.current_id,
+            "server": self.config_manager.current_remark,
+            "pool": self.config_manager.current_pool,
+            "tun": self.tun_enabled,
+            "tun_running": self.tun_manager.is_running(),
+            "system_proxy": self.system_proxy_manager.server_set(),
+            "servers": self.config_manager.store.count(),
+        }
+
+    def _ipc_status(self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]) -> None:
+        respond(self._status())
+
+    def _ipc_servers(self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]) -> None:
+        respond(
+            [
+                {
+                    "id": server.id,
+                    "remark": server.remark,
+                    "group": server.group,
+                    "latency": self.latencies[server.id].ms if server.id in self.latencies else None,
+                }
+                for server in self.config_manager.servers
+            ]
+        )
+
+    def _ipc_start(self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]) -> None:
+        error = self._start_xray()
+        if error:
+            fail(error)
+        else:
+            respond(self._status())
+
+    def _ipc_stop(self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]) -> None:
+        self._stop_xray()
+        respond(self._status())
+
+    def _ipc_select_server(
+        self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]
+    ) -> None:
+        server_id = args.get("id")
+        if not server_id and args.get("remark"):
+            matches = self.config_manager.store.find_by_remark(args["remark"])
+            server_id = matches[0].id if matches else None
+        if not server_id or self.config_manager.store.info(server_id) is None:
+            fail("Server not found")
+            return
+
+        self._select_server(server_id)
+        respond(self._status())
+
+    def _ipc_toggle_tun(
+        self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]
+    ) -> None:
+        error = self._set_tun_enabled(bool(args.get("enabled", not self.tun_enabled)))
+        if error:
+            fail(error)
+        else:
+            respond(self._status())
+
+    def _ipc_tun_status(
+        self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]
+    ) -> None:
+        respond(self.tun_manager.status())
+
+    def _ipc_latency_test(
+        self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]
+    ) -> None:
+        if not self.config_manager.servers:
+            fail("Import a subscription first")
+            return
+
+        def reply(result: dict[str, LatencyResult] | Exception) -> None:
+            if isinstance(result, Exception):
+                fail(str(result))
+            else:
+                respond({server_id: latency.ms for server_id, latency in result.items()})
+
+        self._latency_waiters.append(reply)
+        self._run_latency_test(self._url_test_all if args.get("url") else self.latency_tester.test_all)
 
     def _update_status_info(self) -> None:
         running = self.xray_manager.is_running()
         self.status_label.setText(f"{tr('Status')}: {tr('Running') if running else tr('Stopped')}")
         self.toggle_xray_button.setText(f"{tr('Stop') if running else tr('Start')} VPN")
         self.tray.update_xray_action(running)
+        self._update_stats_polling()
 
     def _update_server_info(self) -> None:
         current_server = self.config_manager.current_remark
         self.server_label.setText(f"{tr('Server')}: {tr('Not selected') if not current_server else current_server}")
-        self.tray.update_server_menu(self.config_manager.xray_configs, current_server)
+        self.tray.update_server_menu(
+            self.config_manager.servers,
+            self.config_manager.current_id,
+            self.latencies,
+            self.config_manager.store.favorites(),
+            self.config_manager.store.recent(),
+        )
 
     def _update_tun_info(self) -> None:
         self.toggle_tun_button.setText(f"{tr('Disable') if self.tun_enabled else tr('Enable')} TUN")
@@ -199,69 +476,329 @@ class XrayGUI(QWidget):
         self.toggle_system_proxy_button.setText(f"{tr('Disable') if enabled else tr('Enable')} {tr('system proxy')}")
         self.tray.update_system_proxy_action(enabled)
 
-    def _update_discord_proxy_info(self) -> None:
-        enabled = self.discord_proxy_manager.is_enabled()
+    def _update_discord_proxy_info(self, enabled: bool | None = None) -> None:
+        if enabled is None:
+            enabled = self.discord_proxy_manager.is_enabled()
         self.toggle_discord_proxy_button.setText(f"{tr('Disable') if enabled else tr('Enable')} {tr('Discord proxy')}")
         self.tray.update_discord_proxy_action(enabled)
 
+    def _ipc_update(self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]) -> None:
+        urls = [args["url"]] if args.get("url") else self.config_manager.subscription_urls
+        if not urls:
+            fail("Import a subscription first")
+            return
+        respond({"started": self._start_import(list(urls))})
+
+    def _ipc_subscriptions(
+        self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]
+    ) -> None:
+        respond(self.config_manager.subscription_info())
+
+    def _ipc_remove_subscription(
+        self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]
+    ) -> None:
+        if not self._remove_subscription(str(args.get("url", ""))):
+            fail("Unknown subscription")
+            return
+        respond(None)
+
+    def _ipc_tuning(self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]) -> None:
+        respond(self.config_manager.tuning_info())
+
+    def _ipc_set_tuning(
+        self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]
+    ) -> None:
+        old_config = self.config_manager.read_xray_config()
+        try:
+            self.config_manager.set_tuning(args.get("profile"), args.get("server"), args.get("group"))
+        except ValueError as e:
+            fail(str(e))
+            return
+
+        self._apply_xray_config(old_config)
+        respond(self.config_manager.tuning_info())
+
+    def _ipc_dns_stats(self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]) -> None:
+        if args.get("reset"):
+            self.dns_stats.reset()
+        if args.get("collect") is not None:
+            old_config = self.config_manager.read_xray_config()
+            if self.config_manager.set_dns_log(bool(args["collect"])):
+                self._apply_xray_config(old_config)
+        respond({**self.dns_stats.snapshot(), "collecting": self.config_manager.dns_log})
+
+    def _ipc_routes(self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]) -> None:
+        respond(self.config_manager.route_info())
+
+    def _ipc_update_routes(
+        self, args: dict[str, Any], respond: Callable[[Any], None], fail: Callable[[str], None]
+    ) -> None:
+        old_config = self.config_manager.read_xray_config()
+        try:
+            self.config_manager.update_routes(
+                str(args.get("target")), list(args.get("add", [])), list(args.get("remove", []))
+            )
+        except ValueError as e:
+            fail(str(e))
+            return
+
+        self._apply_xray_config(old_config)
+        respond(self.config_manager.route_info())
+
+    def _on_xray_line(self, line: str) -> None:
+        self.dns_stats.observe(line)
+        if self.config_manager.routes is not None:
+            self.config_manager.routes.observe(line)
+
+    def _stop_xray(self) -> None:
+        self.health_monitor.stop()
+        self.xray_manager.stop()
+        self.tun_manager.stop()
+        self.system_proxy_manager.set_enable(False)
+
+        self._update_status_info()
+        self._update_tun_info()
+        self._update_system_proxy_info()
+
+    def _start_xray(self) -> str | None:
+        if self.xray_manager.is_running():
+            return None
+        if not self.config_manager.current_remark:
+            return tr("Select a server first")
+        if not self.xray_manager.start():
+            return tr("Failed to start VPN")
+
+        error = None
+        self.restart_policies["xray"].reset()
+        self.restart_policies["tun"].reset()
+        if self.tun_enabled:
+            if not self.tun_manager.start():
+                self.tun_enabled = False
+                error = tr("Failed to start TUN")
+
+        if self.system_proxy_manager.server_set():
+            self.system_proxy_manager.set_enable(True)
+
+        self._update_health_monitor()
+        self._update_status_info()
+        self._update_tun_info()
+        self._update_system_proxy_info()
+        return error
+
     def toggle_xray(self) -> None:
         if self.xray_manager.is_running():
-            self.xray_manager.stop()
-            self.tun_manager.stop()
+            self._stop_xray()
+            return
+
+        error = self._start_xray()
+        if error:
+            self.display_error(tr("Error"), error)
+
+    def _on_core_exited(self, name: str, returncode: int | None) -> None:
+        logging.warning("%s exited unexpectedly with code %s", name, returncode)
+
+        if name == "xray":
+            output = self.xray_manager.output_tail()
+            self.health_monitor.stop()
             self.system_proxy_manager.set_enable(False)
+            self._update_status_info()
+            self._update_system_proxy_info()
         else:
-            if not self.config_manager.current_remark:
-                self.display_error(tr("Error"), tr("Select a server first"))
+            output = self.tun_manager.output_tail()
+            if not self.tun_enabled or not self.xray_manager.is_running():
                 return
 
+        delay = self.restart_policies[name].record_crash()
+        if delay is not None:
+            logging.info("Restarting %s in %.0f s", name, delay)
+            QTimer.singleShot(int(delay * 1000), lambda: self._restart_core(name))
+            return
+
+        if name == "xray":
+            self.tun_manager.stop()
+        else:
+            self.tun_enabled = False
+            self._update_tun_info()
+
+        self.display_error(
+            tr("Error"),
+            tr(
+                "{name} keeps crashing and was not restarted.\n\n{output}",
+                name="VPN" if name == "xray" else "TUN",
+                output="\n".join(output[-20:]),
+            ),
+        )
+
+    def _restart_core(self, name: str) -> None:
+        if name == "xray":
+            if self.xray_manager.is_running() or not self.config_manager.current_remark:
+                return
             if not self.xray_manager.start():
-                self.display_error(tr("Error"), tr("Failed to start VPN"))
+                self._on_core_exited(name, None)
                 return
 
-            if self.tun_enabled:
-                if not self.tun_manager.start():
-                    self.tun_enabled = False
-                    self.display_error(tr("Error"), tr("Failed to start TUN"))
-
             if self.system_proxy_manager.server_set():
                 self.system_proxy_manager.set_enable(True)
+            self._update_health_monitor()
+            self._update_status_info()
+            self._update_system_proxy_info()
+        else:
+            if self.tun_manager.is_running() or not self.tun_enabled or not self.xray_manager.is_running():
+                return
+            if not self.tun_manager.start():
+                self._on_core_exited(name, None)
 
-        self._update_status_info()
-        self._update_tun_info()
-        self._update_system_proxy_info()
+    def _update_health_monitor(self) -> None:
+        if self.xray_manager.is_running() and not self.config_manager.current_pool:
+            self.health_monitor.start()
+        else:
+            self.health_monitor.stop()
+
+    def _restart_xray(self) -> None:
+        self.stats_collector.reset()
+        if not self.xray_manager.restart():
+            self.health_monitor.stop()
+            self.tun_manager.stop()
+            self.system_proxy_manager.set_enable(False)
+            self.display_error(tr("Error"), tr("Failed to start VPN"))
+            self._update_status_info()
+            self._update_tun_info()
+            self._update_system_proxy_info()
+            return
+
+        self._update_health_monitor()
+
+    def _apply_xray_config(self, old_config: dict[str, Any] | None) -> None:
+        if not self.xray_manager.is_running():
+            return
+
+        new_config = self.config_manager.read_xray_config()
+        if old_config and new_config and differs_only_in_proxy(old_config, new_config):
+            if self.xray_manager.switch_outbound(new_config):
+                logging.info("Switched outbound to %r without restart", self.config_manager.current_remark)
+                self.health_monitor.reset()
+                self._update_health_monitor()
+                return
+
+        logging.info("Restarting xray to apply %r", self.config_manager.current_remark)
+        self._restart_xray()
 
-    def _select_server(self, remark: str) -> None:
-        if not self.config_manager.select_config(remark):
+    def _select_server(self, server_id: str) -> None:
+        old_config = self.config_manager.read_xray_config()
+        if not self.config_manager.select_config(server_id):
             return
 
         self._update_server_info()
-        if self.xray_manager.is_running():
-            self.toggle_xray()
-            self.toggle_xray()
+        self._apply_xray_config(old_config)
+
+    def select_pool(self) -> None:
+        if not self.config_manager.servers:
+            self.display_error(tr("Error"), tr("Import a subscription first"))
+            return
+
+        query, ok = QInputDialog.getText(
+            self,
+            tr("Select server pool"),
+            tr("Enter a remark prefix, a #tag or a comma-separated list of servers:"),
+        )
+        if not ok or not query:
+            return
+
+        server_ids = self.config_manager.find_pool(query)
+        if not server_ids:
+            self.display_error(tr("Error"), tr("No servers match {query}", query=query))
+            return
+
+        strategy, ok = QInputDialog.getItem(
+            self, tr("Select server pool"), tr("Choose a balancing strategy:"), POOL_STRATEGIES, 0, False
+        )
+        if not ok or not strategy:
+            return
+
+        old_config = self.config_manager.read_xray_config()
+        if not self.config_manager.select_pool(server_ids, strategy):
+            return
+
+        self._update_server_info()
+        self._apply_xray_config(old_config)
 
     def select_server(self) -> None:
-        if not self.config_manager.xray_configs:
+        servers = self.config_manager.servers
+        if not servers:
             self.display_error(tr("Error"), tr("Import a subscription first"))
             return
 
-        remarks = [server.get("remarks", "No remark") for server in self.config_manager.xray_configs]
-        remark, ok = QInputDialog.getItem(self, tr("Select server"), tr("Choose a server:"), remarks, 0, False)
-        if not ok or not remark:
+        favorites = self.config_manager.store.favorites()
+        picker = ServerPicker(self, servers, self.latencies, favorites, self.config_manager.current_id)
+        accepted = picker.exec() == QDialog.Accepted
+
+        for server_id in picker.favorites.symmetric_difference(favorites):
+            self.config_manager.store.set_favorite(server_id, server_id in picker.favorites)
+
+        server_id = picker.selected_id()
+        if accepted and server_id:
+            self._select_server(server_id)
+        else:
+            self._update_server_info()
+
+    def _set_latency_tests_enabled(self, enabled: bool) -> None:
+        self.test_latency_button.setEnabled(enabled)
+        self.url_test_button.setEnabled(enabled)
+        self.tray.test_latency_action.setEnabled(enabled)
+        self.tray.url_test_action.setEnabled(enabled)
+
+    def _run_latency_test(self, test_all: Callable[[list[ServerInfo]], dict[str, LatencyResult]]) -> None:
+        if not self.config_manager.servers:
+            self.display_error(tr("Error"), tr("Import a subscription first"))
+            return
+        if not self.test_latency_button.isEnabled():
             return
 
-        self._select_server(remark)
+        self._set_latency_tests_enabled(False)
+        run_in_background(
+            test_all,
+            self.config_manager.servers,
+            on_finished=self._on_latency_tested,
+            on_failed=self._on_latency_tested,
+        )
 
-    def toggle_tun(self) -> None:
-        if self.tun_enabled:
-            self.tun_enabled = False
+    def test_latency(self) -> None:
+        self._run_latency_test(self.latency_tester.test_all)
+
+    def _url_test_all(self, servers: list[ServerInfo]) -> dict[str, LatencyResult]:
+        return self.url_tester.test_all(self.config_manager.store.get_many([server.id for server in servers]))
+
+    def url_test(self) -> None:
+        self._run_latency_test(self._url_test_all)
+
+    def _on_latency_tested(self, result: dict[str, LatencyResult] | Exception) -> None:
+        if isinstance(result, dict):
+            self.latencies = result
+        self._set_latency_tests_enabled(True)
+        self._update_server_info()
+
+        waiters, self._latency_waiters = self._latency_waiters, []
+        for waiter in waiters:
+            waiter(result)
+        if isinstance(result, Exception):
+            logging.error("Latency test failed: %s", result)
+            if not waiters:
+                self.display_error(tr("Error"), tr("Latency test failed: {error}", error=result))
+
+    def _set_tun_enabled(self, enabled: bool) -> str | None:
+        if not enabled:
             self.tun_manager.stop()
-        elif self.xray_manager.is_running():
-            if not self.tun_manager.start():
-                self.display_error(tr("Error"), tr("Failed to start TUN"))
-                return
+        elif self.xray_manager.is_running() and not self.tun_manager.start():
+            return tr("Failed to start TUN")
 
-        self.tun_enabled = True
+        self.tun_enabled = enabled
         self._update_tun_info()
+        return None
+
+    def toggle_tun(self) -> None:
+        error = self._set_tun_enabled(not self.tun_enabled)
+        if error:
+            self.display_error(tr("Error"), error)
 
     def toggle_system_proxy(self) -> None:
         if self.system_proxy_manager.server_set():
@@ -283,36 +820,281 @@ class XrayGUI(QWidget):
 
         self._update_discord_proxy_info()
 
+    def _start_import(
+        self, urls: list[str], success_message: str | None = None, failure_message: str | None = None
+    ) -> bool:
+        if self._import_cancel_event is not None:
+            return False
+
+        self._import_cancel_event = threading.Event()
+        self._import_messages = (success_message, failure_message)
+        self._import_update = SubscriptionUpdate()
+        self._import_errors = {}
+
+        on_progress = None
+        if success_message is not None:
+            self._import_progress = QProgressDialog(tr("Downloading subscription..."), tr("Cancel"), 0, 100, self)
+            self._import_progress.setWindowTitle(APP_NAME)
+            self._import_progress.setMinimumDuration(0)
+            self._import_progress.setAutoClose(False)
+            self._import_progress.setAutoReset(False)
+            self._import_progress.canceled.connect(self._import_cancel_event.set)
+            self._import_progress.show()
+            on_progress = self._import_progress.setValue
+
+        run_in_background(
+            self.config_manager.fetch_configs,
+            urls,
+            self._import_cancel_event,
+            on_progress=on_progress,
+            on_fetch=self.subscription_fetched.emit,
+            on_finished=self._on_import_finished,
+            on_failed=self._on_import_failed,
+        )
+        return True
+
+    def _finish_import(self) -> None:
+        if self._import_progress is not None:
+            self._import_progress.close()
+            self._import_progress.deleteLater()
+            self._import_progress = None
+        self._import_cancel_event = None
+
+    def _on_subscription_fetched(self, subscription: Subscription) -> None:
+        if self._import_cancel_event is None or self._import_cancel_event.is_set():
+            return
+
+        old_config = self.config_manager.read_xray_config()
+        try:
+            update = self.config_manager.commit_configs(subscription)
+        except Exception as e:
+            self._import_errors.update({fetch.url: str(e) for fetch in subscription.fetches})
+            return
+
+        self._import_update.added += update.added
+        self._import_update.removed += update.removed
+        self._import_update.changed += update.changed
+        self._import_update.xray_changed |= update.xray_changed
+        self._import_update.tun_changed |= update.tun_changed
+        self._update_server_info()
+        self._update_subscription_info()
+        self._apply_subscription_update(update, old_config)
+
+    def _on_import_finished(self, subscription: Subscription) -> None:
+        cancelled = self._import_cancel_event.is_set()
+        self._finish_import()
+        if cancelled:
+            return
+
+        success_message, _ = self._import_messages
+        update = self._import_update
+        errors = {**subscription.errors, **self._import_errors}
+        for url, error in errors.items():
+            logging.warning("Subscription %s failed: %s", url, error)
+        if errors:
+            self._schedule_refresh(self.refresh_scheduler.failure_delay())
+        else:
+            self.refresh_scheduler.reset()
+            self._schedule_refresh(self._next_refresh_delay())
+        self._refresh_endpoints()
+
+        if success_message is None:
+            logging.info(
+                "Subscription refreshed: %d added, %d removed, %d changed",
+                len(update.added),
+                len(update.removed),
+                len(update.changed),
+            )
+            return
+
+        message = tr(success_message)
+        if update.added or update.removed or update.changed:
+            message += "\n" + tr(
+                "Added: {added}, removed: {removed}, changed: {changed}",
+                added=str(len(update.added)),
+                removed=str(len(update.removed)),
+                changed=str(len(update.changed)),
+            )
+        elif not update.xray_changed and not update.tun_changed:
+            message += "\n" + tr("No changes")
+        for url, error in errors.items():
+            message += "\n" + tr("Failed to update {url}: {error}", url=url, error=error)
+        self.display_message(tr("Success"), message)
+
+    def _apply_subscription_update(self, update: SubscriptionUpdate, old_config: dict[str, Any] | None) -> None:
+        if not self.xray_manager.is_running():
+            return
+
+        if update.xray_changed:
+            self._apply_xray_config(old_config)
+        if update.tun_changed and self.tun_manager.is_running():
+            if not self.tun_manager.reload():
+                self.tun_enabled = False
+                self.display_error(tr("Error"), tr("Failed to start TUN"))
+                self._update_tun_info()
+
+    def _on_import_failed(self, error: Exception) -> None:
+        self._finish_import()
+        if isinstance(error, ImportCancelledError):
+            return
+
+        _, failure_message = self._import_messages
+        if failure_message is None:
+            delay = self.refresh_scheduler.failure_delay()
+            logging.warning("Subscription refresh failed, retrying in %.0f s: %s", delay, error)
+            self._schedule_refresh(delay)
+            return
+
+        self.display_error(tr("Error"), tr(failure_message, error=error))
+
+    def _refresh_endpoints(self) -> None:
+        run_in_background(self.config_manager.refresh_endpoints, on_finished=self._on_endpoints_refreshed)
+
+    def _on_endpoints_refreshed(self, changed: bool) -> None:
+        if not changed:
+            return
+
+        old_config = self.config_manager.read_xray_config()
+        if self.config_manager.regenerate():
+            logging.info("Server endpoint addresses changed")
+            self._apply_xray_config(old_config)
+
+    def _schedule_refresh(self, delay: float) -> None:
+        self.refresh_timer.start(min(int(delay * 1000), 2**31 - 1))
+
+    def _next_refresh_delay(self) -> float:
+        states = [self.config_manager.subscriptions.get(url, {}) for url in self.config_manager.subscription_urls]
+        return min(
+            self.refresh_scheduler.next_delay(state.get("update_interval"), state.get("updated_at")) for state in states
+        )
+
+    def _refresh_subscription(self) -> None:
+        if not self.config_manager.subscription_urls:
+            return
+
+        states = {url: self.config_manager.subscriptions.get(url, {}) for url in self.config_manager.subscription_urls}
+        urls = [
+            url
+            for url, state in states.items()
+            if self.refresh_scheduler.is_due(state.get("update_interval"), state.get("updated_at"))
+        ]
+        if not urls:
+            self._schedule_refresh(self._next_refresh_delay())
+        elif not self._start_import(urls):
+            self._schedule_refresh(self.refresh_scheduler.retry_interval)
+
+    def _update_subscription_info(self) -> None:
+        userinfo = self.config_manager.userinfo
+        parts = []
+        if "total" in userinfo:
+            used = userinfo.get("upload", 0) + userinfo.get("download", 0)
+            total = tr("unlimited") if userinfo["total"] <= 0 else format_bytes(userinfo["total"])
+            parts.append(f"{format_bytes(used)} / {total}")
+        if userinfo.get("expire", 0) > 0:
+            expire = datetime.fromtimestamp(userinfo["expire"]).strftime("%Y-%m-%d")
+            parts.append(tr("until {date}", date=expire))
+
+        text = ", ".join(parts)
+        self.subscription_label.setText(f"{tr('Traffic')}: {text}" if text else "")
+        self.subscription_label.setVisible(bool(text))
+        self._subscription_text = text
+        self._update_tooltip()
+
+    def _update_tooltip(self) -> None:
+        lines = [APP_NAME, self._subscription_text, self._traffic_text]
+        self.tray.update_tooltip("\n".join(line for line in lines if line))
+
+    def _update_stats_polling(self) -> None:
+        if self.xray_manager.is_running():
+            if not self.stats_timer.isActive():
+                self.stats_collector.reset()
+                self.stats_timer.start()
+            return
+
+        self.stats_timer.stop()
+        self.stats_collector.reset()
+        self.traffic_graph.set_samples([])
+        self.traffic_label.setText("")
+        self._traffic_text = ""
+        self._update_tooltip()
+
+    def _poll_stats(self) -> None:
+        if self._stats_pending or not self.xray_manager.is_running():
+            return
+
+        self._stats_pending = True
+        run_in_background(self.stats_collector.poll, on_finished=self._on_stats, on_failed=self._on_stats_failed)
+
+    def _on_stats(self, sample: TrafficSample) -> None:
+        self._stats_pending = False
+        if not self.stats_timer.isActive():
+            return
+
+        self.traffic_graph.set_samples(list(self.stats_collector.history))
+        self._traffic_text = f"↑ {format_bytes(sample.uplink)}/s  ↓ {format_bytes(sample.downlink)}/s"
+        self.traffic_label.setText(self._traffic_text)
+        self._update_tooltip()
+
+    def _on_stats_failed(self, error: Exception) -> None:
+        self._stats_pending = False
+
     def import_subscription(self, url: str | None = None) -> None:
         if not url:
             url, ok = QInputDialog.getText(self, tr("Import subscription"), tr("Enter subscription URL:"))
             if not ok or not url:
                 return
 
-        try:
-            self.config_manager.import_configs(url)
-        except Exception as e:
-            self.display_error(tr("Error"), tr("Failed to import subscription:\n{error}", error=e))
+        self._start_import([url], "Subscription imported successfully", "Failed to import subscription:\n{error}")
+
+    def update_subscription(self) -> None:
+        if not self.config_manager.subscription_urls:
+            self.display_error(tr("Error"), tr("Import a subscription first"))
             return
 
+        self._start_import(
+            list(self.config_manager.subscription_urls),
+            "Subscription updated successfully",
+            "Failed to update subscription:\n{error}",
+        )
+
+    def _remove_subscription(self, url: str) -> bool:
+        old_config = self.config_manager.read_xray_config()
+        update = self.config_manager.remove_subscription(url)
+        if update is None:
+            return False
+
+        if not self.config_manager.subscription_urls:
+            self.refresh_timer.stop()
         self._update_server_info()
-        self.display_message(tr("Success"), tr("Subscription imported successfully"))
+        self._update_subscription_info()
+        self._apply_subscription_update(update, old_config)
+        return True
 
-    def update_subscription(self) -> None:
-        if not self.config_manager.subscription_url:
+    def remove_subscription(self) -> None:
+        if not self.config_manager.subscription_urls:
             self.display_error(tr("Error"), tr("Import a subscription first"))
             return
 
-        try:
-            self.config_manager.import_configs(self.config_manager.subscription_url)
-        except Exception as e:
-            self.display_error(tr("Error"), tr("Failed to update subscription:\n{error}", error=e))
-            return
+        url, ok = QInputDialog.getItem(
+            self, tr("Remove subscription"), tr("Subscription:"), self.config_manager.subscription_urls, 0, False
+        )
+        if ok and url:
+            self._remove_subscription(url)
 
-        self._update_server_info()
-        self.display_message(tr("Success"), tr("Subscription updated successfully"))
+    def show_logs(self) -> None:
+        if self.log_viewer is None:
+            self.log_viewer = LogViewer(self, self.logs, LOG_BUFFER_LINES)
+        self.log_viewer.show()
+        self.log_viewer.raise_()
+        self.log_viewer.activateWindow()
 
     def _quit(self) -> None:
+        if self.config_manager.routes is not None:
+            try:
+                self.config_manager.routes.save_hits()
+            except OSError as e:
+                logging.warning("Failed to save route hit counts: %s", e)
+        self.health_monitor.stop()
         self.xray_manager.stop()
         self.tun_manager.stop()
         self.system_proxy_manager.set_enable(False)
@@ -342,20 +1124,32 @@ class XrayGUI(QWidget):
 
 
 if __name__ == "__main__":
+    if sys.argv[1:] == ["--tun-helper"]:
+        secure_directory(TUN_HELPER_DIR)
+        setup_logging(create_log("tun_helper", TUN_HELPER_LOG_PATH))
+        sys.exit(run_helper(session_pipe_name(TUN_HELPER_PIPE), TUN_PATH, TUN_HELPER_DIR))
+
     if pass_to_main(sys.argv, APP_NAME):
         sys.exit(0)
+    startup_profile.mark("imports")
+
+    app_log = create_log("app", APP_LOG_PATH)
+    setup_logging(app_log)
+    startup_profile.mark("logging")
 
     app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(False)
 
     server = start_server(APP_NAME)
-    window = XrayGUI(server)
+    startup_profile.mark("qt")
+    window = XrayGUI(server, app_log)
 
     if any(arg.lower() == "/minimized" for arg in sys.argv[1:]):
         window.hide()
         window.tray.update_action_visibility()
     else:
         window.show()
+    startup_profile.mark("window")
 
     for arg in sys.argv[1:]:
         if arg.startswith("happ://add/"):
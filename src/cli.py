@@ -0,0 +1,405 @@
+import argparse
+import json
+import logging
+import random
+import sys
+import threading
+from typing import Any
+
+from config import (
+    APP_LOG_PATH,
+    APP_NAME,
+    DNS_PORT,
+    PROXY_IP_ADDR,
+    PROXY_PORT,
+    TUN_CONFIG_PATH,
+    TUN_HOME_DIR,
+    TUN_LOG_PATH,
+    TUN_PATH,
+    XRAY_LOG_PATH,
+    XRAY_PATH,
+)
+from core.config import ConfigManager
+from core.dns import probe_cache
+from core.latency import LatencyTester
+from core.routes import ROUTE_TARGETS, RouteSettings, benchmark
+from core.url_test import UrlTester, UrlTestError
+from utils.bootstrap import create_config_manager, create_log, create_xray_manager, setup_logging
+from utils.protocol import send_request
+
+logger = logging.getLogger("cli")
+
+
+def print_result(result: Any) -> None:
+    if result is not None:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+def forward(command: str, args: dict[str, Any] | None = None, timeout: float = 5.0) -> int | None:
+    reply = send_request(APP_NAME, command, args, timeout=timeout)
+    if reply is None:
+        return None
+    if not reply.get("ok"):
+        print(f"Error: {reply.get('error')}", file=sys.stderr)
+        return 1
+    print_result(reply.get("result"))
+    return 0
+
+
+def resolve_server(config_manager: ConfigManager, query: str) -> str | None:
+    if config_manager.store.info(query) is not None:
+        return query
+    matches = config_manager.store.find_by_remark(query)
+    if matches:
+        return matches[0].id
+    server_ids = config_manager.find_pool(query)
+    return server_ids[0] if server_ids else None
+
+
+def local_status(config_manager: ConfigManager) -> dict[str, Any]:
+    return {
+        "running": False,
+        "server_id": config_manager.current_id,
+        "server": config_manager.current_remark,
+        "pool": config_manager.current_pool,
+        "servers": config_manager.store.count(),
+    }
+
+
+def cmd_status(args: argparse.Namespace) -> int:
+    code = forward("status")
+    if code is not None:
+        return code
+    print_result(local_status(create_config_manager()))
+    return 0
+
+
+def cmd_servers(args: argparse.Namespace) -> int:
+    config_manager = create_config_manager()
+    servers = config_manager.servers
+    if args.query:
+        server_ids = set(config_manager.find_pool(args.query))
+        servers = [server for server in servers if server.id in server_ids]
+    for server in servers:
+        marker = "*" if server.id == config_manager.current_id else " "
+        print(f"{marker} {server.id}  {server.remark}")
+    return 0
+
+
+def cmd_update(args: argparse.Namespace) -> int:
+    code = forward("update")
+    if code is not None:
+        return code
+
+    config_manager = create_config_manager()
+    if not config_manager.subscription_urls:
+        print("Error: import a subscription first", file=sys.stderr)
+        return 1
+    subscription = config_manager.fetch_configs(list(config_manager.subscription_urls))
+    update = config_manager.commit_configs(subscription)
+    for url, error in subscription.errors.items():
+        print(f"Error: {url}: {error}", file=sys.stderr)
+    print_result({"added": len(update.added), "removed": len(update.removed), "changed": len(update.changed)})
+    return 0
+
+
+def cmd_subscriptions(args: argparse.Namespace) -> int:
+    if args.action != "list" and not args.url:
+        print(f"Error: {args.action} requires a subscription URL", file=sys.stderr)
+        return 1
+
+    if args.action == "add":
+        code = forward("update", {"url": args.url})
+        if code is not None:
+            return code
+        update = create_config_manager().import_configs([args.url])
+        print_result({"added": len(update.added), "removed": len(update.removed), "changed": len(update.changed)})
+        return 0
+
+    if args.action == "remove":
+        code = forward("remove-subscription", {"url": args.url})
+        if code is not None:
+            return code
+        if create_config_manager().remove_subscription(args.url) is None:
+            print(f"Error: unknown subscription {args.url}", file=sys.stderr)
+            return 1
+        return 0
+
+    code = forward("subscriptions")
+    if code is not None:
+        return code
+    print_result(create_config_manager().subscription_info())
+    return 0
+
+
+def cmd_latency(args: argparse.Namespace) -> int:
+    code = forward("latency-test", {"url": args.url}, timeout=120.0)
+    if code is not None:
+        return code
+
+    config_manager = create_config_manager()
+    if args.url:
+        servers = config_manager.servers
+        try:
+            results = UrlTester(XRAY_PATH).test_all(config_manager.store.get_many([server.id for server in servers]))
+        except UrlTestError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    else:
+        results = LatencyTester().test_all(config_manager.servers)
+    print_result({server_id: result.ms for server_id, result in results.items()})
+    return 0
+
+
+def cmd_tuning(args: argparse.Namespace) -> int:
+    if args.action == "list":
+        code = forward("tuning")
+        if code is not None:
+            return code
+        print_result(create_config_manager().tuning_info())
+        return 0
+
+    config_manager = create_config_manager()
+    server_id = None
+    if args.server:
+        server_id = resolve_server(config_manager, args.server)
+        if server_id is None:
+            print(f"Error: no server matches {args.server}", file=sys.stderr)
+            return 1
+
+    if args.action == "set" and not args.profile:
+        print("Error: set requires a profile name", file=sys.stderr)
+        return 1
+    profile = args.profile if args.action == "set" else None
+    code = forward("set-tuning", {"profile": profile, "server": server_id, "group": args.group})
+    if code is not None:
+        return code
+    try:
+        config_manager.set_tuning(profile, server_id, args.group)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print_result(config_manager.tuning_info())
+    return 0
+
+
+def cmd_dns(args: argparse.Namespace) -> int:
+    if args.action == "probe":
+        print_result(probe_cache(args.domains or ["example.com"], (PROXY_IP_ADDR, DNS_PORT)))
+        return 0
+
+    collect = {"start": True, "stop": False}.get(args.action)
+    code = forward("dns-stats", {"reset": args.action == "reset", "collect": collect})
+    if code is not None:
+        return code
+    print(f"Error: {APP_NAME} is not running", file=sys.stderr)
+    return 1
+
+
+def synthetic_routes(count: int) -> RouteSettings:
+    rng = random.Random(count)
+    bases = [f"site{i}.example" for i in range(max(count // 4, 1))]
+    settings = RouteSettings()
+    for i in range(count):
+        base = rng.choice(bases)
+        settings.direct_domains.append(rng.choice([base, f"www.{base}", f"full:cdn{i % 7}.{base}", f"*.{base}"]))
+        settings.proxy_domains.append(f"api{i % 3}.{rng.choice(bases)}")
+        settings.direct_ips.append(f"10.{i // 256 % 256}.{i % 256}.{rng.randrange(256)}")
+        settings.block_ips.append(f"198.51.{i % 256 // 2 * 2}.0/24")
+    return settings
+
+
+def cmd_routes(args: argparse.Namespace) -> int:
+    if args.action == "bench":
+        config_manager = create_config_manager()
+        if args.synthetic:
+            print_result(benchmark(synthetic_routes(args.synthetic)))
+        elif config_manager.routes is not None:
+            print_result(benchmark(config_manager.routes.settings, config_manager.routes.hits))
+        return 0
+
+    if args.action == "list":
+        code = forward("routes")
+        if code is not None:
+            return code
+        print_result(create_config_manager().route_info())
+        return 0
+
+    if not args.target or not args.entries:
+        print(f"Error: {args.action} requires a target and at least one entry", file=sys.stderr)
+        return 1
+    add = args.entries if args.action == "add" else []
+    remove = args.entries if args.action == "remove" else []
+    code = forward("update-routes", {"target": args.target, "add": add, "remove": remove})
+    if code is not None:
+        return code
+    config_manager = create_config_manager()
+    config_manager.update_routes(args.target, add, remove)
+    print_result(config_manager.route_info())
+    return 0
+
+
+def cmd_disconnect(args: argparse.Namespace) -> int:
+    code = forward("stop")
+    if code is not None:
+        return code
+    print(f"Error: {APP_NAME} is not running", file=sys.stderr)
+    return 1
+
+
+def cmd_tun(args: argparse.Namespace) -> int:
+    if args.state == "status":
+        code = forward("tun-status")
+    else:
+        code = forward("toggle-tun", {"enabled": args.state == "on"})
+    if code is not None:
+        return code
+    print(f"Error: {APP_NAME} is not running, use connect --tun", file=sys.stderr)
+    return 1
+
+
+def cmd_connect(args: argparse.Namespace) -> int:
+    if send_request(APP_NAME, "status", timeout=1.0) is not None:
+        if args.server:
+            config_manager = create_config_manager()
+            server_id = resolve_server(config_manager, args.server)
+            if server_id is None:
+                print(f"Error: no server matches {args.server}", file=sys.stderr)
+                return 1
+            code = forward("select-server", {"id": server_id})
+            if code:
+                return code
+        if args.tun:
+            code = forward("toggle-tun", {"enabled": True})
+            if code:
+                return code
+        return forward("start") or 0
+
+    return run_headless(args)
+
+
+def run_headless(args: argparse.Namespace) -> int:
+    setup_logging(create_log("app", APP_LOG_PATH), logging.StreamHandler())
+
+    config_manager = create_config_manager()
+    if args.server:
+        server_id = resolve_server(config_manager, args.server)
+        if server_id is None or not config_manager.select_config(server_id):
+            print(f"Error: no server matches {args.server}", file=sys.stderr)
+            return 1
+    if not config_manager.current_remark:
+        print("Error: select a server first", file=sys.stderr)
+        return 1
+
+    exited = threading.Event()
+    xray_manager = create_xray_manager(create_log("xray", XRAY_LOG_PATH))
+    xray_manager.on_exit = lambda returncode: exited.set()
+    if not xray_manager.start():
+        print("Error: failed to start xray", file=sys.stderr)
+        return 1
+
+    tun_manager = None
+    system_proxy_manager = None
+    server_was_set = False
+    try:
+        if args.tun:
+            from core.tun import TunManager
+
+            tun_manager = TunManager(
+                TUN_PATH,
+                TUN_CONFIG_PATH,
+                create_log("tun", TUN_LOG_PATH),
+                home_dir=TUN_HOME_DIR,
+                builder=config_manager.tun_builder,
+            )
+            if not tun_manager.start():
+                print("Error: failed to start TUN", file=sys.stderr)
+                return 1
+
+        if args.system_proxy:
+            from core.system_proxy import SystemProxyManager
+
+            system_proxy_manager = SystemProxyManager(PROXY_IP_ADDR, PROXY_PORT)
+            server_was_set = system_proxy_manager.server_set()
+            system_proxy_manager.set_server()
+            system_proxy_manager.set_enable(True)
+
+        logger.info("Connected to %r, press Ctrl+C to disconnect", config_manager.current_remark)
+        while not exited.wait(0.5):
+            pass
+        logger.error("xray exited unexpectedly:\n%s", "\n".join(xray_manager.output_tail(20)))
+        return 1
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        if system_proxy_manager is not None:
+            system_proxy_manager.set_enable(False)
+            if not server_was_set:
+                system_proxy_manager.delete_server()
+        if tun_manager is not None:
+            tun_manager.stop()
+        xray_manager.stop()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="xraygui-cli", description=f"Headless control for {APP_NAME}")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    connect = subparsers.add_parser("connect", help="connect, in the foreground unless the GUI is running")
+    connect.add_argument("server", nargs="?", help="server id, remark, remark prefix or #tag")
+    connect.add_argument("--tun", action="store_true", help="also start TUN")
+    connect.add_argument("--system-proxy", action="store_true", help="enable the system proxy while connected")
+    connect.set_defaults(handler=cmd_connect)
+
+    subparsers.add_parser("disconnect", help="stop the running connection").set_defaults(handler=cmd_disconnect)
+    subparsers.add_parser("status", help="show the connection state").set_defaults(handler=cmd_status)
+
+    servers = subparsers.add_parser("servers", help="list servers")
+    servers.add_argument("query", nargs="?", help="remark prefix, #tag or comma-separated list")
+    servers.set_defaults(handler=cmd_servers)
+
+    subparsers.add_parser("update", help="refresh all subscriptions").set_defaults(handler=cmd_update)
+
+    subscriptions = subparsers.add_parser("subscriptions", help="list, add or remove subscriptions")
+    subscriptions.add_argument("action", nargs="?", choices=["list", "add", "remove"], default="list")
+    subscriptions.add_argument("url", nargs="?")
+    subscriptions.set_defaults(handler=cmd_subscriptions)
+
+    latency = subparsers.add_parser("latency", help="test server latency")
+    latency.add_argument("--url", action="store_true", help="measure a real request through each server")
+    latency.set_defaults(handler=cmd_latency)
+
+    tuning = subparsers.add_parser("tuning", help="list tuning profiles or assign one to a server, group or default")
+    tuning.add_argument("action", nargs="?", choices=["list", "set", "clear"], default="list")
+    tuning.add_argument("profile", nargs="?")
+    target = tuning.add_mutually_exclusive_group()
+    target.add_argument("--server", help="server id, remark, remark prefix or #tag")
+    target.add_argument("--group", help="server group, e.g. a flag emoji")
+    tuning.set_defaults(handler=cmd_tuning)
+
+    dns = subparsers.add_parser("dns", help="show, start or stop DNS cache statistics or probe the local resolver")
+    dns.add_argument("action", nargs="?", choices=["stats", "reset", "start", "stop", "probe"], default="stats")
+    dns.add_argument("domains", nargs="*", help="domains to resolve twice when probing")
+    dns.set_defaults(handler=cmd_dns)
+
+    routes = subparsers.add_parser("routes", help="manage block, direct and proxy routing lists")
+    routes.add_argument("action", nargs="?", choices=["list", "add", "remove", "bench"], default="list")
+    routes.add_argument("target", nargs="?", choices=ROUTE_TARGETS)
+    routes.add_argument("entries", nargs="*", help="domains, domain:/full:/geosite: entries, IPs, CIDRs or geoip:")
+    routes.add_argument("--synthetic", type=int, metavar="N", help="benchmark a generated list of N entries per kind")
+    routes.set_defaults(handler=cmd_routes)
+
+    tun = subparsers.add_parser("tun", help="turn TUN on or off or show its status in the running GUI")
+    tun.add_argument("state", choices=["on", "off", "status"])
+    tun.set_defaults(handler=cmd_tun)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
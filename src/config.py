@@ -5,6 +5,7 @@ APP_ROOT = Path(__file__).resolve().parent
 
 APPDATA_ROOT = Path(os.getenv("APPDATA") or Path.home() / "AppData" / "Roaming")
 LOCALAPPDATA_ROOT = Path(os.getenv("LOCALAPPDATA") or Path.home() / "AppData" / "Local")
+PROGRAMDATA_ROOT = Path(os.getenv("ProgramData") or "C:/ProgramData")
 
 ASSET_DIR = APP_ROOT / "assets"
 BIN_DIR = APP_ROOT / "bin"
@@ -18,13 +19,31 @@ LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 ICON_PATH = str(ASSET_DIR / "icon.ico")
 SUBSCRIPTION_PATH = str(CONFIG_DIR / "subscription.txt")
+SUBSCRIPTION_STATE_PATH = str(CONFIG_DIR / "subscription.json")
+SUBSCRIPTION_CACHE_DIR = str(CONFIG_DIR / "subscriptions")
 XRAY_PATH = str(BIN_DIR / "xray.exe")
 XRAY_CONFIGS_PATH = str(CONFIG_DIR / "configs.json")
+SERVERS_PATH = str(CONFIG_DIR / "servers.db")
 XRAY_CONFIG_PATH = str(CONFIG_DIR / "config.json")
+XRAY_TUNING_PATH = str(CONFIG_DIR / "tuning.json")
+DNS_SETTINGS_PATH = str(CONFIG_DIR / "dns.json")
+ENDPOINT_CACHE_PATH = str(CONFIG_DIR / "endpoints.json")
+ROUTES_PATH = str(CONFIG_DIR / "routes.json")
+ROUTE_HITS_PATH = str(CONFIG_DIR / "route_hits.json")
 XRAY_LOG_DIR = str(LOG_DIR)
+XRAY_LOG_PATH = str(LOG_DIR / "xray.log")
 TUN_PATH = str(BIN_DIR / "mihomo.exe")
 TUN_CONFIG_PATH = str(CONFIG_DIR / "config.yaml")
 TUN_LOG_PATH = str(LOG_DIR / "tun.log")
+TUN_HOME_DIR = str(APPDATA_DIR / "mihomo")
+TUN_SOURCE_PATH = str(CONFIG_DIR / "mihomo.yaml")
+TUN_OVERRIDES_PATH = str(CONFIG_DIR / "tun_overrides.yaml")
+TUN_HELPER_DIR = str(PROGRAMDATA_ROOT / "XrayGUI" / "tun-helper")
+TUN_HELPER_LOG_PATH = str(Path(TUN_HELPER_DIR) / "tun_helper.log")
+TUN_HELPER_PIPE = "XrayGUI-tun-helper"
+TUN_HELPER_TASK = "XrayGUI TUN helper"
+TUN_HELPER_ENABLED = os.getenv("XRAYGUI_TUN_HELPER") == "1"
+APP_LOG_PATH = str(LOG_DIR / "app.log")
 
 APP_NAME = "XrayGUI"
 APP_VERSION = "2.0.0"
@@ -32,6 +51,27 @@ USER_AGENT = f"Happ/{APP_NAME}/{APP_VERSION}"
 
 PROXY_IP_ADDR = "127.0.0.1"
 PROXY_PORT = 2080
+XRAY_API_PORT = 10085
+XRAY_METRICS_PORT = 10086
+TUN_CONTROLLER_PORT = 9097
+DNS_PORT = 10853
+
+ENDPOINT_DOH_SERVERS = ["https://1.1.1.1/dns-query", "https://8.8.8.8/resolve"]
+ENDPOINT_REFRESH_INTERVAL = 300
+
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_ROTATE_INTERVAL = 24 * 3600
+LOG_COMPRESS = True
+LOG_BUFFER_LINES = 2000
+
+STATS_INTERVAL = 2
+STATS_HISTORY = 120
+
+HEALTH_CHECK_URL = "https://www.gstatic.com/generate_204"
+HEALTH_CHECK_INTERVAL = 30
+HEALTH_CHECK_LATENCY_THRESHOLD = 1500
+HEALTH_CHECK_COOLDOWN = 300
 
 DISCORD_DLLS_DIR = BIN_DIR
 DISCORD_PROXY_DLLS = ["DWrite.dll", "force-proxy.dll"]
@@ -39,3 +79,6 @@ DISCORD_PROXY_CONFIG = "proxy.txt"
 
 GITHUB_RELEASES_PAGE = "https://github.com/strohsnow/XrayGUI/releases"
 GITHUB_API_LATEST_RELEASE = "https://api.github.com/repos/strohsnow/XrayGUI/releases/latest"
+UPDATE_CACHE_PATH = str(CONFIG_DIR / "update.json")
+UPDATE_CHECK_INTERVAL = 24 * 3600
+UPDATE_CHECK_TIMEOUT = 5
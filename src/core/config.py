@@ -1,12 +1,124 @@
 import base64
+import copy
+import functools
+import hashlib
 import json
 import os
 import platform
+import threading
+import time
 import winreg
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Mapping
 
-import requests
-import wmi
+from core.dns import DnsSettings, apply_xray_dns
+from core.mihomo_config import TunConfigBuilder
+from core.resolver import EndpointResolver
+from core.routes import RouteManager
+from core.outbound import get_proxy_outbound
+from core.store import ServerInfo, ServerStore, server_fingerprint, server_id
+from core.tuning import TuningManager
+
+POOL_BALANCER_TAG = "pool"
+POOL_OUTBOUND_PREFIX = "pool-"
+POOL_STRATEGIES = ["leastPing", "leastLoad"]
+
+API_TAG = "api"
+API_SERVICES = ["HandlerService", "StatsService"]
+METRICS_TAG = "metrics"
+
+
+class ImportCancelledError(Exception):
+    pass
+
+
+@dataclass
+class SubscriptionFetch:
+    url: str
+    xray_configs: list[dict[str, Any]] | None
+    validators: dict[str, dict[str, str | None]] = field(default_factory=dict)
+    update_interval: float | None = None
+    userinfo: dict[str, int] = field(default_factory=dict)
+    error: str | None = None
+
+
+@dataclass
+class Subscription:
+    fetches: list[SubscriptionFetch]
+    tun_config: str | None = None
+    tun_source: str | None = None
+
+    @property
+    def errors(self) -> dict[str, str]:
+        return {fetch.url: fetch.error for fetch in self.fetches if fetch.error is not None}
+
+
+@dataclass
+class SubscriptionUpdate:
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    xray_changed: bool = False
+    tun_changed: bool = False
+
+
+def parse_update_interval(value: str | None) -> float | None:
+    try:
+        hours = float(value)
+    except (TypeError, ValueError):
+        return None
+    return hours if hours > 0 else None
+
+
+def parse_userinfo(value: str | None) -> dict[str, int]:
+    userinfo = {}
+    for part in (value or "").split(";"):
+        key, _, number = part.partition("=")
+        try:
+            userinfo[key.strip().lower()] = int(float(number))
+        except ValueError:
+            continue
+    return userinfo
+
+
+def merge_userinfo(userinfos: list[dict[str, int]]) -> dict[str, int]:
+    userinfo: dict[str, int] = {}
+    for info in userinfos:
+        for key in ("upload", "download"):
+            if key in info:
+                userinfo[key] = userinfo.get(key, 0) + info[key]
+    totals = [info["total"] for info in userinfos if "total" in info]
+    if totals:
+        userinfo["total"] = 0 if any(total <= 0 for total in totals) else sum(totals)
+    expires = [info["expire"] for info in userinfos if info.get("expire", 0) > 0]
+    if expires:
+        userinfo["expire"] = min(expires)
+    return userinfo
+
+
+def dedupe_configs(configs: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    seen = set()
+    unique = []
+    for config in configs:
+        fingerprint = server_fingerprint(config)
+        if fingerprint not in seen:
+            seen.add(fingerprint)
+            unique.append(config)
+    return unique
+
+
+def diff_servers(old: list[ServerInfo], new: list[ServerInfo]) -> SubscriptionUpdate:
+    old_ids = {server.id for server in old}
+    new_ids = {server.id for server in new}
+    added = [server.remark for server in new if server.id not in old_ids]
+    removed = [server.remark for server in old if server.id not in new_ids]
+    changed = set(added) & set(removed)
+    return SubscriptionUpdate(
+        added=[remark for remark in added if remark not in changed],
+        removed=[remark for remark in removed if remark not in changed],
+        changed=[remark for remark in added if remark in changed],
+    )
 
 
 class ConfigManager:
@@ -14,39 +126,138 @@ class ConfigManager:
         self,
         user_agent: str,
         subscription_path: str,
-        xray_configs_path: str,
+        servers_path: str,
         xray_config_path: str,
         tun_config_path: str,
+        subscription_state_path: str,
+        subscription_cache_dir: str,
+        api_port: int | None = None,
+        legacy_configs_path: str | None = None,
+        tun_builder: TunConfigBuilder | None = None,
+        tuning: TuningManager | None = None,
+        dns_settings: DnsSettings | None = None,
+        dns_port: int | None = None,
+        resolver: EndpointResolver | None = None,
+        routes: RouteManager | None = None,
+        metrics_port: int | None = None,
     ) -> None:
         self.user_agent: str = user_agent
 
         self.subscription_path: str = subscription_path
-        self.xray_configs_path: str = xray_configs_path
+        self.servers_path: str = servers_path
         self.xray_config_path: str = xray_config_path
         self.tun_config_path: str = tun_config_path
+        self.subscription_state_path: str = subscription_state_path
+        self.subscription_cache_dir: str = subscription_cache_dir
+        self.api_port: int | None = api_port
+        self.tun_builder: TunConfigBuilder | None = tun_builder
+        self.tuning: TuningManager | None = tuning
+        self.dns_settings: DnsSettings | None = dns_settings
+        self.dns_port: int | None = dns_port
+        self.dns_log: bool = False
+        self.resolver: EndpointResolver | None = resolver
+        self.routes: RouteManager | None = routes
+        self.metrics_port: int | None = metrics_port
 
-        self.subscription_url: str | None = None
-        self.xray_configs: list[dict[str, Any]] = []
+        self.subscription_urls: list[str] = []
+        self.subscriptions: dict[str, dict[str, Any]] = {}
+        self.store = ServerStore(servers_path)
+        self.current_id: str | None = None
         self.current_remark: str | None = None
+        self.current_pool: list[str] = []
+        self.pool_strategy: str = POOL_STRATEGIES[0]
+
+        self._session = None
+        self._session_lock = threading.Lock()
 
-        self._load_subscription_url()
-        self._load_xray_configs()
+        os.makedirs(subscription_cache_dir, exist_ok=True)
+        self._load_subscription_urls()
+        self._load_subscription_state()
+        if legacy_configs_path:
+            self._migrate_legacy_configs(legacy_configs_path)
+        self._migrate_subscription_cache()
         self._load_xray_config()
 
-    def _load_subscription_url(self) -> None:
+    def _load_subscription_urls(self) -> None:
         if os.path.isfile(self.subscription_path):
             with open(self.subscription_path, "r", encoding="utf-8") as f:
-                self.subscription_url = f.read().strip()
+                self.subscription_urls = [line.strip() for line in f if line.strip()]
+
+    def _load_subscription_state(self) -> None:
+        if not os.path.isfile(self.subscription_state_path):
+            return
+
+        with open(self.subscription_state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if "url" in state:
+            state = {"subscriptions": {state["url"]: {key: value for key, value in state.items() if key != "url"}}}
+        self.subscriptions = state.get("subscriptions", {})
+
+    def _save_subscriptions(self) -> None:
+        ConfigManager._write_atomic(self.subscription_path, "\n".join(self.subscription_urls))
+        ConfigManager._write_atomic(
+            self.subscription_state_path, json.dumps({"subscriptions": self.subscriptions}, indent=2)
+        )
+
+    def _cache_path(self, url: str) -> str:
+        return os.path.join(self.subscription_cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest()[:16] + ".json")
 
-    def _load_xray_configs(self) -> None:
-        if os.path.isfile(self.xray_configs_path):
-            with open(self.xray_configs_path, "r", encoding="utf-8") as f:
-                self.xray_configs = json.load(f)
+    def _load_cached_configs(self, url: str) -> list[dict[str, Any]]:
+        try:
+            with open(self._cache_path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _migrate_subscription_cache(self) -> None:
+        if len(self.subscription_urls) != 1 or os.path.isfile(self._cache_path(self.subscription_urls[0])):
+            return
+
+        configs = self.store.get_many([server.id for server in self.store.servers()])
+        if configs:
+            ConfigManager._write_atomic(
+                self._cache_path(self.subscription_urls[0]), json.dumps(list(configs.values()), ensure_ascii=False)
+            )
+
+    @property
+    def userinfo(self) -> dict[str, int]:
+        return merge_userinfo([self.subscriptions.get(url, {}).get("userinfo", {}) for url in self.subscription_urls])
+
+    @property
+    def servers(self) -> list[ServerInfo]:
+        return self.store.servers()
+
+    def _migrate_legacy_configs(self, path: str) -> None:
+        if not os.path.isfile(path):
+            return
+
+        if not self.store.count():
+            with open(path, "r", encoding="utf-8") as f:
+                self.store.replace(json.load(f))
+        os.remove(path)
 
     def _load_xray_config(self) -> None:
-        if os.path.isfile(self.xray_config_path):
-            with open(self.xray_config_path, "r", encoding="utf-8") as f:
-                self.current_remark = json.load(f).get("remarks", "No remark")
+        config = self.read_xray_config()
+        if config is None:
+            return
+
+        self.current_remark = config.get("remarks", "No remark")
+        self.current_id = config.get("id")
+        self.current_pool = config.get("pool", {}).get("servers", [])
+        self.pool_strategy = config.get("pool", {}).get("strategy", POOL_STRATEGIES[0])
+
+        if any(self.store.info(entry) is None for entry in self.current_pool):
+            pool = []
+            for entry in self.current_pool:
+                if self.store.info(entry) is not None:
+                    pool.append(entry)
+                else:
+                    pool.extend(server.id for server in self.store.find_by_remark(entry))
+            self.current_pool = list(dict.fromkeys(pool))
+
+        if self.current_id is None and not self.current_pool:
+            matches = self.store.find_by_remark(self.current_remark)
+            self.current_id = matches[0].id if matches else None
 
     @staticmethod
     def _get_machine_guid() -> str:
@@ -57,12 +268,20 @@ class ConfigManager:
 
     @staticmethod
     def _get_device_model() -> str:
-        c = wmi.WMI()
-        sysinfo = c.Win32_ComputerSystem()[0]
-        return sysinfo.Model
+        import pythoncom
+        import wmi
+
+        pythoncom.CoInitialize()
+        try:
+            c = wmi.WMI()
+            sysinfo = c.Win32_ComputerSystem()[0]
+            return sysinfo.Model
+        finally:
+            pythoncom.CoUninitialize()
 
     @staticmethod
-    def _get_hwid_headers() -> dict[str, str]:
+    @functools.cache
+    def get_hwid_headers() -> dict[str, str]:
         hwid_headers = {
             "x-hwid": ConfigManager._get_machine_guid(),
             "x-device-os": platform.system(),
@@ -71,44 +290,546 @@ class ConfigManager:
         }
         return hwid_headers
 
-    def import_configs(self, url: str) -> None:
-        headers = ConfigManager._get_hwid_headers()
-        headers.update({"User-Agent": self.user_agent})
+    def _get_session(self) -> Any:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util import Retry
+
+        with self._session_lock:
+            if self._session is None:
+                retry = Retry(
+                    total=3,
+                    backoff_factor=0.5,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=("GET",),
+                )
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+                self._session = requests.Session()
+                self._session.mount("http://", adapter)
+                self._session.mount("https://", adapter)
+            return self._session
+
+    @staticmethod
+    def _download(
+        session: Any,
+        url: str,
+        headers: dict[str, str],
+        timeout: tuple[float, float],
+        cancel_event: threading.Event | None,
+        validators: dict[str, str | None],
+        expires: float | None = None,
+        abandoned: threading.Event | None = None,
+    ) -> tuple[Mapping[str, str], bytes | None, dict[str, str | None]]:
+        headers = dict(headers)
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            if response.status_code == 304:
+                return response.headers, None, validators
+
+            chunks = []
+            for chunk in response.iter_content(chunk_size=65536):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ImportCancelledError()
+                if abandoned is not None and abandoned.is_set():
+                    raise ImportCancelledError()
+                if expires is not None and time.monotonic() > expires:
+                    raise TimeoutError("Subscription download exceeded its deadline")
+                chunks.append(chunk)
+            content = b"".join(chunks)
+
+        if abandoned is not None and abandoned.is_set():
+            raise ImportCancelledError()
+        content_hash = hashlib.sha256(content).hexdigest()
+        new_validators = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "hash": content_hash,
+        }
+        if content_hash == validators.get("hash"):
+            return response.headers, None, new_validators
+        return response.headers, content, new_validators
 
-        response = requests.get(url.rstrip("/") + "/json", headers=headers)
-        response.raise_for_status()
+    def _validators(self, url: str, endpoint: str) -> dict[str, str | None]:
+        if endpoint == "/json" and not os.path.isfile(self._cache_path(url)):
+            return {}
+        if endpoint == "/mihomo" and (
+            not os.path.isfile(self.tun_config_path)
+            or (self.tun_builder is not None and not os.path.isfile(self.tun_builder.source_path))
+        ):
+            return {}
+        return self.subscriptions.get(url, {}).get("endpoints", {}).get(endpoint, {})
 
-        announce = response.headers.get("Announce", "")
+    @staticmethod
+    def _parse_fetch(url: str, response: Any) -> SubscriptionFetch:
+        if isinstance(response, Exception):
+            return SubscriptionFetch(url, None, error=str(response))
+
+        headers, content, validators = response
+        announce = headers.get("Announce", "")
         if announce:
             announce = announce.removeprefix("base64:")
-            raise Exception(f"{base64.b64decode(announce).decode('utf-8')}")
+            return SubscriptionFetch(url, None, error=base64.b64decode(announce).decode("utf-8"))
+
+        xray_configs = None
+        if content is not None:
+            try:
+                xray_configs = json.loads(content)
+            except ValueError as e:
+                return SubscriptionFetch(url, None, error=f"Invalid subscription: {e}")
+            if not xray_configs:
+                return SubscriptionFetch(url, None, error="Subscription contains no servers")
+
+        return SubscriptionFetch(
+            url,
+            xray_configs,
+            {"/json": validators},
+            parse_update_interval(headers.get("profile-update-interval")),
+            parse_userinfo(headers.get("subscription-userinfo")),
+        )
+
+    def _assemble(self, urls: list[str], primary: str, responses: dict[tuple[str, str], Any]) -> Subscription:
+        subscription = Subscription([ConfigManager._parse_fetch(url, responses[(url, "/json")]) for url in urls])
+        if primary in urls:
+            fetch = next(fetch for fetch in subscription.fetches if fetch.url == primary)
+            tun_response = responses[(primary, "/mihomo")]
+            if isinstance(tun_response, Exception):
+                fetch.error = fetch.error or f"TUN config: {tun_response}"
+            elif fetch.error is None:
+                _, tun_content, tun_validators = tun_response
+                subscription.tun_source = tun_content.decode("utf-8") if tun_content is not None else None
+                fetch.validators["/mihomo"] = tun_validators
+                subscription.tun_config = self._build_tun_config(subscription.tun_source)
+        return subscription
+
+    def fetch_configs(
+        self,
+        urls: list[str],
+        cancel_event: threading.Event | None = None,
+        progress: Callable[[int], None] | None = None,
+        timeout: tuple[float, float] = (5.0, 30.0),
+        deadline: float = 60.0,
+        on_fetch: Callable[[Subscription], None] | None = None,
+    ) -> Subscription:
+        def report(value: int) -> None:
+            if progress is not None:
+                progress(value)
+            if cancel_event is not None and cancel_event.is_set():
+                raise ImportCancelledError()
+
+        report(0)
+        headers = {**ConfigManager.get_hwid_headers(), "User-Agent": self.user_agent}
+        session = self._get_session()
+        report(20)
+
+        primary = (self.subscription_urls or urls)[0]
+        jobs = [(url, "/json") for url in urls]
+        if primary in urls:
+            jobs.append((primary, "/mihomo"))
 
-        self.xray_configs = response.json()
-        with open(self.xray_configs_path, "w", encoding="utf-8") as f:
-            json.dump(self.xray_configs, f, ensure_ascii=False, indent=2)
+        expires = time.monotonic() + deadline
+        abandoned = threading.Event()
+        responses: dict[tuple[str, str], Any] = {}
+        parts: dict[str, Subscription] = {}
 
-        if not self.current_remark:
-            self.current_remark = self.xray_configs[0].get("remarks", "No remark")
-        self.select_config(self.current_remark)
+        def collect(job: tuple[str, str], response: Any) -> None:
+            responses[job] = response
+            url = job[0]
+            if all(key in responses for key in jobs if key[0] == url):
+                parts[url] = self._assemble([url], primary, responses)
+                if on_fetch is not None:
+                    on_fetch(parts[url])
+            report(20 + 80 * len(responses) // len(jobs))
 
-        response = requests.get(url.rstrip("/") + "/mihomo", headers=headers)
-        response.raise_for_status()
+        executor = ThreadPoolExecutor(max_workers=len(jobs))
+        try:
+            futures = {
+                executor.submit(
+                    ConfigManager._download,
+                    session,
+                    url.rstrip("/") + endpoint,
+                    headers,
+                    timeout,
+                    cancel_event,
+                    self._validators(url, endpoint),
+                    expires,
+                    abandoned,
+                ): (url, endpoint)
+                for url, endpoint in jobs
+            }
+            try:
+                for future in as_completed(futures, timeout=deadline):
+                    try:
+                        response = future.result()
+                    except ImportCancelledError:
+                        raise
+                    except Exception as e:
+                        response = e
+                    collect(futures[future], response)
+            except TimeoutError:
+                for job in futures.values():
+                    if job not in responses:
+                        collect(job, TimeoutError(f"No response within {deadline:.0f} s"))
+        finally:
+            abandoned.set()
+            executor.shutdown(wait=False, cancel_futures=True)
 
-        with open(self.tun_config_path, "w", encoding="utf-8") as f:
-            f.write(response.text)
+        subscription = Subscription([fetch for url in urls for fetch in parts[url].fetches])
+        if primary in parts:
+            subscription.tun_source = parts[primary].tun_source
+            subscription.tun_config = parts[primary].tun_config
+        if all(fetch.error is not None for fetch in subscription.fetches):
+            raise Exception(subscription.fetches[0].error)
+        return subscription
 
-        self.subscription_url = url
-        with open(self.subscription_path, "w", encoding="utf-8") as f:
-            f.write(self.subscription_url)
+    def _build_tun_config(self, tun_source: str | None) -> str | None:
+        if self.tun_builder is None:
+            return tun_source
 
-    def select_config(self, remark: str) -> bool:
-        if not self.xray_configs:
+        source = tun_source if tun_source is not None else self.tun_builder.read_source()
+        if source is None:
+            return None
+        try:
+            tun_config = self.tun_builder.build(source)
+        except ValueError:
+            return tun_source
+
+        if tun_source is None:
+            try:
+                with open(self.tun_config_path, "r", encoding="utf-8") as f:
+                    if f.read() == tun_config:
+                        return None
+            except OSError:
+                pass
+        return tun_config
+
+    @staticmethod
+    def _write_atomic(path: str, data: str) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def read_xray_config(self) -> dict[str, Any] | None:
+        if not os.path.isfile(self.xray_config_path):
+            return None
+        with open(self.xray_config_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _replace_servers(self, configs: list[dict[str, Any]]) -> SubscriptionUpdate:
+        old_config = self.read_xray_config()
+        old_servers = self.servers
+        old_remarks = {server.id: server.remark for server in old_servers}
+
+        new_servers = self.store.replace(configs)
+        update = diff_servers(old_servers, new_servers)
+
+        def remap(server_ids: list[str]) -> list[str]:
+            remapped = []
+            for old_id in server_ids:
+                if self.store.info(old_id) is not None:
+                    remapped.append(old_id)
+                elif old_id in old_remarks:
+                    matches = self.store.find_by_remark(old_remarks[old_id])
+                    remapped.extend(sorted((server.id for server in matches), key=lambda i: i in old_remarks))
+            return remapped
+
+        pool = remap(self.current_pool)
+        if new_servers and not (pool and self.select_pool(pool, self.pool_strategy)):
+            current = remap([self.current_id]) if self.current_id and not self.current_pool else []
+            if not (current and self.select_config(current[0])):
+                self.select_config(new_servers[0].id)
+
+        update.xray_changed = self.read_xray_config() != old_config
+        return update
+
+    def _merged_configs(self) -> list[dict[str, Any]]:
+        return dedupe_configs([config for url in self.subscription_urls for config in self._load_cached_configs(url)])
+
+    def commit_configs(self, subscription: Subscription) -> SubscriptionUpdate:
+        servers_changed = False
+        for fetch in subscription.fetches:
+            if fetch.error is not None:
+                if fetch.url in self.subscriptions:
+                    self.subscriptions[fetch.url]["error"] = fetch.error
+                continue
+
+            if fetch.url not in self.subscription_urls:
+                self.subscription_urls.append(fetch.url)
+                servers_changed = True
+            if fetch.xray_configs is not None:
+                ConfigManager._write_atomic(
+                    self._cache_path(fetch.url), json.dumps(fetch.xray_configs, ensure_ascii=False)
+                )
+                servers_changed = True
+
+            state = self.subscriptions.get(fetch.url, {})
+            self.subscriptions[fetch.url] = {
+                "endpoints": {**state.get("endpoints", {}), **fetch.validators},
+                "update_interval": fetch.update_interval or state.get("update_interval"),
+                "userinfo": fetch.userinfo or state.get("userinfo", {}),
+                "updated_at": time.time(),
+                "error": None,
+            }
+
+        update = self._replace_servers(self._merged_configs()) if servers_changed else SubscriptionUpdate()
+
+        if subscription.tun_source is not None and self.tun_builder is not None:
+            ConfigManager._write_atomic(self.tun_builder.source_path, subscription.tun_source)
+        if subscription.tun_config is not None:
+            ConfigManager._write_atomic(self.tun_config_path, subscription.tun_config)
+            update.tun_changed = True
+
+        self._save_subscriptions()
+        return update
+
+    def remove_subscription(self, url: str) -> SubscriptionUpdate | None:
+        if url not in self.subscription_urls:
+            return None
+
+        self.subscription_urls.remove(url)
+        self.subscriptions.pop(url, None)
+        try:
+            os.remove(self._cache_path(url))
+        except OSError:
+            pass
+
+        update = self._replace_servers(self._merged_configs())
+        self._save_subscriptions()
+        return update
+
+    def subscription_info(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "url": url,
+                "servers": len(self._load_cached_configs(url)),
+                "updated_at": self.subscriptions.get(url, {}).get("updated_at"),
+                "error": self.subscriptions.get(url, {}).get("error"),
+                "userinfo": self.subscriptions.get(url, {}).get("userinfo", {}),
+            }
+            for url in self.subscription_urls
+        ]
+
+    def import_configs(self, urls: list[str]) -> SubscriptionUpdate:
+        return self.commit_configs(self.fetch_configs(urls))
+
+    def build_xray_config(self, config: dict[str, Any]) -> dict[str, Any]:
+        config = copy.deepcopy(config)
+        log = config.setdefault("log", {})
+        log.pop("access", None)
+        log.pop("error", None)
+        if self.tuning is not None:
+            server_ids = [config["id"]] if config.get("id") else config.get("pool", {}).get("servers", [])
+            config = self.tuning.apply(config, self.store.info(server_ids[0]) if server_ids else None)
+        if self.routes is not None:
+            proxy = get_proxy_outbound(config)
+            target = {"outboundTag": proxy["tag"]} if proxy and proxy.get("tag") else None
+            if config.get("pool"):
+                target = {"balancerTag": POOL_BALANCER_TAG}
+            config = self.routes.apply(config, target)
+        if self.dns_settings is not None and self.dns_settings.enabled and self.dns_port is not None:
+            config = apply_xray_dns(config, self.dns_settings, self.dns_port, self.dns_log)
+        if self.resolver is not None:
+            config = self.resolver.pin(config)
+        if self.api_port is None:
+            return config
+
+        config["api"] = {"tag": API_TAG, "services": list(API_SERVICES)}
+        config["stats"] = {}
+        config.setdefault("policy", {}).setdefault("system", {}).update(
+            {
+                "statsInboundUplink": True,
+                "statsInboundDownlink": True,
+                "statsOutboundUplink": True,
+                "statsOutboundDownlink": True,
+            }
+        )
+        ports = {API_TAG: self.api_port}
+        if self.metrics_port is not None:
+            config["metrics"] = {"tag": METRICS_TAG}
+            ports[METRICS_TAG] = self.metrics_port
+
+        config["inbounds"] = [inbound for inbound in config.get("inbounds", []) if inbound.get("tag") not in ports]
+        config["inbounds"].extend(
+            {
+                "tag": tag,
+                "listen": "127.0.0.1",
+                "port": port,
+                "protocol": "dokodemo-door",
+                "settings": {"address": "127.0.0.1"},
+            }
+            for tag, port in ports.items()
+        )
+
+        routing = config.setdefault("routing", {})
+        routing["rules"] = [
+            *({"type": "field", "inboundTag": [tag], "outboundTag": tag} for tag in ports),
+            *(rule for rule in routing.get("rules", []) if rule.get("outboundTag") not in ports),
+        ]
+        return config
+
+    def _write_xray_config(self, config: dict[str, Any]) -> None:
+        ConfigManager._write_atomic(
+            self.xray_config_path,
+            json.dumps(self.build_xray_config(config), ensure_ascii=False, indent=2),
+        )
+
+    def select_config(self, server_id: str) -> bool:
+        config = self.store.get(server_id)
+        if config is None:
+            return False
+
+        self._write_xray_config({**config, "id": server_id})
+        self.store.touch(server_id)
+        self.current_id = server_id
+        self.current_remark = config.get("remarks", "No remark")
+        self.current_pool = []
+        return True
+
+    def tuning_info(self) -> dict[str, Any]:
+        config = self.read_xray_config() or {}
+        if self.tuning is None:
+            return {"profiles": [], "current": None}
+        return {
+            "profiles": sorted(self.tuning.profiles),
+            "default": self.tuning.default,
+            "servers": self.tuning.servers,
+            "groups": self.tuning.groups,
+            "current": config.get("tuning"),
+        }
+
+    def set_tuning(self, profile: str | None, server_id: str | None = None, group: str | None = None) -> None:
+        if self.tuning is None:
+            raise ValueError("Tuning profiles are not available")
+        self.tuning.assign(profile, server_id, group)
+        self.regenerate()
+
+    def set_dns_log(self, enabled: bool) -> bool:
+        if enabled == self.dns_log:
             return False
+        self.dns_log = enabled
+        return self.regenerate()
 
-        for config in self.xray_configs:
-            if config.get("remarks", "No remark") == remark:
-                with open(self.xray_config_path, "w", encoding="utf-8") as f:
-                    json.dump(config, f, ensure_ascii=False, indent=2)
-                self.current_remark = remark
-                return True
+    def route_info(self) -> dict[str, Any]:
+        if self.routes is None:
+            return {"enabled": False, "lists": {}, "rules": []}
+        return self.routes.info()
+
+    def update_routes(self, target: str, add: list[str], remove: list[str]) -> None:
+        if self.routes is None:
+            raise ValueError("Routing lists are not available")
+        self.routes.update(target, add, remove)
+        self.regenerate()
+
+    def refresh_endpoints(self) -> bool:
+        if self.resolver is None:
+            return False
+
+        changed = self.resolver.refresh({server.address for server in self.servers if server.address})
+        active = [self.store.info(server_id) for server_id in self.current_pool or [self.current_id] if server_id]
+        return any(server is not None and server.address in changed for server in active)
+
+    def regenerate(self) -> bool:
+        if self.current_pool:
+            return self.select_pool(self.current_pool, self.pool_strategy)
+        if self.current_id:
+            return self.select_config(self.current_id)
         return False
+
+    def find_pool(self, query: str) -> list[str]:
+        query = query.strip()
+
+        if "," in query:
+            wanted = {remark.strip() for remark in query.split(",")}
+            return [server.id for server in self.servers if server.remark in wanted]
+        if query.startswith("#"):
+            tag = query.removeprefix("#").lower()
+            return [server.id for server in self.servers if tag in server.remark.lower().split()]
+        return [server.id for server in self.servers if server.remark.startswith(query)]
+
+    @staticmethod
+    def build_pool_config(
+        configs: list[dict[str, Any]],
+        strategy: str = "leastPing",
+        probe_url: str = "https://www.gstatic.com/generate_204",
+        probe_interval: str = "1m",
+    ) -> dict[str, Any]:
+        if strategy not in POOL_STRATEGIES:
+            raise ValueError(f"Unknown balancer strategy: {strategy}")
+
+        base = copy.deepcopy(configs[0])
+        base_proxy = get_proxy_outbound(base)
+        proxy_tag = base_proxy.get("tag") if base_proxy else None
+
+        pool_outbounds = []
+        for config in configs:
+            outbound = get_proxy_outbound(config)
+            if outbound is not None:
+                pool_outbounds.append({**outbound, "tag": f"{POOL_OUTBOUND_PREFIX}{len(pool_outbounds)}"})
+        if not pool_outbounds:
+            raise ValueError("No proxy outbounds in pool")
+
+        service_outbounds = [outbound for outbound in base.get("outbounds", []) if outbound is not base_proxy]
+        proxy_is_default = bool(base.get("outbounds")) and base["outbounds"][0] is base_proxy
+        base["outbounds"] = (
+            pool_outbounds + service_outbounds if proxy_is_default else service_outbounds + pool_outbounds
+        )
+
+        routing = base.setdefault("routing", {})
+        rules = routing.setdefault("rules", [])
+        for rule in rules:
+            if proxy_tag and rule.get("outboundTag") == proxy_tag:
+                del rule["outboundTag"]
+                rule["balancerTag"] = POOL_BALANCER_TAG
+        if proxy_is_default:
+            rules.append({"type": "field", "network": "tcp,udp", "balancerTag": POOL_BALANCER_TAG})
+
+        routing["balancers"] = [
+            balancer for balancer in routing.get("balancers", []) if balancer.get("tag") != POOL_BALANCER_TAG
+        ] + [
+            {
+                "tag": POOL_BALANCER_TAG,
+                "selector": [POOL_OUTBOUND_PREFIX],
+                "strategy": {"type": strategy},
+                "fallbackTag": pool_outbounds[0]["tag"],
+            }
+        ]
+
+        if strategy == "leastPing":
+            base["observatory"] = {
+                "subjectSelector": [POOL_OUTBOUND_PREFIX],
+                "probeUrl": probe_url,
+                "probeInterval": probe_interval,
+                "enableConcurrency": True,
+            }
+        else:
+            base["burstObservatory"] = {
+                "subjectSelector": [POOL_OUTBOUND_PREFIX],
+                "pingConfig": {
+                    "destination": probe_url,
+                    "interval": probe_interval,
+                    "sampling": 3,
+                    "timeout": "5s",
+                },
+            }
+
+        base["remarks"] = f"{strategy} ({len(pool_outbounds)})"
+        base["pool"] = {"strategy": strategy, "servers": [server_id(config) for config in configs]}
+        return base
+
+    def select_pool(self, server_ids: list[str], strategy: str = "leastPing") -> bool:
+        configs = list(self.store.get_many(server_ids).values())
+        if not configs:
+            return False
+
+        config = ConfigManager.build_pool_config(configs, strategy)
+        self._write_xray_config(config)
+        self.current_id = None
+        self.current_remark = config["remarks"]
+        self.current_pool = config["pool"]["servers"]
+        self.pool_strategy = strategy
+        return True
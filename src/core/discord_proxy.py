@@ -2,8 +2,6 @@ import shutil
 import subprocess
 from pathlib import Path
 
-import psutil
-
 
 class DiscordProxyManager:
     def __init__(
@@ -95,9 +93,11 @@ class DiscordProxyManager:
 
     @staticmethod
     def _kill_discord() -> str | None:
+        import psutil
+
         exe_path: str | None = None
 
-        discord_procs: list[psutil.Process] = []
+        discord_procs = []
         for proc in psutil.process_iter(["name", "exe"]):
             try:
                 if proc.info["name"] and proc.info["name"].lower() == "discord.exe":
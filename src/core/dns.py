@@ -0,0 +1,261 @@
+import copy
+import ipaddress
+import json
+import logging
+import os
+import re
+import secrets
+import socket
+import statistics
+import struct
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+DNS_INBOUND_TAG = "dns-in"
+DNS_OUTBOUND_TAG = "dns-out"
+DEFAULT_UPSTREAMS = ["https://1.1.1.1/dns-query", "https://8.8.8.8/dns-query"]
+DEFAULT_DIRECT_DOMAINS = ["geosite:private", "domain:lan", "domain:local"]
+DEFAULT_BOOTSTRAP_NAMESERVERS = ["1.1.1.1", "8.8.8.8"]
+SNIFFING_PROTOCOLS = {"socks", "http", "mixed", "dokodemo-door"}
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ns|µs|us|ms|s)\b")
+_DURATION_SCALE = {"ns": 1e-6, "µs": 1e-3, "us": 1e-3, "ms": 1.0, "s": 1000.0}
+
+
+@dataclass
+class DnsSettings:
+    enabled: bool = True
+    upstreams: list[str] = field(default_factory=list)
+    direct_resolver: str = "localhost"
+    direct_domains: list[str] = field(default_factory=lambda: list(DEFAULT_DIRECT_DOMAINS))
+    fake_domains: list[str] = field(default_factory=list)
+    fake_ip_pool: str = "198.18.0.0/16"
+    fake_ip_pool_size: int = 65535
+    mihomo_fake_ip_range: str = "198.19.0.1/16"
+    query_strategy: str = "UseIPv4"
+    tun_direct_nameservers: list[str] = field(default_factory=lambda: ["system"])
+    bootstrap_nameservers: list[str] = field(default_factory=lambda: list(DEFAULT_BOOTSTRAP_NAMESERVERS))
+
+    @classmethod
+    def load(cls, path: str) -> "DnsSettings":
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError) as e:
+            logger.warning("Failed to read DNS settings %s: %s", path, e)
+            return cls()
+
+        names = {item.name for item in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def provider_upstreams(config: dict[str, Any]) -> list[Any]:
+    upstreams = []
+    for server in config.get("dns", {}).get("servers", []):
+        address = server if isinstance(server, str) else server.get("address")
+        if address and address != "fakedns":
+            upstreams.append(server)
+    return upstreams
+
+
+def upstream_host(upstream: Any) -> str | None:
+    address = upstream if isinstance(upstream, str) else upstream.get("address", "")
+    host = urlsplit(address).hostname if "://" in address else address
+    if not host or host in ("localhost", "fakedns"):
+        return None
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return host.lower()
+    return None
+
+
+def apply_xray_dns(config: dict[str, Any], settings: DnsSettings, port: int, log: bool = False) -> dict[str, Any]:
+    config = copy.deepcopy(config)
+
+    upstreams = settings.upstreams or provider_upstreams(config)
+    servers: list[Any] = [
+        {"address": settings.direct_resolver, "domains": settings.direct_domains, "skipFallback": True}
+    ]
+    if settings.fake_domains:
+        servers.append({"address": "fakedns", "domains": settings.fake_domains, "skipFallback": True})
+        config["fakedns"] = [{"ipPool": settings.fake_ip_pool, "poolSize": settings.fake_ip_pool_size}]
+    servers.extend(upstreams or DEFAULT_UPSTREAMS)
+
+    config["dns"] = {
+        "servers": servers,
+        "queryStrategy": settings.query_strategy,
+        "disableCache": False,
+        "enableParallelQuery": True,
+        "tag": "dns",
+    }
+    if log:
+        config.setdefault("log", {})["dnsLog"] = True
+
+    if settings.fake_domains:
+        for inbound in config.get("inbounds", []):
+            sniffing = inbound.get("sniffing")
+            if inbound.get("protocol") in SNIFFING_PROTOCOLS and sniffing and sniffing.get("enabled"):
+                overrides = sniffing.setdefault("destOverride", ["http", "tls"])
+                if "fakedns" not in overrides:
+                    overrides.append("fakedns")
+
+    config["inbounds"] = [inbound for inbound in config.get("inbounds", []) if inbound.get("tag") != DNS_INBOUND_TAG]
+    config["inbounds"].append(
+        {
+            "tag": DNS_INBOUND_TAG,
+            "listen": "127.0.0.1",
+            "port": port,
+            "protocol": "dokodemo-door",
+            "settings": {"address": "1.1.1.1", "port": 53, "network": "tcp,udp"},
+        }
+    )
+    config["outbounds"] = [
+        outbound for outbound in config.get("outbounds", []) if outbound.get("tag") != DNS_OUTBOUND_TAG
+    ]
+    config["outbounds"].append({"tag": DNS_OUTBOUND_TAG, "protocol": "dns"})
+
+    routing = config.setdefault("routing", {})
+    routing["rules"] = [
+        {"type": "field", "inboundTag": [DNS_INBOUND_TAG], "outboundTag": DNS_OUTBOUND_TAG},
+        *(rule for rule in routing.get("rules", []) if rule.get("outboundTag") != DNS_OUTBOUND_TAG),
+    ]
+    return config
+
+
+def mihomo_domain(domain: str) -> str | None:
+    kind, _, value = domain.partition(":")
+    if not value:
+        return f"+.{domain}"
+    if kind == "domain":
+        return f"+.{value}"
+    if kind == "full":
+        return value
+    if kind == "geosite":
+        return domain
+    return None
+
+
+def build_mihomo_dns(settings: DnsSettings, port: int) -> dict[str, Any]:
+    direct = [domain for domain in map(mihomo_domain, settings.direct_domains) if domain is not None]
+    upstream_hosts = [host for host in map(upstream_host, settings.upstreams or DEFAULT_UPSTREAMS) if host]
+    return {
+        "dns": {
+            "enable": True,
+            "ipv6": settings.query_strategy != "UseIPv4",
+            "enhanced-mode": "fake-ip",
+            "fake-ip-range": settings.mihomo_fake_ip_range,
+            "fake-ip-filter": direct,
+            "default-nameserver": settings.bootstrap_nameservers,
+            "nameserver": [f"udp://127.0.0.1:{port}"],
+            "nameserver-policy": {
+                domain: settings.tun_direct_nameservers for domain in dict.fromkeys([*direct, *upstream_hosts])
+            },
+            "cache-algorithm": "arc",
+            "respect-rules": False,
+        }
+    }
+
+
+class DnsStats:
+    def __init__(self, samples: int = 1000) -> None:
+        self.queries: int = 0
+        self.cache_hits: int = 0
+
+        self._latencies: deque[float] = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    def observe(self, line: str) -> None:
+        if "cache HIT" in line:
+            with self._lock:
+                self.queries += 1
+                self.cache_hits += 1
+            return
+        if "got answer" not in line:
+            return
+
+        durations = _DURATION_PATTERN.findall(line)
+        with self._lock:
+            self.queries += 1
+            if durations:
+                value, unit = durations[-1]
+                self._latencies.append(float(value) * _DURATION_SCALE[unit])
+
+    def reset(self) -> None:
+        with self._lock:
+            self.queries = self.cache_hits = 0
+            self._latencies.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            queries, hits = self.queries, self.cache_hits
+
+        latency = None
+        if latencies:
+            latency = {
+                "mean": round(statistics.fmean(latencies), 2),
+                "p50": round(latencies[len(latencies) // 2], 2),
+                "p90": round(latencies[min(len(latencies) - 1, len(latencies) * 9 // 10)], 2),
+            }
+        return {
+            "queries": queries,
+            "cache_hits": hits,
+            "hit_rate": round(hits / queries, 3) if queries else None,
+            "upstream_latency_ms": latency,
+        }
+
+
+def _query_packet(query_id: int, domain: str) -> bytes:
+    question = b"".join(bytes([len(label)]) + label.encode("idna") for label in domain.strip(".").split("."))
+    return struct.pack(">HHHHHH", query_id, 0x0100, 1, 0, 0, 0) + question + b"\x00" + struct.pack(">HH", 1, 1)
+
+
+def probe(domain: str, address: tuple[str, int], timeout: float = 3.0) -> dict[str, Any]:
+    query_id = secrets.randbits(16)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        start = time.perf_counter()
+        try:
+            sock.sendto(_query_packet(query_id, domain), address)
+            while True:
+                data, _ = sock.recvfrom(4096)
+                if len(data) >= 12 and struct.unpack(">H", data[:2])[0] == query_id:
+                    break
+        except OSError as e:
+            return {"domain": domain, "ms": None, "error": str(e)}
+        elapsed = (time.perf_counter() - start) * 1000
+
+    flags, _, answers = struct.unpack(">HHH", data[2:8])
+    return {"domain": domain, "ms": round(elapsed, 2), "rcode": flags & 0x0F, "answers": answers}
+
+
+def probe_cache(domains: list[str], address: tuple[str, int], timeout: float = 3.0) -> list[dict[str, Any]]:
+    results = []
+    for domain in domains:
+        first = probe(domain, address, timeout)
+        repeat = probe(domain, address, timeout)
+        results.append(
+            {
+                "domain": domain,
+                "first_ms": first.get("ms"),
+                "repeat_ms": repeat.get("ms"),
+                "rcode": repeat.get("rcode"),
+                "error": repeat.get("error"),
+            }
+        )
+    return results
@@ -0,0 +1,169 @@
+import logging
+import threading
+import time
+from typing import Callable
+
+from core.latency import LatencyResult
+from core.store import ServerInfo
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    def __init__(
+        self,
+        proxy_ip_addr: str,
+        proxy_port: int,
+        test_servers: Callable[[list[ServerInfo]], dict[str, LatencyResult]],
+        get_servers: Callable[[], list[ServerInfo]],
+        get_current: Callable[[], str | None],
+        on_switch: Callable[[str, str], None],
+        url: str = "https://www.gstatic.com/generate_204",
+        interval: float = 30.0,
+        timeout: float = 5.0,
+        alpha: float = 0.3,
+        latency_threshold: int = 1500,
+        failure_threshold: float = 0.5,
+        min_samples: int = 3,
+        cooldown: float = 300.0,
+        improvement: float = 0.7,
+        search_cooldown: float = 60.0,
+    ) -> None:
+        self.proxy: str = f"http://{proxy_ip_addr}:{proxy_port}"
+        self.test_servers = test_servers
+        self.get_servers = get_servers
+        self.get_current = get_current
+        self.on_switch = on_switch
+
+        self.url: str = url
+        self.interval: float = interval
+        self.timeout: float = timeout
+        self.alpha: float = alpha
+        self.latency_threshold: int = latency_threshold
+        self.failure_threshold: float = failure_threshold
+        self.min_samples: int = min_samples
+        self.cooldown: float = cooldown
+        self.improvement: float = improvement
+        self.search_cooldown: float = search_cooldown
+
+        self.latency: float | None = None
+        self.failure_rate: float = 0.0
+        self.samples: int = 0
+        self._last_switch: float = float("-inf")
+        self._last_search: float = float("-inf")
+        self._search_delay: float = search_cooldown
+
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.is_running():
+            return
+
+        self.reset()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop_event,), name="HealthMonitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._thread = None
+
+    def reset(self) -> None:
+        self.latency = None
+        self.failure_rate = 0.0
+        self.samples = 0
+
+    def probe(self) -> int | None:
+        import requests
+
+        start = time.perf_counter()
+        try:
+            response = requests.get(self.url, proxies={"http": self.proxy, "https": self.proxy}, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException:
+            return None
+        return round((time.perf_counter() - start) * 1000)
+
+    def record(self, ms: int | None) -> None:
+        self.samples += 1
+        self.failure_rate += self.alpha * ((ms is None) - self.failure_rate)
+        if ms is not None:
+            self.latency = ms if self.latency is None else self.latency + self.alpha * (ms - self.latency)
+
+    def degradation(self) -> str | None:
+        if self.samples < self.min_samples:
+            return None
+        if self.failure_rate > self.failure_threshold:
+            return f"failure rate {self.failure_rate:.0%} above {self.failure_threshold:.0%}"
+        if self.latency is not None and self.latency > self.latency_threshold:
+            return f"latency {self.latency:.0f} ms above {self.latency_threshold} ms"
+        return None
+
+    def _score(self) -> float:
+        if self.latency is None or self.failure_rate > self.failure_threshold:
+            return float("inf")
+        return self.latency
+
+    def find_fallback(self) -> tuple[ServerInfo, int] | None:
+        current = self.get_current()
+        servers = [server for server in self.get_servers() if server.id != current]
+        try:
+            results = self.test_servers(servers)
+        except Exception as e:
+            logger.warning("Fallback latency test failed: %s", e)
+            return None
+        candidates = [
+            (results[server.id].url, i) for i, server in enumerate(servers) if results[server.id].url is not None
+        ]
+        if not candidates:
+            return None
+
+        ms, i = min(candidates)
+        if ms >= self._score() * self.improvement:
+            return None
+        return servers[i], ms
+
+    def _check(self, stop_event: threading.Event) -> None:
+        self.record(self.probe())
+
+        reason = self.degradation()
+        if reason is None:
+            self._search_delay = self.search_cooldown
+            return
+        now = time.monotonic()
+        if now - self._last_switch < self.cooldown or now - self._last_search < self._search_delay:
+            return
+
+        self._last_search = now
+        fallback = self.find_fallback()
+        if stop_event.is_set():
+            return
+        if fallback is None:
+            self._search_delay = min(self._search_delay * 2, max(self.cooldown, self.search_cooldown))
+            logger.warning(
+                "Server %s degraded (%s), no better fallback available, next search in %.0f s",
+                self.get_current(),
+                reason,
+                self._search_delay,
+            )
+            return
+        self._search_delay = self.search_cooldown
+
+        server, ms = fallback
+        logger.warning(
+            "Switching from %s to %s %r (%d ms): %s", self.get_current(), server.id, server.remark, ms, reason
+        )
+        self._last_switch = time.monotonic()
+        self.reset()
+        self.on_switch(server.id, reason)
+
+    def _run(self, stop_event: threading.Event) -> None:
+        while not stop_event.wait(self.interval):
+            try:
+                self._check(stop_event)
+            except Exception:
+                logger.exception("Health check failed")
@@ -0,0 +1,70 @@
+import socket
+import ssl
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from core.store import ServerInfo
+
+
+@dataclass
+class LatencyResult:
+    tcp: int | None = None
+    tls: int | None = None
+    url: int | None = None
+    tls_failed: bool = False
+
+    @property
+    def ms(self) -> int | None:
+        if self.url is not None:
+            return self.url
+        if self.tls_failed:
+            return None
+        for value in (self.tls, self.tcp):
+            if value is not None:
+                return value
+        return None
+
+
+class LatencyTester:
+    def __init__(self, timeout: float = 3.0, max_workers: int = 32) -> None:
+        self.timeout: float = timeout
+        self.max_workers: int = max_workers
+
+    def tcp_ping(self, host: str, port: int) -> int | None:
+        start = time.perf_counter()
+        try:
+            with socket.create_connection((host, port), timeout=self.timeout):
+                return round((time.perf_counter() - start) * 1000)
+        except OSError:
+            return None
+
+    def tls_ping(self, host: str, port: int, server_name: str | None = None) -> int | None:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+
+        try:
+            with socket.create_connection((host, port), timeout=self.timeout) as sock:
+                start = time.perf_counter()
+                with context.wrap_socket(sock, server_hostname=server_name or host):
+                    return round((time.perf_counter() - start) * 1000)
+        except (OSError, ssl.SSLError):
+            return None
+
+    def test(self, server: ServerInfo) -> LatencyResult:
+        if server.address is None or server.port is None:
+            return LatencyResult()
+
+        result = LatencyResult(tcp=self.tcp_ping(server.address, server.port))
+        if result.tcp is not None and server.tls:
+            result.tls = self.tls_ping(server.address, server.port, server.server_name)
+            result.tls_failed = result.tls is None
+        return result
+
+    def test_all(self, servers: list[ServerInfo]) -> dict[str, LatencyResult]:
+        if not servers:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(servers))) as executor:
+            return dict(zip((server.id for server in servers), executor.map(self.test, servers)))
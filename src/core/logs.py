@@ -0,0 +1,135 @@
+import gzip
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from logging.handlers import RotatingFileHandler
+
+LOG_LEVELS = ["debug", "info", "warning", "error"]
+
+_LEVEL_ALIASES = {"warn": "warning", "critical": "error", "fatal": "error", "panic": "error"}
+_LEVEL_PATTERN = re.compile(r"\[(debug|info|warn|warning|error)\]|\blevel=(\w+)", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class LogRecord:
+    sequence: int
+    timestamp: float
+    source: str
+    level: str
+    message: str
+
+
+def parse_level(line: str, default: str = "info") -> str:
+    match = _LEVEL_PATTERN.search(line)
+    if not match:
+        return default
+    level = (match.group(1) or match.group(2)).lower()
+    level = _LEVEL_ALIASES.get(level, level)
+    return level if level in LOG_LEVELS else default
+
+
+def _compress(source: str, dest: str) -> None:
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class RotatingLogHandler(RotatingFileHandler):
+    def __init__(
+        self,
+        filename: str,
+        max_bytes: int,
+        backup_count: int,
+        interval: float | None = None,
+        compress: bool = False,
+    ) -> None:
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.interval: float | None = interval
+        self.rollover_at: float | None = self._segment_start() + interval if interval else None
+
+        if compress:
+            self.namer = lambda name: f"{name}.gz"
+            self.rotator = _compress
+
+    def _segment_start(self) -> float:
+        try:
+            return os.path.getmtime(self.baseFilename)
+        except OSError:
+            return time.time()
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            if os.path.isfile(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+                return True
+            self.rollover_at = time.time() + self.interval
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        if self.interval:
+            self.rollover_at = time.time() + self.interval
+
+
+class LogPipeline:
+    def __init__(
+        self,
+        source: str,
+        path: str,
+        max_bytes: int = 5 * 1024 * 1024,
+        backup_count: int = 5,
+        interval: float | None = 24 * 3600,
+        compress: bool = True,
+        buffer_size: int = 2000,
+        max_line_length: int = 4000,
+    ) -> None:
+        self.source: str = source
+        self.path: str = path
+        self.max_line_length: int = max_line_length
+
+        self.handler = RotatingLogHandler(path, max_bytes, backup_count, interval, compress)
+        self.handler.setFormatter(logging.Formatter("%(message)s"))
+        self.records: deque[LogRecord] = deque(maxlen=buffer_size)
+
+        self._sequence: int = 0
+        self._lock = threading.Lock()
+
+    def write(self, line: str, level: str | None = None) -> None:
+        line = line.rstrip()[: self.max_line_length]
+        if not line:
+            return
+
+        level = _LEVEL_ALIASES.get(level, level) if level else parse_level(line)
+        with self._lock:
+            self._sequence += 1
+            self.records.append(LogRecord(self._sequence, time.time(), self.source, level, line))
+        self.handler.handle(logging.makeLogRecord({"msg": line, "levelname": level.upper()}))
+
+    def since(self, sequence: int) -> list[LogRecord]:
+        with self._lock:
+            if not self.records or self.records[-1].sequence <= sequence:
+                return []
+            return [record for record in self.records if record.sequence > sequence]
+
+    def tail(self, lines: int = 50) -> list[str]:
+        with self._lock:
+            return [record.message for record in list(self.records)[-lines:]]
+
+    def close(self) -> None:
+        self.handler.close()
+
+
+class PipelineHandler(logging.Handler):
+    def __init__(self, pipeline: LogPipeline) -> None:
+        super().__init__()
+        self.pipeline: LogPipeline = pipeline
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.pipeline.write(self.format(record), record.levelname.lower())
+        except Exception:
+            self.handleError(record)
@@ -0,0 +1,78 @@
+import json
+from typing import Any
+
+
+class MihomoError(Exception):
+    pass
+
+
+class MihomoController:
+    def __init__(self, address: str, secret: str, timeout: float = 2.0) -> None:
+        self.address: str = address
+        self.secret: str = secret
+        self.timeout: float = timeout
+
+        self._session = None
+
+    def _request(self, method: str, path: str, **kwargs: Any) -> Any:
+        import requests
+
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.trust_env = False
+            self._session.headers["Authorization"] = f"Bearer {self.secret}"
+
+        try:
+            response = self._session.request(method, f"http://{self.address}{path}", timeout=self.timeout, **kwargs)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise MihomoError(f"{method} {path} failed: {e}") from e
+        return response
+
+    def available(self) -> bool:
+        try:
+            self._request("GET", "/version")
+        except MihomoError:
+            return False
+        return True
+
+    def reload(self, config_path: str) -> None:
+        try:
+            with open(config_path, "r", encoding="utf-8") as f:
+                payload = f.read()
+        except OSError as e:
+            raise MihomoError(f"Failed to read {config_path}: {e}") from e
+        self.load(payload)
+
+    def load(self, payload: str) -> None:
+        self._request("PUT", "/configs", params={"force": "true"}, json={"path": "", "payload": payload})
+
+    def disable_tun(self) -> None:
+        self._request("PATCH", "/configs", json={"tun": {"enable": False}})
+
+    def memory(self) -> int | None:
+        with self._request("GET", "/memory", stream=True) as response:
+            for line in response.iter_lines():
+                if line:
+                    return json.loads(line).get("inuse")
+        return None
+
+    def status(self) -> dict[str, Any]:
+        try:
+            configs = self._request("GET", "/configs").json()
+            connections = self._request("GET", "/connections").json()
+        except ValueError as e:
+            raise MihomoError(f"Invalid controller response: {e}") from e
+        try:
+            memory = self.memory()
+        except (MihomoError, ValueError):
+            memory = None
+
+        return {
+            "mode": configs.get("mode"),
+            "tun": bool((configs.get("tun") or {}).get("enable")),
+            "connections": len(connections.get("connections") or []),
+            "upload": connections.get("uploadTotal", 0),
+            "download": connections.get("downloadTotal", 0),
+            "memory": memory,
+        }
@@ -0,0 +1,252 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_DIR = "providers"
+GEODATA_FILES = {
+    "geoip": "GeoIP.dat",
+    "geosite": "GeoSite.dat",
+    "mmdb": "Country.mmdb",
+    "asn": "GeoLite2-ASN.mmdb",
+}
+GEODATA_EXTENSIONS = (".dat", ".mmdb", ".metadb")
+PROVIDER_EXTENSIONS = {"yaml": ".yaml", "text": ".list", "mrs": ".mrs"}
+REMOTE_PROVIDER_KEYS = ("url", "proxy", "header", "size-limit")
+
+
+def merge_overrides(config: dict[str, Any], overrides: dict[str, Any]) -> dict[str, Any]:
+    result = copy.deepcopy(config)
+    for key, value in overrides.items():
+        if key == "prepend-rules":
+            result["rules"] = [*value, *result.get("rules", [])]
+        elif key == "append-rules":
+            result["rules"] = [*result.get("rules", []), *value]
+        elif isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = merge_overrides(result[key], value)
+        else:
+            result[key] = copy.deepcopy(value)
+    return result
+
+
+def seed_geodata(seed_dir: str, home_dir: str) -> None:
+    if not os.path.isdir(seed_dir):
+        return
+    for name in os.listdir(seed_dir):
+        if not name.lower().endswith(GEODATA_EXTENSIONS):
+            continue
+
+        source = os.path.join(seed_dir, name)
+        target = os.path.join(home_dir, name)
+        if os.path.exists(target):
+            source_stat, target_stat = os.stat(source), os.stat(target)
+            if source_stat.st_mtime < target_stat.st_mtime:
+                continue
+            if (source_stat.st_mtime, source_stat.st_size) == (target_stat.st_mtime, target_stat.st_size):
+                continue
+        shutil.copy2(source, target)
+
+
+class ResourceCache:
+    def __init__(self, index_path: str, user_agent: str, timeout: tuple[float, float] = (5.0, 30.0)) -> None:
+        self.index_path: str = index_path
+        self.user_agent: str = user_agent
+        self.timeout: tuple[float, float] = timeout
+
+        self._lock = threading.Lock()
+        self._index: dict[str, dict[str, str | None]] = self._load_index()
+
+    def _load_index(self) -> dict[str, dict[str, str | None]]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return index if isinstance(index, dict) else {}
+
+    def _save_index(self) -> None:
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def fetch(self, url: str, path: str, offline: bool = False) -> str | None:
+        import requests
+
+        cached = os.path.isfile(path)
+        if offline:
+            return path if cached else None
+
+        headers = {"User-Agent": self.user_agent}
+        with self._lock:
+            entry = self._index.get(path, {})
+        if cached and entry.get("url") == url:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            with requests.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                if response.status_code == 304:
+                    return path
+
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=65536):
+                        f.write(chunk)
+                os.replace(tmp_path, path)
+        except (OSError, requests.RequestException) as e:
+            logger.warning("Failed to fetch %s: %s", url, e)
+            return path if cached else None
+
+        with self._lock:
+            self._index[path] = {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+            self._save_index()
+        return path
+
+
+class TunConfigBuilder:
+    def __init__(
+        self,
+        home_dir: str,
+        seed_dir: str,
+        source_path: str,
+        overrides_path: str,
+        user_agent: str,
+        defaults: dict[str, Any] | None = None,
+        defaults_path: str | None = None,
+        max_workers: int = 8,
+    ) -> None:
+        self.home_dir: str = home_dir
+        self.seed_dir: str = seed_dir
+        self.source_path: str = source_path
+        self.overrides_path: str = overrides_path
+        self.defaults: dict[str, Any] | None = defaults
+        self.defaults_path: str | None = defaults_path
+        self.max_workers: int = max_workers
+
+        os.makedirs(os.path.join(home_dir, PROVIDER_DIR), exist_ok=True)
+        self.cache = ResourceCache(os.path.join(home_dir, PROVIDER_DIR, "index.json"), user_agent)
+
+    def seed(self) -> None:
+        seed_geodata(self.seed_dir, self.home_dir)
+
+    def read_source(self) -> str | None:
+        try:
+            with open(self.source_path, "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _load_overrides(self) -> dict[str, Any]:
+        import yaml
+
+        try:
+            with open(self.overrides_path, "r", encoding="utf-8") as f:
+                overrides = yaml.safe_load(f)
+        except OSError:
+            return {}
+        except yaml.YAMLError as e:
+            logger.warning("Ignoring invalid TUN overrides %s: %s", self.overrides_path, e)
+            return {}
+        return overrides if isinstance(overrides, dict) else {}
+
+    def _provider_path(self, provider: dict[str, Any]) -> str:
+        extension = PROVIDER_EXTENSIONS.get(provider.get("format", "yaml"), ".yaml")
+        name = hashlib.sha1(provider["url"].encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.home_dir, PROVIDER_DIR, name + extension)
+
+    def _localize_providers(self, config: dict[str, Any], offline: bool) -> None:
+        providers = config.get("rule-providers")
+        if not isinstance(providers, dict):
+            return
+
+        remote = {
+            name: provider
+            for name, provider in providers.items()
+            if isinstance(provider, dict) and provider.get("type") == "http" and provider.get("url")
+        }
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            paths = dict(
+                zip(
+                    remote,
+                    executor.map(
+                        lambda provider: self.cache.fetch(provider["url"], self._provider_path(provider), offline),
+                        remote.values(),
+                    ),
+                )
+            )
+
+        for name, path in paths.items():
+            if path is None:
+                continue
+            provider = {key: value for key, value in remote[name].items() if key not in REMOTE_PROVIDER_KEYS}
+            provider.update({"type": "file", "path": path})
+            providers[name] = provider
+
+    def _localize_geodata(self, config: dict[str, Any], offline: bool) -> None:
+        urls = config.get("geox-url")
+        if not isinstance(urls, dict):
+            return
+
+        localized = False
+        for key, filename in GEODATA_FILES.items():
+            if urls.get(key):
+                localized |= self.cache.fetch(urls[key], os.path.join(self.home_dir, filename), offline) is not None
+        if localized:
+            config["geo-auto-update"] = False
+
+    def build(self, source: str, offline: bool = False, localize: bool = True) -> str:
+        import yaml
+
+        try:
+            config = yaml.safe_load(source)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid TUN config: {e}") from e
+        if not isinstance(config, dict):
+            raise ValueError("TUN config must be a YAML mapping")
+
+        if self.defaults:
+            config = merge_overrides(config, self.defaults)
+        config = merge_overrides(config, self._load_overrides())
+        if localize:
+            self._localize_providers(config, offline)
+            self._localize_geodata(config, offline)
+        return yaml.safe_dump(config, allow_unicode=True, sort_keys=False)
+
+    def refresh(self, config_path: str) -> bool:
+        source = self.read_source()
+        if source is None:
+            return False
+
+        try:
+            config_mtime = os.path.getmtime(config_path)
+        except OSError:
+            config_mtime = 0.0
+        inputs_mtime = max(
+            os.path.getmtime(path)
+            for path in (self.source_path, self.overrides_path, self.defaults_path)
+            if path and os.path.isfile(path)
+        )
+        if inputs_mtime <= config_mtime:
+            return False
+
+        tmp_path = f"{config_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.build(source, offline=True))
+        os.replace(tmp_path, config_path)
+        return True
@@ -0,0 +1,97 @@
+from typing import Any
+
+SERVICE_PROTOCOLS: set[str] = {"freedom", "blackhole", "dns", "loopback"}
+METADATA_KEYS: tuple[str, ...] = ("remarks", "id", "tuning")
+CREDENTIAL_KEYS: tuple[str, ...] = ("id", "password", "method", "user", "pass", "secretKey", "publicKey")
+
+
+def get_proxy_outbound(config: dict[str, Any]) -> dict[str, Any] | None:
+    for outbound in config.get("outbounds", []):
+        if outbound.get("protocol") not in SERVICE_PROTOCOLS:
+            return outbound
+    return None
+
+
+def get_endpoint(outbound: dict[str, Any]) -> tuple[str, int] | None:
+    settings = outbound.get("settings", {})
+
+    servers = settings.get("vnext") or settings.get("servers")
+    if servers:
+        server = servers[0]
+        address, port = server.get("address"), server.get("port")
+    elif settings.get("peers"):
+        address, _, port = settings["peers"][0].get("endpoint", "").rpartition(":")
+    else:
+        address, port = settings.get("address"), settings.get("port")
+
+    if not address:
+        return None
+
+    try:
+        return str(address).strip("[]"), int(port)
+    except (TypeError, ValueError):
+        return None
+
+
+def set_endpoint_address(outbound: dict[str, Any], address: str) -> None:
+    settings = outbound.setdefault("settings", {})
+
+    servers = settings.get("vnext") or settings.get("servers")
+    if servers:
+        servers[0]["address"] = address
+    elif settings.get("peers"):
+        _, _, port = settings["peers"][0].get("endpoint", "").rpartition(":")
+        settings["peers"][0]["endpoint"] = f"{address}:{port}"
+    else:
+        settings["address"] = address
+
+
+def get_credentials(outbound: dict[str, Any]) -> dict[str, str]:
+    settings = outbound.get("settings", {})
+    sources = [settings]
+    servers = settings.get("vnext") or settings.get("servers") or settings.get("peers")
+    if servers:
+        sources.append(servers[0])
+        sources.extend(servers[0].get("users", [])[:1])
+    sources.extend(settings.get("users", [])[:1])
+
+    credentials = {}
+    for source in sources:
+        for key in CREDENTIAL_KEYS:
+            if source.get(key) is not None:
+                credentials[key] = str(source[key])
+    return credentials
+
+
+def get_server_name(outbound: dict[str, Any]) -> str | None:
+    stream_settings = outbound.get("streamSettings", {})
+    security = stream_settings.get("security")
+    if security == "tls":
+        return stream_settings.get("tlsSettings", {}).get("serverName")
+    if security == "reality":
+        return stream_settings.get("realitySettings", {}).get("serverName")
+    return None
+
+
+def uses_tls(outbound: dict[str, Any]) -> bool:
+    return outbound.get("streamSettings", {}).get("security") in ("tls", "reality")
+
+
+def replace_proxy_outbound(config: dict[str, Any], outbound: dict[str, Any] | None) -> dict[str, Any]:
+    proxy = get_proxy_outbound(config)
+    return {
+        **config,
+        "outbounds": [outbound if item is proxy else item for item in config.get("outbounds", [])],
+    }
+
+
+def differs_only_in_proxy(old: dict[str, Any], new: dict[str, Any]) -> bool:
+    old_proxy, new_proxy = get_proxy_outbound(old), get_proxy_outbound(new)
+    if old_proxy is None or new_proxy is None or not old_proxy.get("tag"):
+        return False
+    if old_proxy.get("tag") != new_proxy.get("tag"):
+        return False
+
+    old_rest = {key: value for key, value in replace_proxy_outbound(old, None).items() if key not in METADATA_KEYS}
+    new_rest = {key: value for key, value in replace_proxy_outbound(new, None).items() if key not in METADATA_KEYS}
+    return old_rest == new_rest
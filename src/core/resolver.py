@@ -0,0 +1,180 @@
+import copy
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any
+
+from core.outbound import SERVICE_PROTOCOLS, get_endpoint, set_endpoint_address
+
+logger = logging.getLogger(__name__)
+
+HOST_HEADER_TRANSPORTS = {"ws": "wsSettings", "httpupgrade": "httpupgradeSettings", "xhttp": "xhttpSettings"}
+PINNABLE_NETWORKS = {"tcp", "raw", "kcp", "mkcp", *HOST_HEADER_TRANSPORTS}
+
+
+def is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+class EndpointResolver:
+    def __init__(
+        self,
+        cache_path: str,
+        servers: list[str],
+        timeout: float = 3.0,
+        min_ttl: float = 60,
+        max_ttl: float = 3600,
+        stale_ttl: float = 600,
+        max_workers: int = 8,
+    ) -> None:
+        self.cache_path: str = cache_path
+        self.servers: list[str] = servers
+        self.timeout: float = timeout
+        self.min_ttl: float = min_ttl
+        self.max_ttl: float = max_ttl
+        self.stale_ttl: float = stale_ttl
+        self.max_workers: int = max_workers
+
+        self._lock = threading.Lock()
+        self._session = None
+        self._cache: dict[str, dict[str, Any]] = self._load_cache()
+
+    def _load_cache(self) -> dict[str, dict[str, Any]]:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return cache if isinstance(cache, dict) else {}
+
+    def _save_cache(self) -> None:
+        with self._lock:
+            data = json.dumps(self._cache, indent=2)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.cache_path)
+
+    def lookup(self, host: str) -> str | None:
+        with self._lock:
+            entry = self._cache.get(host.lower())
+        if not entry or not entry.get("addresses"):
+            return None
+        if entry["expires"] + self.stale_ttl < time.time():
+            return None
+        return entry["addresses"][0]
+
+    def _query(self, server: str, host: str) -> tuple[list[str], float]:
+        import requests
+
+        with self._lock:
+            if self._session is None:
+                self._session = requests.Session()
+                self._session.trust_env = False
+
+        response = self._session.get(
+            server,
+            params={"name": host, "type": "A"},
+            headers={"Accept": "application/dns-json"},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        data = response.json()
+        if data.get("Status") != 0:
+            raise ValueError(f"{server} answered {host} with status {data.get('Status')}")
+
+        answers = [answer for answer in data.get("Answer", []) if answer.get("type") == 1]
+        if not answers:
+            raise ValueError(f"{server} returned no A records for {host}")
+        return [answer["data"] for answer in answers], min(answer.get("TTL", 0) for answer in answers)
+
+    def resolve(self, host: str) -> list[str] | None:
+        if not self.servers:
+            logger.warning("No DoH servers configured to resolve %s", host)
+            return None
+
+        executor = ThreadPoolExecutor(max_workers=len(self.servers))
+        try:
+            pending = {executor.submit(self._query, server, host) for server in self.servers}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        addresses, ttl = future.result()
+                    except Exception as e:
+                        logger.debug("DoH lookup failed: %s", e)
+                        continue
+
+                    ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+                    with self._lock:
+                        previous = self._cache.get(host.lower(), {}).get("addresses") or []
+                        if previous and previous[0] in addresses:
+                            addresses = [previous[0], *(address for address in addresses if address != previous[0])]
+                        self._cache[host.lower()] = {"addresses": addresses, "expires": time.time() + ttl}
+                    return addresses
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        logger.warning("Failed to resolve %s over DoH", host)
+        return None
+
+    def due(self, hosts: set[str], margin: float = 60) -> list[str]:
+        now = time.time()
+        with self._lock:
+            return [
+                host
+                for host in hosts
+                if host.lower() not in self._cache or self._cache[host.lower()]["expires"] - margin < now
+            ]
+
+    def refresh(self, hosts: set[str]) -> set[str]:
+        hosts = {host for host in hosts if host and not is_ip_address(host)}
+        due = self.due(hosts)
+        if not due:
+            return set()
+
+        before = {host: self.lookup(host) for host in due}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(self.resolve, due))
+
+        wanted = {host.lower() for host in hosts}
+        with self._lock:
+            self._cache = {host: entry for host, entry in self._cache.items() if host in wanted}
+        self._save_cache()
+        return {host for host in due if self.lookup(host) != before[host]}
+
+    def pin(self, config: dict[str, Any]) -> dict[str, Any]:
+        config = copy.deepcopy(config)
+        for outbound in config.get("outbounds", []):
+            if outbound.get("protocol") in SERVICE_PROTOCOLS:
+                continue
+
+            endpoint = get_endpoint(outbound)
+            if endpoint is None or is_ip_address(endpoint[0]):
+                continue
+
+            stream_settings = outbound.get("streamSettings", {})
+            network = stream_settings.get("network", "tcp")
+            if network not in PINNABLE_NETWORKS:
+                continue
+
+            address = self.lookup(endpoint[0])
+            if address is None:
+                continue
+
+            host = endpoint[0]
+            if stream_settings.get("security") == "tls":
+                stream_settings.setdefault("tlsSettings", {}).setdefault("serverName", host)
+            if network in HOST_HEADER_TRANSPORTS:
+                transport = stream_settings.setdefault(HOST_HEADER_TRANSPORTS[network], {})
+                if not transport.get("host") and not transport.get("headers", {}).get("Host"):
+                    transport["host"] = host
+            set_endpoint_address(outbound, address)
+        return config
@@ -0,0 +1,433 @@
+import copy
+import ipaddress
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+ROUTE_TARGETS = ("block", "direct", "proxy")
+TARGET_PROTOCOLS = {"block": "blackhole", "direct": "freedom"}
+RULE_TAG_PREFIX = "user-"
+DOMAIN_KINDS = {"domain", "full", "keyword", "regexp", "geosite", "ext"}
+DEFAULT_DIRECT_DOMAINS = ["domain:lan", "domain:local", "domain:localhost"]
+DEFAULT_DIRECT_IPS = [
+    "10.0.0.0/8",
+    "100.64.0.0/10",
+    "127.0.0.0/8",
+    "169.254.0.0/16",
+    "172.16.0.0/12",
+    "192.168.0.0/16",
+    "::1/128",
+    "fc00::/7",
+    "fe80::/10",
+]
+
+_HIT_PATTERN = re.compile(r"(?:accepted (?:tcp|udp):|got answer: |cache HIT )([A-Za-z0-9_-]+(?:\.[A-Za-z0-9_-]+)+)")
+
+
+@dataclass
+class RouteSettings:
+    enabled: bool = True
+    block_domains: list[str] = field(default_factory=list)
+    block_ips: list[str] = field(default_factory=list)
+    direct_domains: list[str] = field(default_factory=lambda: list(DEFAULT_DIRECT_DOMAINS))
+    direct_ips: list[str] = field(default_factory=lambda: list(DEFAULT_DIRECT_IPS))
+    proxy_domains: list[str] = field(default_factory=list)
+    proxy_ips: list[str] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, path: str) -> "RouteSettings":
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError) as e:
+            logger.warning("Failed to read routing lists %s: %s", path, e)
+            return cls()
+
+        names = {item.name for item in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def entries(self, target: str, kind: str) -> list[str]:
+        return getattr(self, f"{target}_{kind}")
+
+
+@dataclass
+class CompiledRule:
+    target: str
+    kind: str
+    suffixes: set[str] = field(default_factory=set)
+    fulls: set[str] = field(default_factory=set)
+    patterns: list[str] = field(default_factory=list)
+    networks: list[ipaddress.IPv4Network | ipaddress.IPv6Network] = field(default_factory=list)
+    hits: int = 0
+
+    @property
+    def values(self) -> list[str]:
+        if self.kind == "ips":
+            return [str(network) for network in self.networks] + self.patterns
+        return (
+            [f"domain:{domain}" for domain in sorted(self.suffixes)]
+            + [f"full:{domain}" for domain in sorted(self.fulls)]
+            + self.patterns
+        )
+
+    def matches(self, domain: str) -> bool:
+        if domain in self.fulls:
+            return True
+        labels = domain.split(".")
+        return any(".".join(labels[i:]) in self.suffixes for i in range(len(labels)))
+
+
+def _covered(domain: str, suffixes: set[str], strict: bool = True) -> bool:
+    labels = domain.split(".")
+    return any(".".join(labels[i:]) in suffixes for i in range(1 if strict else 0, len(labels)))
+
+
+def entry_kind(entry: str) -> str:
+    entry = entry.strip()
+    if entry.lower().startswith("geoip:"):
+        return "ips"
+    try:
+        ipaddress.ip_network(entry, strict=False)
+    except ValueError:
+        return "domains"
+    return "ips"
+
+
+def parse_domain(entry: str) -> tuple[str, str] | None:
+    entry = entry.strip()
+    if not entry or entry.startswith("#"):
+        return None
+
+    kind, sep, value = entry.partition(":")
+    if not sep or kind.lower() not in DOMAIN_KINDS:
+        kind, value = "domain", entry
+    kind = kind.lower()
+    if kind == "regexp":
+        return kind, value
+    if kind == "ext":
+        return kind, value
+
+    value = value.lower()
+    if kind in ("domain", "full"):
+        if value.startswith("*.") or value.startswith("."):
+            kind = "domain"
+        value = value.removeprefix("*.").strip(".")
+    return (kind, value) if value else None
+
+
+def compact_domains(
+    entries: Iterable[str], shadow: set[str] | None = None, shadow_fulls: set[str] | None = None
+) -> CompiledRule:
+    shadow = shadow or set()
+    shadow_fulls = shadow_fulls or set()
+    rule = CompiledRule("", "domains")
+    patterns: dict[str, None] = {}
+    for entry in entries:
+        parsed = parse_domain(entry)
+        if parsed is None:
+            continue
+        kind, value = parsed
+        if kind == "domain":
+            rule.suffixes.add(value)
+        elif kind == "full":
+            rule.fulls.add(value)
+        else:
+            patterns[f"{kind}:{value}"] = None
+
+    rule.suffixes = {
+        domain
+        for domain in rule.suffixes
+        if not _covered(domain, rule.suffixes) and not _covered(domain, shadow, strict=False)
+    }
+    rule.fulls = {
+        domain
+        for domain in rule.fulls
+        if domain not in shadow_fulls and not _covered(domain, rule.suffixes | shadow, strict=False)
+    }
+    rule.patterns = list(patterns)
+    return rule
+
+
+def compact_ips(entries: Iterable[str]) -> CompiledRule:
+    rule = CompiledRule("", "ips")
+    networks = []
+    patterns: dict[str, None] = {}
+    for entry in entries:
+        entry = entry.strip()
+        if not entry or entry.startswith("#"):
+            continue
+        kind, sep, value = entry.partition(":")
+        if sep and kind.lower() in ("geoip", "ext"):
+            patterns[f"{kind.lower()}:{value.lower() if kind.lower() == 'geoip' else value}"] = None
+            continue
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            logger.warning("Ignoring invalid IP range %r", entry)
+
+    for version in (4, 6):
+        rule.networks.extend(
+            ipaddress.collapse_addresses(network for network in networks if network.version == version)
+        )
+    rule.patterns = list(patterns)
+    return rule
+
+
+def _domains_overlap(first: CompiledRule, second: CompiledRule) -> bool:
+    if first.patterns or second.patterns:
+        return True
+    for a, b in ((first, second), (second, first)):
+        if any(_covered(domain, b.suffixes, strict=False) for domain in a.suffixes | a.fulls):
+            return True
+    return bool(first.fulls & second.fulls)
+
+
+def _ips_overlap(first: CompiledRule, second: CompiledRule) -> bool:
+    if first.patterns or second.patterns:
+        return True
+    ranges = sorted(
+        (
+            (network.version, int(network.network_address), int(network.broadcast_address), owner)
+            for owner, rule in enumerate((first, second))
+            for network in rule.networks
+        )
+    )
+    for previous, current in zip(ranges, ranges[1:]):
+        if previous[0] == current[0] and current[1] <= previous[2] and previous[3] != current[3]:
+            return True
+    return False
+
+
+def _can_swap(first: CompiledRule, second: CompiledRule) -> bool:
+    if first.target == second.target:
+        return True
+    if first.kind != second.kind:
+        return False
+    if first.kind == "domains":
+        return not _domains_overlap(first, second)
+    return not _ips_overlap(first, second)
+
+
+def order_rules(rules: list[CompiledRule]) -> list[CompiledRule]:
+    ordered: list[CompiledRule] = []
+    for rule in rules:
+        index = len(ordered)
+        while index > 0 and ordered[index - 1].hits < rule.hits and _can_swap(ordered[index - 1], rule):
+            index -= 1
+        ordered.insert(index, rule)
+    return ordered
+
+
+def compile_rules(settings: RouteSettings, hits: Counter[str] | None = None) -> list[CompiledRule]:
+    rules = []
+    shadow: set[str] = set()
+    shadow_fulls: set[str] = set()
+    for target in ROUTE_TARGETS:
+        rule = compact_domains(settings.entries(target, "domains"), shadow, shadow_fulls)
+        rule.target = target
+        shadow |= rule.suffixes
+        shadow_fulls |= rule.fulls
+        rules.append(rule)
+    for target in ROUTE_TARGETS:
+        rule = compact_ips(settings.entries(target, "ips"))
+        rule.target = target
+        rules.append(rule)
+
+    rules = [rule for rule in rules if rule.values]
+    for domain, count in (hits or Counter()).items():
+        for rule in rules:
+            if rule.kind == "domains" and rule.matches(domain):
+                rule.hits += count
+                break
+    return order_rules(rules)
+
+
+def naive_rules(settings: RouteSettings) -> list[dict[str, Any]]:
+    rules = []
+    for target in ROUTE_TARGETS:
+        for kind, key in (("domains", "domain"), ("ips", "ip")):
+            for entry in settings.entries(target, kind):
+                if entry.strip():
+                    rules.append({"type": "field", key: [entry.strip()], "outboundTag": target})
+    return rules
+
+
+def rule_dicts(rules: list[CompiledRule], targets: dict[str, dict[str, str]]) -> list[dict[str, Any]]:
+    return [
+        {
+            "type": "field",
+            "ruleTag": f"{RULE_TAG_PREFIX}{rule.target}-{rule.kind}",
+            "domain" if rule.kind == "domains" else "ip": rule.values,
+            **targets[rule.target],
+        }
+        for rule in rules
+    ]
+
+
+def benchmark(settings: RouteSettings, hits: Counter[str] | None = None) -> dict[str, Any]:
+    before = naive_rules(settings)
+    start = time.perf_counter()
+    compiled = compile_rules(settings, hits)
+    elapsed = (time.perf_counter() - start) * 1000
+    after = rule_dicts(compiled, {target: {"outboundTag": target} for target in ROUTE_TARGETS})
+
+    def measure(rules: list[dict[str, Any]]) -> dict[str, int]:
+        return {
+            "rules": len(rules),
+            "entries": sum(len(rule.get("domain", rule.get("ip", []))) for rule in rules),
+            "bytes": len(json.dumps({"routing": {"rules": rules}}, ensure_ascii=False, indent=2).encode()),
+        }
+
+    return {
+        "before": measure(before),
+        "after": measure(after),
+        "compile_ms": round(elapsed, 2),
+        "order": [f"{rule.target}-{rule.kind}" for rule in compiled],
+    }
+
+
+class RouteManager:
+    def __init__(self, path: str, hits_path: str, max_hits: int = 5000) -> None:
+        self.path: str = path
+        self.hits_path: str = hits_path
+        self.max_hits: int = max_hits
+
+        self.settings: RouteSettings = RouteSettings.load(path)
+        self.hits: Counter[str] = self._load_hits()
+
+        self._lock = threading.Lock()
+        self._mtime: float | None = self._settings_mtime()
+        self._rules: list[CompiledRule] | None = None
+
+    def _settings_mtime(self) -> float | None:
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def _load_hits(self) -> Counter[str]:
+        try:
+            with open(self.hits_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return Counter()
+        return Counter({domain: count for domain, count in data.items() if isinstance(count, int)})
+
+    def save_hits(self) -> None:
+        with self._lock:
+            data = json.dumps(dict(self.hits.most_common(self.max_hits)), indent=2)
+        tmp_path = f"{self.hits_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.hits_path)
+
+    def observe(self, line: str) -> None:
+        match = _HIT_PATTERN.search(line)
+        if match is None:
+            return
+        domain = match.group(1).lower()
+        try:
+            ipaddress.ip_address(domain)
+        except ValueError:
+            pass
+        else:
+            return
+
+        with self._lock:
+            self.hits[domain] += 1
+            if len(self.hits) > self.max_hits * 2:
+                self.hits = Counter(dict(self.hits.most_common(self.max_hits)))
+
+    def rules(self) -> list[CompiledRule]:
+        mtime = self._settings_mtime()
+        if mtime != self._mtime:
+            self.settings = RouteSettings.load(self.path)
+            self._mtime = mtime
+            self._rules = None
+        if self._rules is None:
+            with self._lock:
+                hits = Counter(self.hits)
+            self._rules = compile_rules(self.settings, hits)
+        return self._rules
+
+    def update(self, target: str, add: list[str], remove: list[str]) -> None:
+        if target not in ROUTE_TARGETS:
+            raise ValueError(f"Unknown route target: {target}")
+
+        removed = {entry.strip().lower() for entry in remove}
+        for kind in ("domains", "ips"):
+            entries = self.settings.entries(target, kind)
+            entries[:] = [entry for entry in entries if entry.strip().lower() not in removed]
+        for entry in add:
+            entries = self.settings.entries(target, entry_kind(entry))
+            if entry.strip() and entry.strip() not in entries:
+                entries.append(entry.strip())
+        self.settings.save(self.path)
+        self._mtime = self._settings_mtime()
+        self._rules = None
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.settings.enabled = enabled
+        self.settings.save(self.path)
+        self._mtime = self._settings_mtime()
+
+    def info(self) -> dict[str, Any]:
+        rules = self.rules()
+        return {
+            "enabled": self.settings.enabled,
+            "lists": {
+                target: {kind: self.settings.entries(target, kind) for kind in ("domains", "ips")}
+                for target in ROUTE_TARGETS
+            },
+            "rules": [
+                {"target": rule.target, "kind": rule.kind, "entries": len(rule.values), "hits": rule.hits}
+                for rule in rules
+            ],
+        }
+
+    def apply(self, config: dict[str, Any], proxy_target: dict[str, str] | None) -> dict[str, Any]:
+        if not self.settings.enabled:
+            return config
+        rules = self.rules()
+        if not rules:
+            return config
+
+        config = copy.deepcopy(config)
+        outbounds = config.setdefault("outbounds", [])
+        targets: dict[str, dict[str, str]] = {}
+        if proxy_target is not None:
+            targets["proxy"] = proxy_target
+        for target, protocol in TARGET_PROTOCOLS.items():
+            if not any(rule.target == target for rule in rules):
+                continue
+            outbound = next((item for item in outbounds if item.get("protocol") == protocol and item.get("tag")), None)
+            if outbound is None:
+                outbound = {"tag": target, "protocol": protocol}
+                if any(item.get("tag") == target for item in outbounds):
+                    outbound["tag"] = f"{RULE_TAG_PREFIX}{target}"
+                outbounds.append(outbound)
+            targets[target] = {"outboundTag": outbound["tag"]}
+
+        rules = [rule for rule in rules if rule.target in targets]
+        routing = config.setdefault("routing", {})
+        kept = [
+            rule for rule in routing.get("rules", []) if not str(rule.get("ruleTag", "")).startswith(RULE_TAG_PREFIX)
+        ]
+        routing["rules"] = [*rule_dicts(rules, targets), *kept]
+        return config
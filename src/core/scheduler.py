@@ -0,0 +1,44 @@
+import random
+import time
+
+
+class RefreshScheduler:
+    def __init__(
+        self,
+        default_interval: float = 12 * 3600,
+        min_interval: float = 15 * 60,
+        retry_interval: float = 60,
+        max_retry_interval: float = 3600,
+        jitter: float = 0.1,
+    ) -> None:
+        self.default_interval: float = default_interval
+        self.min_interval: float = min_interval
+        self.retry_interval: float = retry_interval
+        self.max_retry_interval: float = max_retry_interval
+        self.jitter: float = jitter
+
+        self.failures: int = 0
+
+    def _jittered(self, delay: float) -> float:
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def interval(self, update_interval_hours: float | None) -> float:
+        if update_interval_hours:
+            return max(update_interval_hours * 3600, self.min_interval)
+        return self.default_interval
+
+    def next_delay(self, update_interval_hours: float | None, updated_at: float | None = None) -> float:
+        interval = self.interval(update_interval_hours)
+        elapsed = time.time() - updated_at if updated_at else interval
+        return self._jittered(max(interval - elapsed, 0) + self.retry_interval)
+
+    def is_due(self, update_interval_hours: float | None, updated_at: float | None) -> bool:
+        return not updated_at or time.time() - updated_at >= self.interval(update_interval_hours)
+
+    def reset(self) -> None:
+        self.failures = 0
+
+    def failure_delay(self) -> float:
+        delay = min(self.retry_interval * 2**self.failures, self.max_retry_interval)
+        self.failures += 1
+        return self._jittered(delay)
@@ -0,0 +1,77 @@
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from core.config import API_TAG, METRICS_TAG
+
+
+@dataclass
+class TrafficSample:
+    timestamp: float
+    uplink: float = 0.0
+    downlink: float = 0.0
+    outbounds: dict[str, tuple[float, float]] = field(default_factory=dict)
+
+
+class StatsCollector:
+    def __init__(self, metrics_address: str, history: int = 120, timeout: float = 2.0) -> None:
+        self.metrics_address: str = metrics_address
+        self.timeout: float = timeout
+
+        self.history: deque[TrafficSample] = deque(maxlen=history)
+        self._last_counters: dict[str, int] = {}
+        self._last_time: float | None = None
+        self._session = None
+
+    def query(self) -> dict[str, int]:
+        import requests
+
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.trust_env = False
+
+        try:
+            response = self._session.get(f"http://{self.metrics_address}/debug/vars", timeout=self.timeout)
+            response.raise_for_status()
+            stats: dict[str, Any] = response.json().get("stats") or {}
+        except (requests.RequestException, ValueError) as e:
+            raise RuntimeError(f"Stats query failed: {e}") from e
+
+        return {
+            f"{kind}>>>{tag}>>>traffic>>>{direction}": int(value)
+            for kind, tags in stats.items()
+            for tag, counters in (tags or {}).items()
+            for direction, value in (counters or {}).items()
+        }
+
+    def reset(self) -> None:
+        self.history.clear()
+        self._last_counters = {}
+        self._last_time = None
+
+    def poll(self) -> TrafficSample:
+        counters = self.query()
+        now = time.monotonic()
+        sample = TrafficSample(time.time())
+
+        if self._last_time is not None and now > self._last_time:
+            elapsed = now - self._last_time
+            rates: dict[str, list[float]] = {}
+            for name, value in counters.items():
+                kind, tag, _, direction = (name.split(">>>") + ["", "", "", ""])[:4]
+                if kind != "outbound" or tag in (API_TAG, METRICS_TAG) or direction not in ("uplink", "downlink"):
+                    continue
+
+                delta = value - self._last_counters.get(name, 0)
+                rate = max(delta, 0) / elapsed
+                rates.setdefault(tag, [0.0, 0.0])[direction == "downlink"] = rate
+
+            sample.outbounds = {tag: (up, down) for tag, (up, down) in rates.items()}
+            sample.uplink = sum(up for up, _ in sample.outbounds.values())
+            sample.downlink = sum(down for _, down in sample.outbounds.values())
+            self.history.append(sample)
+
+        self._last_counters = counters
+        self._last_time = now
+        return sample
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from core.outbound import get_credentials, get_endpoint, get_proxy_outbound, get_server_name, uses_tls
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS servers (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    remark TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    address TEXT,
+    port INTEGER,
+    server_name TEXT,
+    tls INTEGER NOT NULL,
+    config TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS servers_position ON servers (position);
+CREATE INDEX IF NOT EXISTS servers_remark ON servers (remark);
+CREATE INDEX IF NOT EXISTS servers_grp ON servers (grp);
+CREATE TABLE IF NOT EXISTS preferences (
+    id TEXT PRIMARY KEY,
+    favorite INTEGER NOT NULL DEFAULT 0,
+    last_used REAL
+);
+CREATE INDEX IF NOT EXISTS preferences_last_used ON preferences (last_used);
+"""
+
+
+@dataclass(frozen=True)
+class ServerInfo:
+    id: str
+    remark: str
+    group: str
+    address: str | None = None
+    port: int | None = None
+    server_name: str | None = None
+    tls: bool = False
+
+
+def server_id(config: dict[str, Any]) -> str:
+    outbound = get_proxy_outbound(config) or config
+    key = {name: value for name, value in outbound.items() if name != "tag"}
+    return hashlib.sha1(json.dumps(key, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def server_fingerprint(config: dict[str, Any]) -> str:
+    outbound = get_proxy_outbound(config)
+    endpoint = get_endpoint(outbound) if outbound else None
+    if endpoint is None:
+        return server_id(config)
+
+    key = [str(outbound.get("protocol", "")).lower(), endpoint[0].lower(), endpoint[1], get_credentials(outbound)]
+    return hashlib.sha1(json.dumps(key, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def server_group(remark: str) -> str:
+    remark = remark.strip()
+    if len(remark) >= 2 and all(0x1F1E6 <= ord(char) <= 0x1F1FF for char in remark[:2]):
+        return remark[:2]
+    words = remark.split(maxsplit=1)
+    return words[0] if words else ""
+
+
+def server_info(config: dict[str, Any]) -> ServerInfo:
+    remark = config.get("remarks", "No remark")
+    outbound = get_proxy_outbound(config)
+    endpoint = get_endpoint(outbound) if outbound else None
+    return ServerInfo(
+        id=server_id(config),
+        remark=remark,
+        group=server_group(remark),
+        address=endpoint[0] if endpoint else None,
+        port=endpoint[1] if endpoint else None,
+        server_name=get_server_name(outbound) if outbound else None,
+        tls=bool(outbound and uses_tls(outbound)),
+    )
+
+
+class ServerStore:
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+        self._servers: list[ServerInfo] | None = None
+        self._by_id: dict[str, ServerInfo] = {}
+
+    def _load(self) -> list[ServerInfo]:
+        if self._servers is None:
+            rows = self._conn.execute(
+                "SELECT id, remark, grp, address, port, server_name, tls FROM servers ORDER BY position"
+            ).fetchall()
+            self._servers = [ServerInfo(*row[:6], bool(row[6])) for row in rows]
+            self._by_id = {server.id: server for server in self._servers}
+        return self._servers
+
+    def servers(self) -> list[ServerInfo]:
+        with self._lock:
+            return self._load()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM servers").fetchone()[0]
+
+    def info(self, server_id: str) -> ServerInfo | None:
+        with self._lock:
+            self._load()
+            return self._by_id.get(server_id)
+
+    def find_by_remark(self, remark: str) -> list[ServerInfo]:
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM servers WHERE remark = ? ORDER BY position", (remark,)).fetchall()
+        return [self.info(row[0]) for row in rows]
+
+    def get(self, server_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._conn.execute("SELECT config FROM servers WHERE id = ?", (server_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, server_ids: list[str]) -> dict[str, dict[str, Any]]:
+        configs = {}
+        with self._lock:
+            for server_id in server_ids:
+                row = self._conn.execute("SELECT config FROM servers WHERE id = ?", (server_id,)).fetchone()
+                if row:
+                    configs[server_id] = json.loads(row[0])
+        return configs
+
+    def replace(self, configs: list[dict[str, Any]]) -> list[ServerInfo]:
+        infos, kept = [], []
+        seen: dict[str, ServerInfo] = {}
+        for config in configs:
+            info = server_info(config)
+            if info.id in seen:
+                logger.warning(
+                    "Skipping server %r: its outbound is identical to %r (id %s)",
+                    info.remark,
+                    seen[info.id].remark,
+                    info.id,
+                )
+                continue
+            seen[info.id] = info
+            infos.append(info)
+            kept.append(config)
+
+        rows = [
+            (
+                info.id,
+                position,
+                info.remark,
+                info.group,
+                info.address,
+                info.port,
+                info.server_name,
+                int(info.tls),
+                json.dumps(config, ensure_ascii=False, separators=(",", ":")),
+            )
+            for position, (info, config) in enumerate(zip(infos, kept))
+        ]
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM servers")
+            self._conn.executemany("INSERT INTO servers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._servers = None
+        return infos
+
+    def favorites(self) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.id FROM preferences p JOIN servers s ON s.id = p.id WHERE p.favorite ORDER BY s.position"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def set_favorite(self, server_id: str, favorite: bool) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO preferences (id, favorite) VALUES (?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET favorite = excluded.favorite",
+                (server_id, int(favorite)),
+            )
+
+    def recent(self, limit: int = 5) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.id FROM preferences p JOIN servers s ON s.id = p.id "
+                "WHERE p.last_used IS NOT NULL ORDER BY p.last_used DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def touch(self, server_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO preferences (id, last_used) VALUES (?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET last_used = excluded.last_used",
+                (server_id, time.time()),
+            )
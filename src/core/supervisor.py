@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Iterable
+
+
+class ProcessWatcher:
+    def __init__(
+        self,
+        process: Any,
+        on_exit: Callable[[int | None], None],
+        stream: Iterable[bytes] | None = None,
+        on_line: Callable[[str], None] | None = None,
+        tail_lines: int = 50,
+        max_line_length: int = 1000,
+    ) -> None:
+        self.process: Any = process
+        self.on_exit = on_exit
+        self.on_line = on_line
+        self.tail: deque[str] = deque(maxlen=tail_lines)
+        self.max_line_length: int = max_line_length
+        self.cancelled: bool = False
+
+        self._reader: threading.Thread | None = None
+        if stream is not None:
+            self._reader = threading.Thread(target=self._read, args=(stream,), name="ProcessReader", daemon=True)
+            self._reader.start()
+
+        self._waiter = threading.Thread(target=self._wait, name="ProcessWatcher", daemon=True)
+        self._waiter.start()
+
+    def handle_line(self, line: str) -> None:
+        self.tail.append(line[: self.max_line_length])
+        if self.on_line is not None:
+            self.on_line(line)
+
+    def _read(self, stream: Iterable[bytes]) -> None:
+        try:
+            for raw_line in stream:
+                self.handle_line(raw_line.decode("utf-8", "replace").rstrip())
+        except (OSError, ValueError):
+            pass
+
+    def _wait(self) -> None:
+        import psutil
+
+        try:
+            returncode = self.process.wait()
+        except psutil.Error:
+            returncode = None
+
+        if self._reader is not None:
+            self._reader.join(1)
+        if not self.cancelled:
+            self.on_exit(returncode)
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class RestartPolicy:
+    def __init__(
+        self,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        max_crashes: int = 5,
+        window: float = 120.0,
+    ) -> None:
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.max_crashes: int = max_crashes
+        self.window: float = window
+
+        self._crashes: deque[float] = deque()
+
+    def reset(self) -> None:
+        self._crashes.clear()
+
+    def record_crash(self) -> float | None:
+        now = time.monotonic()
+        self._crashes.append(now)
+        while self._crashes and now - self._crashes[0] > self.window:
+            self._crashes.popleft()
+
+        if len(self._crashes) > self.max_crashes:
+            return None
+        return min(self.base_delay * 2 ** (len(self._crashes) - 1), self.max_delay)
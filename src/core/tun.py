@@ -1,36 +1,157 @@
+import msvcrt
 import os
+import secrets
+import uuid
+from typing import Any, Callable, Iterator
 
-import psutil
-import win32com.shell.shell as shell
+import pywintypes
 import win32con
+import win32file
+import win32pipe
 import win32process
-from win32com.shell import shellcon
+
+from core.logs import LogPipeline
+from core.mihomo import MihomoController, MihomoError
+from core.mihomo_config import TunConfigBuilder
+from core.supervisor import ProcessWatcher
+from core.tun_helper import TunHelperClient, TunHelperError
+
+
+class LogPipe:
+    def __init__(self) -> None:
+        self.path: str = rf"\\.\pipe\mihomo-{uuid.uuid4().hex}"
+        self.connected: bool = False
+        self._handle = win32pipe.CreateNamedPipe(
+            self.path,
+            win32pipe.PIPE_ACCESS_INBOUND,
+            win32pipe.PIPE_TYPE_BYTE | win32pipe.PIPE_WAIT,
+            1,
+            0,
+            65536,
+            0,
+            None,
+        )
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            win32pipe.ConnectNamedPipe(self._handle, None)
+        except pywintypes.error:
+            self._handle.Close()
+            return
+
+        self.connected = True
+        fd = msvcrt.open_osfhandle(self._handle.Detach(), os.O_RDONLY)
+        with os.fdopen(fd, "rb") as stream:
+            yield from stream
+
+    def close(self) -> None:
+        if self.connected:
+            return
+        try:
+            win32file.CreateFile(self.path, win32file.GENERIC_WRITE, 0, None, win32file.OPEN_EXISTING, 0, None).Close()
+        except pywintypes.error:
+            pass
 
 
 class TunManager:
-    def __init__(self, executable_path: str, config_path: str, log_path: str) -> None:
+    def __init__(
+        self,
+        executable_path: str,
+        config_path: str,
+        log: LogPipeline,
+        helper: TunHelperClient | None = None,
+        controller_address: str | None = None,
+        home_dir: str | None = None,
+        builder: TunConfigBuilder | None = None,
+        stop_timeout: float = 5.0,
+    ) -> None:
         self.executable_path: str = executable_path
         self.config_path: str = config_path
-        self.log_path: str = log_path
+        self.home_dir: str = home_dir or os.path.dirname(executable_path)
+        self.builder: TunConfigBuilder | None = builder
+        self.log: LogPipeline = log
+        self.helper: TunHelperClient | None = helper
+        self.stop_timeout: float = stop_timeout
+        self.controller: MihomoController | None = (
+            MihomoController(controller_address, secrets.token_hex(16)) if controller_address else None
+        )
 
-        self._process: psutil.Process | None = None
+        self.on_exit: Callable[[int | None], None] | None = None
+
+        self._process = None
+        self._watcher: ProcessWatcher | None = None
+        self._pipe: LogPipe | None = None
+        self._helper_running: bool = False
 
     def is_running(self) -> bool:
+        if self._helper_running:
+            return True
         return self._process is not None and self._process.is_running()
 
+    def _start_with_helper(self) -> bool:
+        if not self.helper.available() and not self.helper.launch():
+            return False
+
+        try:
+            config = self._helper_config()
+        except (OSError, ValueError) as e:
+            self.log.write(f"[Error] Failed to prepare the TUN config: {e}")
+            return False
+        try:
+            self.helper.subscribe(self.log.write, self._on_helper_exit)
+            self.helper.request("start", config=config, **self._controller_args())
+        except TunHelperError as e:
+            self.log.write(f"[Error] {e}")
+            return False
+
+        self._helper_running = True
+        return True
+
+    def _helper_config(self) -> str:
+        source = self.builder.read_source() if self.builder is not None else None
+        if source is not None:
+            return self.builder.build(source, offline=True, localize=False)
+        with open(self.config_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def _controller_args(self) -> dict[str, str]:
+        if self.controller is None:
+            return {}
+        return {"controller": self.controller.address, "secret": self.controller.secret}
+
+    def _prepare_config(self) -> None:
+        if self.builder is None:
+            return
+        try:
+            self.builder.seed()
+            self.builder.refresh(self.config_path)
+        except (OSError, ValueError) as e:
+            self.log.write(f"[Warning] Failed to apply TUN overrides: {e}")
+
     def start(self) -> bool:
         if self.is_running():
             return True
 
+        self._prepare_config()
         if not os.path.isfile(self.config_path):
             return False
 
+        if self.helper is not None and self._start_with_helper():
+            return True
+
+        from win32com.shell import shell, shellcon
+
+        self._pipe = LogPipe()
+        controller = (
+            f'-ext-ctl "{self.controller.address}" -secret "{self.controller.secret}" ' if self.controller else ""
+        )
         params = (
             f'/C "'
             f'"{self.executable_path}" '
-            f'-d "{os.path.dirname(self.executable_path)}" '
+            f'-d "{self.home_dir}" '
             f'-f "{self.config_path}" '
-            f'>> "{self.log_path}" 2>&1'
+            f"{controller}"
+            f'> "{self._pipe.path}" 2>&1'
             f'"'
         )
 
@@ -43,18 +164,103 @@ class TunManager:
                 lpDirectory=os.path.dirname(self.executable_path),
                 nShow=win32con.SW_HIDE,
             )
+            import psutil
+
             pid = win32process.GetProcessId(info["hProcess"])
             self._process = psutil.Process(pid)
+            self._watcher = ProcessWatcher(self._process, self._on_exit, self._pipe, self.log.write)
             return True
         except Exception:
             self._process = None
+            self._pipe.close()
             return False
 
+    def reload(self) -> bool:
+        self._prepare_config()
+        if self.controller is not None and self.is_running():
+            try:
+                if self._helper_running:
+                    self.controller.load(self._helper_config())
+                else:
+                    self.controller.reload(self.config_path)
+                return True
+            except (OSError, ValueError, MihomoError) as e:
+                self.log.write(f"[Warning] Hot reload failed, restarting: {e}")
+
+        if self._helper_running:
+            try:
+                self.helper.request("reload", config=self._helper_config())
+                return True
+            except (OSError, ValueError, TunHelperError):
+                self._helper_running = False
+                return self.start()
+
+        self.stop()
+        return self.start()
+
+    def status(self) -> dict[str, Any] | None:
+        if self.controller is None or not self.is_running():
+            return None
+        try:
+            return self.controller.status()
+        except MihomoError:
+            return None
+
     def stop(self) -> None:
+        if self.controller is not None and self.is_running():
+            try:
+                self.controller.disable_tun()
+            except MihomoError:
+                pass
+
+        if self._helper_running:
+            self._helper_running = False
+            try:
+                self.helper.request("stop")
+            except TunHelperError:
+                pass
+            return
+
+        if self._watcher is not None:
+            self._watcher.cancel()
+        if self._pipe is not None:
+            self._pipe.close()
+
         if not self.is_running():
             return
 
-        for child in self._process.children(recursive=True):
-            child.kill()
-        self._process.kill()
+        import psutil
+
+        try:
+            processes = [*self._process.children(recursive=True), self._process]
+        except psutil.Error:
+            processes = [self._process]
+        for process in processes:
+            try:
+                process.terminate()
+            except psutil.Error:
+                pass
+        _, alive = psutil.wait_procs(processes, timeout=self.stop_timeout)
+        for process in alive:
+            try:
+                process.kill()
+            except psutil.Error:
+                pass
+        self._process = None
+
+    def output_tail(self, lines: int = 50) -> list[str]:
+        return self.log.tail(lines)
+
+    def _on_helper_exit(self, returncode: int | None) -> None:
+        if not self._helper_running:
+            return
+        self._helper_running = False
+        if self.on_exit is not None:
+            self.on_exit(returncode)
+
+    def _on_exit(self, returncode: int | None) -> None:
         self._process = None
+        if self._pipe is not None:
+            self._pipe.close()
+        if self.on_exit is not None:
+            self.on_exit(returncode)
@@ -0,0 +1,514 @@
+import ipaddress
+import logging
+import os
+import re
+import stat
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable
+
+from core.mihomo_config import seed_geodata
+from core.supervisor import ProcessWatcher
+from utils.protocol import FrameDecoder, LocalListener, ProtocolError, connect_stream, encode_message
+
+logger = logging.getLogger(__name__)
+
+CONFIG_NAME = "config.yaml"
+SYSTEM_SID = "S-1-5-18"
+ADMINISTRATORS_SID = "S-1-5-32-544"
+
+_SECRET_PATTERN = re.compile(r"[0-9A-Za-z_-]{1,128}")
+
+
+def controller_arguments(args: dict[str, Any]) -> list[str]:
+    controller, secret = args.get("controller"), args.get("secret")
+    if not controller:
+        return []
+
+    host, _, port = str(controller).rpartition(":")
+    if not ipaddress.ip_address(host).is_loopback or not port.isdigit():
+        raise TunHelperError("External controller must listen on loopback")
+    if not _SECRET_PATTERN.fullmatch(str(secret or "")):
+        raise TunHelperError("Invalid external controller secret")
+    return ["-ext-ctl", f"{host}:{port}", "-secret", str(secret)]
+
+
+def is_admin_only_path(path: str) -> bool:
+    path = os.path.normcase(os.path.realpath(path))
+    for name in ("ProgramFiles", "ProgramFiles(x86)", "ProgramW6432"):
+        root = os.environ.get(name)
+        if not root:
+            continue
+        root = os.path.normcase(os.path.realpath(root))
+        try:
+            if os.path.commonpath([path, root]) == root and path != root:
+                return True
+        except ValueError:
+            continue
+    return False
+
+
+def session_pipe_name(prefix: str) -> str:
+    if sys.platform != "win32":
+        return f"{prefix}-{os.getuid()}"
+
+    import win32ts
+
+    return f"{prefix}-{win32ts.ProcessIdToSessionId(os.getpid())}"
+
+
+def secure_directory(path: str) -> None:
+    if sys.platform != "win32":
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        os.chmod(path, 0o700)
+        return
+
+    import ntsecuritycon
+    import win32file
+    import win32security
+
+    system = win32security.ConvertStringSidToSid(SYSTEM_SID)
+    administrators = win32security.ConvertStringSidToSid(ADMINISTRATORS_SID)
+    dacl = win32security.ACL()
+    for sid in (system, administrators):
+        dacl.AddAccessAllowedAceEx(
+            win32security.ACL_REVISION,
+            win32security.OBJECT_INHERIT_ACE | win32security.CONTAINER_INHERIT_ACE,
+            ntsecuritycon.FILE_ALL_ACCESS,
+            sid,
+        )
+
+    if not os.path.lexists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor = win32security.SECURITY_DESCRIPTOR()
+        descriptor.SetSecurityDescriptorOwner(administrators, False)
+        descriptor.SetSecurityDescriptorDacl(True, dacl, False)
+        descriptor.SetSecurityDescriptorControl(win32security.SE_DACL_PROTECTED, win32security.SE_DACL_PROTECTED)
+        attributes = win32security.SECURITY_ATTRIBUTES()
+        attributes.SECURITY_DESCRIPTOR = descriptor
+        win32file.CreateDirectory(path, attributes)
+        return
+
+    if os.lstat(path).st_file_attributes & stat.FILE_ATTRIBUTE_REPARSE_POINT or not os.path.isdir(path):
+        raise TunHelperError(f"Refusing to use {path}: not a plain directory")
+    owner = win32security.GetNamedSecurityInfo(
+        path, win32security.SE_FILE_OBJECT, win32security.OWNER_SECURITY_INFORMATION
+    ).GetSecurityDescriptorOwner()
+    if owner not in (system, administrators):
+        raise TunHelperError(f"Refusing to use {path}: not owned by an administrator")
+    win32security.SetNamedSecurityInfo(
+        path,
+        win32security.SE_FILE_OBJECT,
+        win32security.DACL_SECURITY_INFORMATION | win32security.PROTECTED_DACL_SECURITY_INFORMATION,
+        None,
+        None,
+        dacl,
+        None,
+    )
+
+
+def pipe_security() -> Any:
+    if sys.platform != "win32":
+        return None
+
+    import ntsecuritycon
+    import win32api
+    import win32security
+
+    token = win32security.OpenProcessToken(win32api.GetCurrentProcess(), win32security.TOKEN_QUERY)
+    logon_sid = next(
+        sid
+        for sid, attributes in win32security.GetTokenInformation(token, win32security.TokenGroups)
+        if attributes & ntsecuritycon.SE_GROUP_LOGON_ID
+    )
+    dacl = win32security.ACL()
+    for sid in (SYSTEM_SID, ADMINISTRATORS_SID):
+        dacl.AddAccessAllowedAce(
+            win32security.ACL_REVISION, ntsecuritycon.GENERIC_ALL, win32security.ConvertStringSidToSid(sid)
+        )
+    dacl.AddAccessAllowedAce(
+        win32security.ACL_REVISION, ntsecuritycon.FILE_GENERIC_READ | ntsecuritycon.FILE_WRITE_DATA, logon_sid
+    )
+
+    descriptor = win32security.SECURITY_DESCRIPTOR()
+    descriptor.SetSecurityDescriptorDacl(True, dacl, False)
+    attributes = win32security.SECURITY_ATTRIBUTES()
+    attributes.SECURITY_DESCRIPTOR = descriptor
+    return attributes
+
+
+class TunHelperError(Exception):
+    pass
+
+
+def _read_messages(stream: Any, decoder: FrameDecoder) -> list[dict[str, Any]]:
+    data = stream.read(65536)
+    if not data:
+        raise ConnectionError("Connection closed")
+    return decoder.feed(data)
+
+
+class TunHelperServer:
+    def __init__(self, pipe_name: str, executable_path: str, directory: str) -> None:
+        self.pipe_name: str = pipe_name
+        self.executable_path: str = executable_path
+        self.directory: str = directory
+        self.config_path: str = os.path.join(directory, CONFIG_NAME)
+
+        self._listener = LocalListener(pipe_name, pipe_security())
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._shutdown = threading.Event()
+        self._connections: list[Any] = []
+        self._subscribers: list[Any] = []
+        self._process = None
+        self._watcher: ProcessWatcher | None = None
+        self._config: str | None = None
+        self._extra_args: list[str] = []
+
+    def serve_forever(self) -> None:
+        logger.info("TUN helper listening on %s", self._listener.path)
+        try:
+            while not self._shutdown.is_set():
+                try:
+                    stream = self._listener.accept()
+                except OSError as e:
+                    logger.warning("TUN helper accept failed: %s", e)
+                    continue
+                if stream is None:
+                    continue
+                with self._lock:
+                    self._connections.append(stream)
+                threading.Thread(target=self._handle, args=(stream,), name="TunHelperConnection", daemon=True).start()
+        finally:
+            self._stop_process()
+            self._listener.close()
+            with self._lock:
+                connections, self._connections, self._subscribers = self._connections, [], []
+            for stream in connections:
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+
+    def shutdown(self) -> None:
+        self._shutdown.set()
+
+    def _handle(self, stream: Any) -> None:
+        decoder = FrameDecoder()
+        try:
+            while not self._shutdown.is_set():
+                try:
+                    messages = _read_messages(stream, decoder)
+                except TimeoutError:
+                    continue
+                for message in messages:
+                    reply = self._dispatch(message)
+                    with self._send_lock:
+                        stream.write(encode_message({"id": message.get("id"), **reply}))
+                    if reply.get("ok") and message.get("command") == "subscribe":
+                        with self._lock:
+                            self._subscribers.append(stream)
+        except (OSError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            with self._lock:
+                if stream in self._subscribers:
+                    self._subscribers.remove(stream)
+                if stream not in self._connections:
+                    return
+                self._connections.remove(stream)
+            stream.close()
+
+    def _dispatch(self, message: dict[str, Any]) -> dict[str, Any]:
+        command = message.get("command")
+        args = message.get("args") or {}
+        try:
+            if command in ("ping", "subscribe"):
+                result = {"pid": os.getpid()}
+            elif command == "status":
+                result = {"running": self._is_running()}
+            elif command == "start":
+                result = self._start_process(args["config"], controller_arguments(args))
+            elif command == "reload":
+                self._stop_process()
+                result = self._start_process(args.get("config", self._config), self._extra_args)
+            elif command == "stop":
+                self._stop_process()
+                result = None
+            elif command == "shutdown":
+                self.shutdown()
+                result = None
+            else:
+                return {"ok": False, "error": f"Unknown command: {command}"}
+        except (KeyError, TypeError, ValueError):
+            return {"ok": False, "error": "Invalid arguments"}
+        except TunHelperError as e:
+            return {"ok": False, "error": str(e)}
+        return {"ok": True, "result": result}
+
+    def _is_running(self) -> bool:
+        return self._process is not None and self._process.is_running()
+
+    def _write_config(self, config: str) -> None:
+        tmp_path = f"{self.config_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(config)
+            os.replace(tmp_path, self.config_path)
+        except OSError as e:
+            raise TunHelperError(f"Failed to write the TUN config: {e}") from e
+
+    def _start_process(self, config: str | None, extra_args: list[str]) -> dict[str, Any]:
+        import psutil
+
+        if not isinstance(config, str):
+            raise TypeError("config must be the config text")
+        with self._lock:
+            if self._is_running() and config == self._config and extra_args == self._extra_args:
+                return {"pid": self._process.pid}
+        self._stop_process()
+
+        self._write_config(config)
+        directory = os.path.dirname(self.executable_path)
+        try:
+            seed_geodata(directory, self.directory)
+        except OSError as e:
+            logger.warning("Failed to seed geodata into %s: %s", self.directory, e)
+        try:
+            process = psutil.Popen(
+                [self.executable_path, "-d", self.directory, "-f", self.config_path, *extra_args],
+                cwd=directory,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                creationflags=subprocess.CREATE_NO_WINDOW,
+            )
+        except OSError as e:
+            raise TunHelperError(f"Failed to start {self.executable_path}: {e}") from e
+
+        with self._lock:
+            self._process = process
+            self._config = config
+            self._extra_args = extra_args
+            self._watcher = ProcessWatcher(
+                process,
+                lambda returncode: self._broadcast({"event": "exit", "returncode": returncode}),
+                process.stdout,
+                lambda line: self._broadcast({"event": "output", "line": line}),
+            )
+        return {"pid": process.pid}
+
+    def _stop_process(self) -> None:
+        import psutil
+
+        with self._lock:
+            process, self._process = self._process, None
+            if self._watcher is not None:
+                self._watcher.cancel()
+                self._watcher = None
+
+        if process is None:
+            return
+        try:
+            process.kill()
+            process.wait(5)
+        except psutil.Error:
+            pass
+
+    def _broadcast(self, event: dict[str, Any]) -> None:
+        data = encode_message(event)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for stream in subscribers:
+            try:
+                with self._send_lock:
+                    stream.write(data)
+            except OSError:
+                with self._lock:
+                    if stream in self._subscribers:
+                        self._subscribers.remove(stream)
+
+
+class TunHelperClient:
+    def __init__(
+        self,
+        pipe_name: str,
+        task_name: str,
+        launch_command: list[str] | None = None,
+        protected_paths: list[str] | None = None,
+        timeout: float = 3.0,
+    ) -> None:
+        self.pipe_name: str = pipe_name
+        self.task_name: str = task_name
+        self.launch_command: list[str] | None = launch_command
+        self.protected_paths: list[str] = protected_paths or []
+        self.timeout: float = timeout
+
+        self._events: Any = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Any:
+        try:
+            stream = connect_stream(self.pipe_name, self.timeout)
+        except TimeoutError as e:
+            raise TunHelperError("TUN helper is not reachable") from e
+        if stream is None:
+            raise TunHelperError("TUN helper is not running")
+        return stream
+
+    @staticmethod
+    def _call(stream: Any, command: str, args: dict[str, Any]) -> Any:
+        decoder = FrameDecoder()
+        try:
+            stream.write(encode_message({"id": 1, "command": command, "args": args}))
+            while True:
+                messages = _read_messages(stream, decoder)
+                if messages:
+                    break
+        except (OSError, ConnectionError, ProtocolError) as e:
+            raise TunHelperError(f"TUN helper request failed: {e}") from e
+
+        reply = messages[0]
+        if not reply.get("ok"):
+            raise TunHelperError(reply.get("error") or "TUN helper request failed")
+        return reply.get("result")
+
+    def request(self, command: str, **args: Any) -> Any:
+        stream = self._connect()
+        try:
+            return TunHelperClient._call(stream, command, args)
+        finally:
+            stream.close()
+
+    def available(self) -> bool:
+        try:
+            self.request("ping")
+        except TunHelperError:
+            return False
+        return True
+
+    def subscribe(self, on_line: Callable[[str], None], on_exit: Callable[[int | None], None]) -> None:
+        with self._lock:
+            if self._events is not None:
+                return
+            stream = self._connect()
+            try:
+                TunHelperClient._call(stream, "subscribe", {})
+            except TunHelperError:
+                stream.close()
+                raise
+            stream.settimeout(None)
+            self._events = stream
+
+        threading.Thread(
+            target=self._read_events, args=(stream, on_line, on_exit), name="TunHelperEvents", daemon=True
+        ).start()
+
+    def _read_events(self, stream: Any, on_line: Callable[[str], None], on_exit: Callable[[int | None], None]) -> None:
+        decoder = FrameDecoder()
+        exited = False
+        try:
+            while not exited:
+                for event in _read_messages(stream, decoder):
+                    if event.get("event") == "output":
+                        on_line(event.get("line", ""))
+                    elif event.get("event") == "exit":
+                        exited = True
+                        on_exit(event.get("returncode"))
+                        break
+        except (OSError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            with self._lock:
+                if self._events is stream:
+                    self._events = None
+            stream.close()
+        if not exited:
+            on_exit(None)
+
+    def is_safe(self) -> bool:
+        if not self.launch_command:
+            return False
+
+        executable, *args = self.launch_command
+        if any(not arg.startswith("-") for arg in args):
+            logger.warning("Refusing to run the TUN helper task through a script: %s", args)
+            return False
+        unsafe = [path for path in (executable, *self.protected_paths) if not is_admin_only_path(path)]
+        if unsafe:
+            logger.warning("Refusing to run the TUN helper task from user-writable %s", ", ".join(unsafe))
+            return False
+        return True
+
+    def launch(self, wait: float = 10.0) -> bool:
+        if not self.is_safe():
+            return False
+        if not self._run_task() and not self._install_task():
+            return False
+
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            if self.available():
+                return True
+            time.sleep(0.2)
+        return False
+
+    def _run_task(self) -> bool:
+        result = subprocess.run(
+            ["schtasks", "/Run", "/TN", self.task_name],
+            capture_output=True,
+            creationflags=subprocess.CREATE_NO_WINDOW,
+        )
+        return result.returncode == 0
+
+    def _install_task(self) -> bool:
+        if not self.is_safe():
+            return False
+
+        import win32con
+        import win32event
+        from win32com.shell import shell, shellcon
+
+        task_command = subprocess.list2cmdline(self.launch_command)
+        schedule = ["/SC", "ONLOGON", "/RL", "HIGHEST", "/TR", task_command]
+        create = subprocess.list2cmdline(["schtasks", "/Create", "/F", "/TN", self.task_name, *schedule])
+        run = subprocess.list2cmdline(["schtasks", "/Run", "/TN", self.task_name])
+        try:
+            info = shell.ShellExecuteEx(
+                fMask=shellcon.SEE_MASK_NOCLOSEPROCESS,
+                lpVerb="runas",
+                lpFile="cmd.exe",
+                lpParameters=f'/C "{create} && {run}"',
+                nShow=win32con.SW_HIDE,
+            )
+            win32event.WaitForSingleObject(info["hProcess"], 60000)
+        except Exception:
+            logger.exception("Failed to install the TUN helper task")
+            return False
+        return True
+
+    def uninstall(self) -> None:
+        try:
+            self.request("shutdown")
+        except TunHelperError:
+            pass
+
+        from win32com.shell import shell
+
+        shell.ShellExecuteEx(
+            lpVerb="runas",
+            lpFile="schtasks.exe",
+            lpParameters=subprocess.list2cmdline(["/Delete", "/F", "/TN", self.task_name]),
+        )
+
+
+def run_helper(pipe_name: str, executable_path: str, directory: str) -> int:
+    try:
+        server = TunHelperServer(pipe_name, executable_path, directory)
+    except OSError as e:
+        logger.error("TUN helper could not claim %s: %s", pipe_name, e)
+        return 1
+    server.serve_forever()
+    return 0
@@ -0,0 +1,207 @@
+import copy
+import json
+import logging
+import os
+from typing import Any
+
+from core.outbound import SERVICE_PROTOCOLS
+from core.store import ServerInfo
+
+logger = logging.getLogger(__name__)
+
+LOG_LEVELS = ("debug", "info", "warning", "error", "none")
+PROFILE_SECTIONS: dict[str, dict[str, type | tuple[type, ...]]] = {
+    "sockopt": {
+        "tcpFastOpen": (bool, int),
+        "tcpKeepAliveInterval": int,
+        "tcpKeepAliveIdle": int,
+        "tcpNoDelay": bool,
+        "tcpMptcp": bool,
+        "tcpcongestion": str,
+        "mark": int,
+    },
+    "mux": {"enabled": bool, "concurrency": int, "xudpConcurrency": int, "xudpProxyUDP443": str},
+    "sniffing": {"enabled": bool, "routeOnly": bool, "metadataOnly": bool, "destOverride": list},
+    "policy": {"bufferSize": int, "connIdle": int, "handshake": int, "uplinkOnly": int, "downlinkOnly": int},
+}
+
+
+def _matches(value: Any, expected: type | tuple[type, ...]) -> bool:
+    expected = expected if isinstance(expected, tuple) else (expected,)
+    if isinstance(value, bool) and bool not in expected:
+        return False
+    return isinstance(value, expected)
+
+
+def validate_profile(profile: Any) -> list[str]:
+    if not isinstance(profile, dict):
+        return ["Profile must be an object"]
+
+    errors = []
+    for section, options in profile.items():
+        if section == "loglevel":
+            if options not in LOG_LEVELS:
+                errors.append(f"Invalid loglevel: {options!r}")
+            continue
+
+        keys = PROFILE_SECTIONS.get(section)
+        if keys is None:
+            errors.append(f"Unknown section: {section}")
+            continue
+        if not isinstance(options, dict):
+            errors.append(f"Section {section} must be an object")
+            continue
+
+        for key, value in options.items():
+            if key not in keys:
+                errors.append(f"Unknown option: {section}.{key}")
+            elif not _matches(value, keys[key]):
+                errors.append(f"Invalid value for {section}.{key}: {value!r}")
+    return errors
+
+
+def apply_profile(config: dict[str, Any], profile: dict[str, Any]) -> dict[str, Any]:
+    config = copy.deepcopy(config)
+
+    for outbound in config.get("outbounds", []):
+        if outbound.get("protocol") in SERVICE_PROTOCOLS:
+            continue
+        if "sockopt" in profile:
+            outbound.setdefault("streamSettings", {}).setdefault("sockopt", {}).update(profile["sockopt"])
+        if "mux" in profile:
+            outbound["mux"] = {**outbound.get("mux", {}), **profile["mux"]}
+
+    if "sniffing" in profile:
+        for inbound in config.get("inbounds", []):
+            inbound["sniffing"] = {**inbound.get("sniffing", {}), **profile["sniffing"]}
+
+    if "policy" in profile:
+        levels = config.setdefault("policy", {}).setdefault("levels", {})
+        levels.setdefault("0", {}).update(profile["policy"])
+
+    if "loglevel" in profile:
+        config.setdefault("log", {})["loglevel"] = profile["loglevel"]
+
+    return config
+
+
+def validate_config(config: dict[str, Any]) -> list[str]:
+    errors = []
+
+    outbounds = config.get("outbounds", [])
+    if not outbounds:
+        errors.append("No outbounds")
+
+    tags = [outbound.get("tag") for outbound in outbounds if outbound.get("tag")]
+    duplicates = sorted({tag for tag in tags if tags.count(tag) > 1})
+    if duplicates:
+        errors.append(f"Duplicate outbound tags: {', '.join(duplicates)}")
+
+    routing = config.get("routing", {})
+    balancers = {balancer.get("tag") for balancer in routing.get("balancers", [])}
+    for rule in routing.get("rules", []):
+        if rule.get("outboundTag") and rule["outboundTag"] not in tags:
+            errors.append(f"Rule references unknown outbound: {rule['outboundTag']}")
+        if rule.get("balancerTag") and rule["balancerTag"] not in balancers:
+            errors.append(f"Rule references unknown balancer: {rule['balancerTag']}")
+
+    for outbound in outbounds:
+        mux = outbound.get("mux", {})
+        if not mux.get("enabled") or mux.get("concurrency", 8) < 0:
+            continue
+        users = [user for server in outbound.get("settings", {}).get("vnext", []) for user in server.get("users", [])]
+        if any(str(user.get("flow", "")).startswith("xtls-rprx-vision") for user in users):
+            errors.append(f"Mux requires a negative concurrency with XTLS Vision on {outbound.get('tag', 'proxy')}")
+
+    return errors
+
+
+class TuningManager:
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+
+        self.profiles: dict[str, dict[str, Any]] = {}
+        self.default: str | None = None
+        self.servers: dict[str, str] = {}
+        self.groups: dict[str, str] = {}
+
+        self._rejected: dict[str, Any] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.isfile(self.path):
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Failed to read tuning profiles %s: %s", self.path, e)
+            return
+
+        for name, profile in data.get("profiles", {}).items():
+            errors = validate_profile(profile)
+            if errors:
+                logger.warning("Ignoring tuning profile %r: %s", name, "; ".join(errors))
+                self._rejected[name] = profile
+            else:
+                self.profiles[name] = profile
+        self.default = data.get("default")
+        self.servers = data.get("servers", {})
+        self.groups = data.get("groups", {})
+
+    def save(self) -> None:
+        data = {
+            "profiles": {**self._rejected, **self.profiles},
+            "default": self.default,
+            "servers": self.servers,
+            "groups": self.groups,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def profile_name(self, server: ServerInfo | None) -> str | None:
+        if server is not None:
+            if server.id in self.servers:
+                return self.servers[server.id]
+            if server.group in self.groups:
+                return self.groups[server.group]
+        return self.default
+
+    def assign(self, profile: str | None, server_id: str | None = None, group: str | None = None) -> None:
+        if profile is not None and profile not in self.profiles:
+            raise ValueError(f"Unknown tuning profile: {profile}")
+
+        if server_id is not None:
+            target = self.servers
+            key = server_id
+        elif group is not None:
+            target = self.groups
+            key = group
+        else:
+            self.default = profile
+            self.save()
+            return
+
+        if profile is None:
+            target.pop(key, None)
+        else:
+            target[key] = profile
+        self.save()
+
+    def apply(self, config: dict[str, Any], server: ServerInfo | None) -> dict[str, Any]:
+        name = self.profile_name(server)
+        if name is None or name not in self.profiles:
+            return config
+
+        tuned = apply_profile(config, self.profiles[name])
+        existing = validate_config(config)
+        errors = [error for error in validate_config(tuned) if error not in existing]
+        if errors:
+            logger.warning("Tuning profile %r rejected: %s", name, "; ".join(errors))
+            return config
+
+        tuned["tuning"] = name
+        return tuned
@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import socket
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from core.latency import LatencyResult
+from core.outbound import get_proxy_outbound
+
+logger = logging.getLogger(__name__)
+
+
+class UrlTestError(Exception):
+    pass
+
+
+class UrlTester:
+    def __init__(
+        self,
+        executable_path: str,
+        url: str = "https://www.gstatic.com/generate_204",
+        timeout: float = 5.0,
+        startup_timeout: float = 5.0,
+        max_workers: int = 32,
+        listen_addr: str = "127.0.0.1",
+        start_attempts: int = 3,
+    ) -> None:
+        self.executable_path: str = executable_path
+        self.url: str = url
+        self.timeout: float = timeout
+        self.startup_timeout: float = startup_timeout
+        self.max_workers: int = max_workers
+        self.listen_addr: str = listen_addr
+        self.start_attempts: int = start_attempts
+
+    def _free_ports(self, count: int) -> list[int]:
+        sockets = []
+        try:
+            for _ in range(count):
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.bind((self.listen_addr, 0))
+                sockets.append(sock)
+            return [sock.getsockname()[1] for sock in sockets]
+        finally:
+            for sock in sockets:
+                sock.close()
+
+    def build_config(self, outbounds: list[dict[str, Any]], ports: list[int]) -> dict[str, Any]:
+        config: dict[str, Any] = {
+            "log": {"loglevel": "none"},
+            "inbounds": [],
+            "outbounds": [],
+            "routing": {"rules": []},
+        }
+        for i, (outbound, port) in enumerate(zip(outbounds, ports)):
+            config["inbounds"].append(
+                {"tag": f"test-in-{i}", "listen": self.listen_addr, "port": port, "protocol": "http"}
+            )
+            config["outbounds"].append({**outbound, "tag": f"test-out-{i}"})
+            config["routing"]["rules"].append(
+                {"type": "field", "inboundTag": [f"test-in-{i}"], "outboundTag": f"test-out-{i}"}
+            )
+        return config
+
+    def _wait_for_ports(self, process: Any, ports: list[int]) -> bool:
+        deadline = time.monotonic() + self.startup_timeout
+        pending = list(ports)
+        while pending and time.monotonic() < deadline:
+            if process.poll() is not None:
+                return False
+            try:
+                with socket.create_connection((self.listen_addr, pending[-1]), timeout=0.1):
+                    pending.pop()
+            except OSError:
+                time.sleep(0.05)
+        return not pending
+
+    def measure(self, port: int) -> int | None:
+        import requests
+
+        proxy = f"http://{self.listen_addr}:{port}"
+        start = time.perf_counter()
+        try:
+            response = requests.get(self.url, proxies={"http": proxy, "https": proxy}, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException:
+            return None
+        return round((time.perf_counter() - start) * 1000)
+
+    def _start(self, outbounds: list[dict[str, Any]], config_path: str) -> tuple[Any, list[int]]:
+        import psutil
+
+        output = ""
+        for attempt in range(1, self.start_attempts + 1):
+            ports = self._free_ports(len(outbounds))
+            with open(config_path, "w", encoding="utf-8") as f:
+                json.dump(self.build_config(outbounds, ports), f, ensure_ascii=False)
+
+            with tempfile.TemporaryFile() as log:
+                try:
+                    process = psutil.Popen(
+                        [self.executable_path, "run", "-c", config_path],
+                        stdout=log,
+                        stderr=subprocess.STDOUT,
+                        creationflags=subprocess.CREATE_NO_WINDOW,
+                    )
+                except OSError as e:
+                    raise UrlTestError(f"Failed to start {self.executable_path}: {e}") from e
+                if self._wait_for_ports(process, ports):
+                    return process, ports
+
+                if process.is_running():
+                    process.kill()
+                process.wait()
+                log.seek(0)
+                output = log.read().decode("utf-8", "replace").strip()
+            logger.warning("URL test core failed to start (attempt %d): %s", attempt, output or "no output")
+        raise UrlTestError(f"URL test core failed to start: {output or 'no output'}")
+
+    def test_all(self, configs: dict[str, dict[str, Any]]) -> dict[str, LatencyResult]:
+        results = {server_id: LatencyResult() for server_id in configs}
+        outbounds = {server_id: get_proxy_outbound(config) for server_id, config in configs.items()}
+        server_ids = [server_id for server_id, outbound in outbounds.items() if outbound is not None]
+        if not server_ids:
+            return results
+
+        fd, config_path = tempfile.mkstemp(prefix="xray-urltest-", suffix=".json")
+        os.close(fd)
+        process = None
+        try:
+            process, ports = self._start([outbounds[server_id] for server_id in server_ids], config_path)
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(ports))) as executor:
+                for server_id, ms in zip(server_ids, executor.map(self.measure, ports)):
+                    results[server_id] = LatencyResult(url=ms)
+            return results
+        finally:
+            if process is not None and process.is_running():
+                process.kill()
+                process.wait()
+            os.unlink(config_path)
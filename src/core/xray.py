@@ -1,16 +1,37 @@
+import json
 import os
 import subprocess
+import tempfile
+from typing import Any, Callable
 
-import psutil
+from core.logs import LogPipeline
+from core.outbound import get_proxy_outbound
+from core.supervisor import ProcessWatcher
+
+SWAP_TAG_SUFFIX = "-swap"
 
 
 class XrayManager:
-    def __init__(self, executable_path: str, config_path: str, log_dir: str) -> None:
+    def __init__(
+        self,
+        executable_path: str,
+        config_path: str,
+        log_dir: str,
+        log: LogPipeline,
+        api_address: str | None = None,
+    ) -> None:
         self.executable_path: str = executable_path
         self.config_path: str = config_path
         self.log_dir: str = log_dir
+        self.log: LogPipeline = log
+        self.api_address: str | None = api_address
+
+        self.on_exit: Callable[[int | None], None] | None = None
+        self.on_line: Callable[[str], None] | None = None
 
-        self._process: psutil.Popen | None = None
+        self._process = None
+        self._watcher: ProcessWatcher | None = None
+        self._live_tags: dict[str, str] = {}
 
     def is_running(self) -> bool:
         return self._process is not None and self._process.is_running()
@@ -22,20 +43,94 @@ class XrayManager:
         if not os.path.isfile(self.config_path):
             return False
 
+        import psutil
+
+        self._live_tags = {}
         try:
             self._process = psutil.Popen(
                 [self.executable_path, "run", "-c", self.config_path],
                 cwd=self.log_dir,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
                 creationflags=subprocess.CREATE_NO_WINDOW,
             )
+            self._watcher = ProcessWatcher(self._process, self._on_exit, self._process.stdout, self._on_line)
             return True
         except Exception:
             self._process = None
             return False
 
     def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+
         if not self.is_running():
             return
 
         self._process.kill()
         self._process = None
+
+    def output_tail(self, lines: int = 50) -> list[str]:
+        return self.log.tail(lines)
+
+    def _on_line(self, line: str) -> None:
+        self.log.write(line)
+        if self.on_line is not None:
+            self.on_line(line)
+
+    def _on_exit(self, returncode: int | None) -> None:
+        self._process = None
+        if self.on_exit is not None:
+            self.on_exit(returncode)
+
+    def restart(self) -> bool:
+        self.stop()
+        return self.start()
+
+    def _api(self, command: str, *args: str) -> bool:
+        try:
+            result = subprocess.run(
+                [self.executable_path, "api", command, f"--server={self.api_address}", *args],
+                cwd=self.log_dir,
+                capture_output=True,
+                timeout=5,
+                creationflags=subprocess.CREATE_NO_WINDOW,
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        return result.returncode == 0
+
+    def _api_file(self, command: str, data: dict[str, Any]) -> bool:
+        fd, path = tempfile.mkstemp(prefix=f"xray-{command}-", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        try:
+            return self._api(command, path)
+        finally:
+            os.unlink(path)
+
+    def switch_outbound(self, config: dict[str, Any]) -> bool:
+        outbound = get_proxy_outbound(config)
+        if not self.is_running() or not self.api_address or outbound is None or not outbound.get("tag"):
+            return False
+
+        tag = outbound["tag"]
+        live_tag = self._live_tags.get(tag, tag)
+        next_tag = f"{tag}{SWAP_TAG_SUFFIX}" if live_tag == tag else tag
+        if not self._api_file("ado", {"outbounds": [{**outbound, "tag": next_tag}]}):
+            return False
+
+        routing = config.get("routing", {})
+        rules = [
+            {**rule, "outboundTag": next_tag} if rule.get("outboundTag") == tag else rule
+            for rule in routing.get("rules", [])
+        ]
+        if config["outbounds"][0] is outbound:
+            rules.append({"type": "field", "network": "tcp,udp", "outboundTag": next_tag})
+        if not self._api_file("adrules", {"routing": {**routing, "rules": rules}}):
+            self._api("rmo", next_tag)
+            return False
+
+        self._live_tags[tag] = next_tag
+        self._api("rmo", live_tag)
+        return True
@@ -0,0 +1,82 @@
+from PySide6.QtCore import QTimer
+from PySide6.QtGui import QFont, QHideEvent, QShowEvent
+from PySide6.QtWidgets import QComboBox, QDialog, QHBoxLayout, QLabel, QPlainTextEdit, QVBoxLayout, QWidget
+
+from core.logs import LOG_LEVELS, LogPipeline, LogRecord
+from utils.i18n import tr
+
+
+class LogViewer(QDialog):
+    POLL_INTERVAL: int = 500
+
+    def __init__(self, parent: QWidget, pipelines: dict[str, LogPipeline], max_lines: int = 2000) -> None:
+        super().__init__(parent)
+        self.setWindowTitle(tr("Logs"))
+        self.resize(720, 420)
+
+        self.pipelines: dict[str, LogPipeline] = pipelines
+        self._sequence: int = 0
+
+        self.source_combo = QComboBox()
+        for name in pipelines:
+            self.source_combo.addItem(name, name)
+        self.source_combo.currentIndexChanged.connect(self._reload)
+
+        self.level_combo = QComboBox()
+        for level in LOG_LEVELS:
+            self.level_combo.addItem(tr(level.capitalize()), level)
+        self.level_combo.setCurrentIndex(LOG_LEVELS.index("info"))
+        self.level_combo.currentIndexChanged.connect(self._reload)
+
+        self.text_edit = QPlainTextEdit()
+        self.text_edit.setReadOnly(True)
+        self.text_edit.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.text_edit.setMaximumBlockCount(max_lines)
+        self.text_edit.setFont(QFont("Consolas"))
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel(tr("Source:")))
+        filter_layout.addWidget(self.source_combo)
+        filter_layout.addWidget(QLabel(tr("Level:")))
+        filter_layout.addWidget(self.level_combo)
+        filter_layout.addStretch(1)
+
+        layout = QVBoxLayout()
+        layout.addLayout(filter_layout)
+        layout.addWidget(self.text_edit)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.POLL_INTERVAL)
+        self.timer.timeout.connect(self._poll)
+
+    def _pipeline(self) -> LogPipeline:
+        return self.pipelines[self.source_combo.currentData()]
+
+    def _visible(self, record: LogRecord) -> bool:
+        return LOG_LEVELS.index(record.level) >= self.level_combo.currentIndex()
+
+    def _append(self, records: list[LogRecord]) -> None:
+        if not records:
+            return
+        self._sequence = records[-1].sequence
+        lines = [record.message for record in records if self._visible(record)]
+        if lines:
+            self.text_edit.appendPlainText("\n".join(lines))
+
+    def _reload(self) -> None:
+        self.text_edit.clear()
+        self._sequence = 0
+        self._append(self._pipeline().since(0))
+
+    def _poll(self) -> None:
+        self._append(self._pipeline().since(self._sequence))
+
+    def showEvent(self, event: QShowEvent) -> None:
+        super().showEvent(event)
+        self._reload()
+        self.timer.start()
+
+    def hideEvent(self, event: QHideEvent) -> None:
+        super().hideEvent(event)
+        self.timer.stop()
@@ -0,0 +1,169 @@
+from typing import Any
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, QSortFilterProxyModel, Qt
+from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QDialog,
+    QDialogButtonBox,
+    QHeaderView,
+    QLineEdit,
+    QPushButton,
+    QTableView,
+    QVBoxLayout,
+    QWidget,
+)
+
+from core.latency import LatencyResult
+from core.store import ServerInfo
+from utils.i18n import tr
+
+SORT_ROLE = Qt.UserRole + 1
+
+
+class ServerListModel(QAbstractTableModel):
+    NAME, GROUP, LATENCY = range(3)
+
+    def __init__(
+        self,
+        servers: list[ServerInfo],
+        latencies: dict[str, LatencyResult],
+        favorites: set[str],
+        parent: QWidget | None = None,
+    ) -> None:
+        super().__init__(parent)
+        self.servers: list[ServerInfo] = servers
+        self.latencies: dict[str, LatencyResult] = latencies
+        self.favorites: set[str] = favorites
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.servers)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else 3
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if orientation != Qt.Horizontal or role != Qt.DisplayRole:
+            return None
+        return (tr("Server"), tr("Group"), tr("Latency"))[section]
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+
+        server = self.servers[index.row()]
+        column = index.column()
+        result = self.latencies.get(server.id)
+        ms = result.ms if result else None
+
+        if role == Qt.DisplayRole:
+            if column == self.NAME:
+                return f"★ {server.remark}" if server.id in self.favorites else server.remark
+            if column == self.GROUP:
+                return server.group
+            if result is not None:
+                return tr("timeout") if ms is None else f"{ms} ms"
+            return ""
+        if role == SORT_ROLE:
+            if column == self.NAME:
+                return (server.id not in self.favorites, index.row())
+            if column == self.GROUP:
+                return (server.group, index.row())
+            return (result is None, ms is None, ms or 0, index.row())
+        if role == Qt.UserRole:
+            return server.id
+        return None
+
+    def toggle_favorite(self, row: int) -> None:
+        server_id = self.servers[row].id
+        self.favorites ^= {server_id}
+        index = self.index(row, self.NAME)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+
+
+class ServerFilterModel(QSortFilterProxyModel):
+    def lessThan(self, left: QModelIndex, right: QModelIndex) -> bool:
+        return left.data(SORT_ROLE) < right.data(SORT_ROLE)
+
+
+class ServerPicker(QDialog):
+    def __init__(
+        self,
+        parent: QWidget,
+        servers: list[ServerInfo],
+        latencies: dict[str, LatencyResult],
+        favorites: list[str],
+        current_id: str | None = None,
+    ) -> None:
+        super().__init__(parent)
+        self.setWindowTitle(tr("Select server"))
+        self.resize(420, 480)
+
+        self.model = ServerListModel(servers, latencies, set(favorites), self)
+        self.proxy_model = ServerFilterModel(self)
+        self.proxy_model.setSourceModel(self.model)
+        self.proxy_model.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.proxy_model.setFilterKeyColumn(-1)
+
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText(tr("Search..."))
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.textChanged.connect(self.proxy_model.setFilterFixedString)
+        self.filter_edit.returnPressed.connect(self._accept_first)
+
+        self.view = QTableView()
+        self.view.setModel(self.proxy_model)
+        self.view.setSortingEnabled(True)
+        self.view.sortByColumn(ServerListModel.NAME, Qt.AscendingOrder)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.view.verticalHeader().hide()
+        self.view.verticalHeader().setDefaultSectionSize(self.view.fontMetrics().height() + 6)
+        self.view.horizontalHeader().setSectionResizeMode(ServerListModel.NAME, QHeaderView.Stretch)
+        self.view.horizontalHeader().setSectionResizeMode(ServerListModel.GROUP, QHeaderView.ResizeToContents)
+        self.view.horizontalHeader().setSectionResizeMode(ServerListModel.LATENCY, QHeaderView.ResizeToContents)
+        self.view.doubleClicked.connect(self.accept)
+
+        favorite_button = QPushButton(tr("Favorite"))
+        favorite_button.clicked.connect(self._toggle_favorite)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.addButton(favorite_button, QDialogButtonBox.ActionRole)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.filter_edit)
+        layout.addWidget(self.view)
+        layout.addWidget(buttons)
+        self.setLayout(layout)
+
+        if current_id is not None:
+            for row, server in enumerate(servers):
+                if server.id == current_id:
+                    current = self.proxy_model.mapFromSource(self.model.index(row, ServerListModel.NAME))
+                    self.view.selectRow(current.row())
+                    self.view.scrollTo(current, QAbstractItemView.PositionAtCenter)
+                    break
+
+        self.filter_edit.setFocus()
+
+    @property
+    def favorites(self) -> set[str]:
+        return self.model.favorites
+
+    def selected_id(self) -> str | None:
+        rows = self.view.selectionModel().selectedRows()
+        if not rows:
+            return None
+        return rows[0].data(Qt.UserRole)
+
+    def _toggle_favorite(self) -> None:
+        rows = self.view.selectionModel().selectedRows()
+        if rows:
+            self.model.toggle_favorite(self.proxy_model.mapToSource(rows[0]).row())
+
+    def _accept_first(self) -> None:
+        if self.selected_id() is None and self.proxy_model.rowCount():
+            self.view.selectRow(0)
+        self.accept()
@@ -0,0 +1,50 @@
+from collections.abc import Sequence
+
+from PySide6.QtCore import QPointF, Qt
+from PySide6.QtGui import QColor, QPainter, QPaintEvent, QPen, QPolygonF
+from PySide6.QtWidgets import QWidget
+
+from core.stats import TrafficSample
+from utils.format import format_bytes
+
+
+class TrafficGraph(QWidget):
+    UPLINK_COLOR = QColor(230, 126, 34)
+    DOWNLINK_COLOR = QColor(41, 128, 185)
+
+    def __init__(self, capacity: int, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self.capacity: int = capacity
+        self.samples: Sequence[TrafficSample] = ()
+        self.setFixedHeight(60)
+
+    def set_samples(self, samples: Sequence[TrafficSample]) -> None:
+        self.samples = samples
+        self.update()
+
+    def _polygon(self, values: list[float], peak: float) -> QPolygonF:
+        width, height = self.width() - 1, self.height() - 1
+        step = width / max(self.capacity - 1, 1)
+        offset = width - step * (len(values) - 1)
+        return QPolygonF([QPointF(offset + i * step, height - value / peak * height) for i, value in enumerate(values)])
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(self.palette().mid().color())
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
+
+        if len(self.samples) < 2:
+            return
+
+        uplink = [sample.uplink for sample in self.samples]
+        downlink = [sample.downlink for sample in self.samples]
+        peak = max(max(uplink), max(downlink), 1024.0)
+
+        painter.setPen(QPen(self.UPLINK_COLOR, 1.5))
+        painter.drawPolyline(self._polygon(uplink, peak))
+        painter.setPen(QPen(self.DOWNLINK_COLOR, 1.5))
+        painter.drawPolyline(self._polygon(downlink, peak))
+
+        painter.setPen(self.palette().text().color())
+        painter.drawText(self.rect().adjusted(4, 2, -4, -2), Qt.AlignTop | Qt.AlignLeft, f"{format_bytes(peak)}/s")
@@ -1,14 +1,17 @@
-from typing import Any
-
 from PySide6.QtCore import QObject
 from PySide6.QtGui import QAction, QIcon
 from PySide6.QtWidgets import QMenu, QSystemTrayIcon, QWidget
 
 from config import APP_NAME
+from core.latency import LatencyResult
+from core.store import ServerInfo
 from utils.i18n import tr
 
 
 class Tray(QObject):
+    FLAT_LIMIT: int = 20
+    QUICK_LIMIT: int = 8
+
     def __init__(self, parent: QWidget, icon: QIcon) -> None:
         super().__init__(parent)
         self.parent = parent
@@ -23,11 +26,20 @@ class Tray(QObject):
 
         self.toggle_xray_action = QAction(self.parent)
         self.server_menu = QMenu(tr("Select server"), self.parent)
-        self.server_actions = []
+        self.server_actions: dict[str, list[QAction]] = {}
+        self._quick_actions: list[QAction] = []
+        self._group_menus: dict[str, QMenu] = {}
+        self._groups: dict[str, tuple[ServerInfo, ...]] = {}
+        self._grouped: bool = False
+        self._current_id: str | None = None
+        self._latencies: dict[str, LatencyResult] = {}
+        self.test_latency_action = QAction(tr("Test latency"), self.parent)
+        self.url_test_action = QAction(tr("URL test"), self.parent)
 
         self.toggle_tun_action = QAction(self.parent)
         self.toggle_system_proxy_action = QAction(self.parent)
         self.toggle_discord_proxy_action = QAction(self.parent)
+        self.show_logs_action = QAction(tr("Show logs"), self.parent)
 
         self._setup_menu()
         self.tray.show()
@@ -41,6 +53,8 @@ class Tray(QObject):
 
         tray_menu.addAction(self.toggle_xray_action)
         tray_menu.addMenu(self.server_menu)
+        tray_menu.addAction(self.test_latency_action)
+        tray_menu.addAction(self.url_test_action)
         tray_menu.addSeparator()
 
         tray_menu.addAction(self.toggle_tun_action)
@@ -48,6 +62,7 @@ class Tray(QObject):
         tray_menu.addAction(self.toggle_discord_proxy_action)
         tray_menu.addSeparator()
 
+        tray_menu.addAction(self.show_logs_action)
         tray_menu.addSeparator()
 
         action_quit = QAction(tr("Quit"), self.parent, triggered=self.parent._quit)
@@ -68,23 +83,130 @@ class Tray(QObject):
         self.show_action.setVisible(not self.parent.isVisible())
         self.hide_action.setVisible(self.parent.isVisible())
 
-    def update_server_menu(self, servers: list[dict[str, Any]], current_server: str | None = None) -> None:
-        self.server_menu.clear()
-        self.server_actions.clear()
-
-        if not servers:
-            action = QAction(tr("No servers available"), self.parent)
-            action.setEnabled(False)
-            self.server_menu.addAction(action)
+    def _server_text(self, server: ServerInfo) -> str:
+        if server.id not in self._latencies:
+            return server.remark
+        ms = self._latencies[server.id].ms
+        return f"{server.remark}\t{tr('timeout') if ms is None else f'{ms} ms'}"
+
+    def _server_action(self, server: ServerInfo) -> QAction:
+        action = QAction(self._server_text(server), self.parent, checkable=True)
+        action.setChecked(server.id == self._current_id)
+        action.setData(server.id)
+        action.triggered.connect(lambda checked, s=server.id: self.parent._select_server(s))
+        self.server_actions.setdefault(server.id, []).append(action)
+        return action
+
+    def _populate_group(self, group: str) -> None:
+        menu = self._group_menus[group]
+        if menu.actions():
+            return
+        for server in self._groups[group]:
+            menu.addAction(self._server_action(server))
+
+    def _refresh_actions(self) -> None:
+        servers = {server.id: server for servers in self._groups.values() for server in servers}
+        for server_id, actions in self.server_actions.items():
+            server = servers.get(server_id)
+            if server is None:
+                continue
+            for action in actions:
+                action.setText(self._server_text(server))
+                action.setChecked(server_id == self._current_id)
+
+    def _forget_action(self, action: QAction) -> None:
+        actions = self.server_actions.get(action.data(), [])
+        if action in actions:
+            actions.remove(action)
+
+    def _clear_group(self, menu: QMenu) -> None:
+        for action in menu.actions():
+            self._forget_action(action)
+        menu.clear()
+
+    def _rebuild_quick_section(self, servers: list[ServerInfo], favorites: list[str], recent: list[str]) -> None:
+        for action in self._quick_actions:
+            self.server_menu.removeAction(action)
+            self._forget_action(action)
+        self._quick_actions = []
+
+        by_id = {server.id: server for server in servers}
+        quick_ids = list(dict.fromkeys([*favorites, *recent]))
+        quick = [by_id[server_id] for server_id in quick_ids if server_id in by_id][: self.QUICK_LIMIT]
+        if not quick:
             return
 
-        for server in servers:
-            remark = server.get("remarks", "No remark")
-            action = QAction(remark, self.parent, checkable=True)
-            action.setChecked(remark == current_server)
-            action.triggered.connect(lambda checked, r=remark: self.parent._select_server(r))
-            self.server_actions.append(action)
-            self.server_menu.addAction(action)
+        before = self.server_menu.actions()[0] if self.server_menu.actions() else None
+        for server in quick:
+            action = self._server_action(server)
+            self._quick_actions.append(action)
+            self.server_menu.insertAction(before, action)
+        self._quick_actions.append(self.server_menu.insertSeparator(before))
+
+    def update_server_menu(
+        self,
+        servers: list[ServerInfo],
+        current_id: str | None = None,
+        latencies: dict[str, LatencyResult] | None = None,
+        favorites: list[str] | None = None,
+        recent: list[str] | None = None,
+    ) -> None:
+        self._current_id = current_id
+        self._latencies = latencies or {}
+
+        grouped = len(servers) > self.FLAT_LIMIT
+        groups: dict[str, tuple[ServerInfo, ...]] = {}
+        if grouped:
+            for server in servers:
+                groups.setdefault(server.group or tr("Other"), ())
+                groups[server.group or tr("Other")] += (server,)
+        else:
+            groups = {"": tuple(servers)}
+
+        was_empty = not any(self._groups.values())
+        if list(groups) != list(self._groups) or grouped != self._grouped or was_empty != (not servers):
+            for menu in self._group_menus.values():
+                menu.deleteLater()
+            self.server_menu.clear()
+            self.server_actions.clear()
+            self._quick_actions = []
+            self._group_menus = {}
+            self._groups = {}
+            self._grouped = grouped
+
+            if not servers:
+                action = QAction(tr("No servers available"), self.parent)
+                action.setEnabled(False)
+                self.server_menu.addAction(action)
+                return
+
+            for group in groups:
+                if grouped:
+                    menu = QMenu(self.server_menu)
+                    menu.aboutToShow.connect(lambda g=group: self._populate_group(g))
+                    self.server_menu.addMenu(menu)
+                    self._group_menus[group] = menu
+
+        for group, group_servers in groups.items():
+            if self._groups.get(group) == group_servers:
+                continue
+            self._groups[group] = group_servers
+            if grouped:
+                menu = self._group_menus[group]
+                menu.setTitle(f"{group} ({len(group_servers)})")
+                self._clear_group(menu)
+            else:
+                self.server_menu.clear()
+                self.server_actions.clear()
+                self._quick_actions = []
+                for server in group_servers:
+                    self.server_menu.addAction(self._server_action(server))
+
+        self._rebuild_quick_section(servers, favorites or [], recent or [])
+        self._refresh_actions()
+
+    def update_tooltip(self, text: str) -> None:
+        self.tray.setToolTip(text)
 
     def update_xray_action(self, running: bool) -> None:
         self.toggle_xray_action.setText(f"{tr('Stop') if running else tr('Start')} VPN")
@@ -0,0 +1,100 @@
+import logging
+import os
+
+from config import (
+    DNS_PORT,
+    DNS_SETTINGS_PATH,
+    ENDPOINT_CACHE_PATH,
+    ENDPOINT_DOH_SERVERS,
+    LOG_BACKUP_COUNT,
+    LOG_BUFFER_LINES,
+    LOG_COMPRESS,
+    LOG_MAX_BYTES,
+    LOG_ROTATE_INTERVAL,
+    PROXY_IP_ADDR,
+    ROUTE_HITS_PATH,
+    ROUTES_PATH,
+    SERVERS_PATH,
+    SUBSCRIPTION_CACHE_DIR,
+    SUBSCRIPTION_PATH,
+    SUBSCRIPTION_STATE_PATH,
+    TUN_CONFIG_PATH,
+    TUN_HOME_DIR,
+    TUN_OVERRIDES_PATH,
+    TUN_PATH,
+    TUN_SOURCE_PATH,
+    USER_AGENT,
+    XRAY_API_PORT,
+    XRAY_CONFIG_PATH,
+    XRAY_CONFIGS_PATH,
+    XRAY_LOG_DIR,
+    XRAY_METRICS_PORT,
+    XRAY_PATH,
+    XRAY_TUNING_PATH,
+)
+from core.config import ConfigManager
+from core.dns import DnsSettings, build_mihomo_dns
+from core.logs import LogPipeline, PipelineHandler
+from core.mihomo_config import TunConfigBuilder
+from core.resolver import EndpointResolver
+from core.routes import RouteManager
+from core.tuning import TuningManager
+from core.xray import XrayManager
+
+
+def create_log(source: str, path: str) -> LogPipeline:
+    return LogPipeline(
+        source,
+        path,
+        max_bytes=LOG_MAX_BYTES,
+        backup_count=LOG_BACKUP_COUNT,
+        interval=LOG_ROTATE_INTERVAL,
+        compress=LOG_COMPRESS,
+        buffer_size=LOG_BUFFER_LINES,
+    )
+
+
+def setup_logging(pipeline: LogPipeline, *handlers: logging.Handler) -> None:
+    logging.basicConfig(
+        handlers=[PipelineHandler(pipeline), *handlers],
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+
+def create_tun_builder(dns_settings: DnsSettings) -> TunConfigBuilder:
+    return TunConfigBuilder(
+        TUN_HOME_DIR,
+        os.path.dirname(TUN_PATH),
+        TUN_SOURCE_PATH,
+        TUN_OVERRIDES_PATH,
+        USER_AGENT,
+        build_mihomo_dns(dns_settings, DNS_PORT) if dns_settings.enabled else None,
+        DNS_SETTINGS_PATH,
+    )
+
+
+def create_config_manager() -> ConfigManager:
+    dns_settings = DnsSettings.load(DNS_SETTINGS_PATH)
+    return ConfigManager(
+        USER_AGENT,
+        SUBSCRIPTION_PATH,
+        SERVERS_PATH,
+        XRAY_CONFIG_PATH,
+        TUN_CONFIG_PATH,
+        SUBSCRIPTION_STATE_PATH,
+        SUBSCRIPTION_CACHE_DIR,
+        XRAY_API_PORT,
+        XRAY_CONFIGS_PATH,
+        create_tun_builder(dns_settings),
+        TuningManager(XRAY_TUNING_PATH),
+        dns_settings,
+        DNS_PORT,
+        EndpointResolver(ENDPOINT_CACHE_PATH, ENDPOINT_DOH_SERVERS),
+        RouteManager(ROUTES_PATH, ROUTE_HITS_PATH),
+        XRAY_METRICS_PORT,
+    )
+
+
+def create_xray_manager(log: LogPipeline) -> XrayManager:
+    return XrayManager(XRAY_PATH, XRAY_CONFIG_PATH, XRAY_LOG_DIR, log, f"{PROXY_IP_ADDR}:{XRAY_API_PORT}")
@@ -12,9 +12,29 @@ _TRANSLATIONS: dict[str, dict[str, str]] = {
         "Failed to start VPN": "Не удалось запустить VPN",
         "Stop": "Остановить",
         "Select server": "Выбрать сервер",
-        "Choose a server:": "Выберите сервер:",
+        "Group": "Группа",
+        "Latency": "Задержка",
+        "Search...": "Поиск...",
+        "Favorite": "Избранное",
+        "Other": "Другие",
+        "Test latency": "Проверить задержку",
+        "timeout": "таймаут",
+        "URL test": "URL-тест",
+        "Select server pool": "Выбрать пул серверов",
+        "Enter a remark prefix, a #tag or a comma-separated list of servers:": "Введите префикс названия, #тег или список серверов через запятую:",
+        "No servers match {query}": "Нет серверов, подходящих под {query}",
+        "Choose a balancing strategy:": "Выберите стратегию балансировки:",
         "Enable": "Включить",
         "Failed to start TUN": "Не удалось запустить TUN",
+        "Latency test failed: {error}": "Не удалось проверить задержку: {error}",
+        "Show logs": "Показать журнал",
+        "Logs": "Журнал",
+        "Source:": "Источник:",
+        "Level:": "Уровень:",
+        "Debug": "Отладка",
+        "Info": "Информация",
+        "Warning": "Предупреждение",
+        "{name} keeps crashing and was not restarted.\n\n{output}": "{name} постоянно аварийно завершается и не был перезапущен.\n\n{output}",
         "Disable": "Отключить",
         "system proxy": "системный прокси",
         "Discord proxy": "Discord прокси",
@@ -24,9 +44,19 @@ _TRANSLATIONS: dict[str, dict[str, str]] = {
         "Subscription imported successfully": "Подписка успешно импортирована",
         "Failed to import subscription:\n{error}": "Не удалось импортировать подписку:\n{error}",
         "Update subscription": "Обновить подписку",
+        "Downloading subscription...": "Загрузка подписки...",
+        "Cancel": "Отмена",
+        "Added: {added}, removed: {removed}, changed: {changed}": "Добавлено: {added}, удалено: {removed}, изменено: {changed}",
+        "No changes": "Без изменений",
+        "Traffic": "Трафик",
+        "unlimited": "безлимит",
+        "until {date}": "до {date}",
         "Subscription updated successfully": "Подписка успешно обновлена",
         "Failed to update subscription:\n{error}": "Не удалось обновить подписку:\n{error}",
         "Import a subscription first": "Сначала импортируйте подписку",
+        "Remove subscription": "Удалить подписку",
+        "Subscription:": "Подписка:",
+        "Failed to update {url}: {error}": "Не удалось обновить {url}: {error}",
         "Select a server first": "Сначала выберите сервер",
         "Update available": "Доступно обновление",
         "A new version {version} is available.\nWould you like to download it now?": "Доступна новая версия {version}.\nХотите скачать её сейчас?",
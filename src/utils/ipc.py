@@ -1,18 +1,87 @@
-import json
+from typing import Any, Callable
 
+from PySide6.QtCore import QObject
 from PySide6.QtNetwork import QLocalServer, QLocalSocket
 
+from utils.protocol import FrameDecoder, ProtocolError, encode_message, send_request
+
+RequestHandler = Callable[[str, dict[str, Any], Callable[[Any], None], Callable[[str], None]], None]
+
+
+class IpcConnection(QObject):
+    def __init__(self, socket: QLocalSocket, handler: RequestHandler, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self.socket: QLocalSocket = socket
+        self.handler: RequestHandler = handler
+        self.decoder = FrameDecoder()
+        self.closed: bool = False
+
+        self.socket.setParent(self)
+        self.socket.readyRead.connect(self._on_ready_read)
+        self.socket.disconnected.connect(self._on_disconnected)
+
+    def _on_disconnected(self) -> None:
+        self.closed = True
+        self.deleteLater()
+
+    def _on_ready_read(self) -> None:
+        try:
+            messages = self.decoder.feed(bytes(self.socket.readAll()))
+        except ProtocolError as e:
+            self._send({"ok": False, "error": str(e)})
+            self.socket.disconnectFromServer()
+            return
+
+        for message in messages:
+            self._dispatch(message)
+
+    def _dispatch(self, message: dict[str, Any]) -> None:
+        request_id = message.get("id")
+        replied = False
+
+        def respond(result: Any) -> None:
+            nonlocal replied
+            if not replied:
+                replied = True
+                self._send({"id": request_id, "ok": True, "result": result})
+
+        def fail(error: str) -> None:
+            nonlocal replied
+            if not replied:
+                replied = True
+                self._send({"id": request_id, "ok": False, "error": error})
+
+        command = message.get("command")
+        args = message.get("args") or {}
+        if not isinstance(command, str) or not isinstance(args, dict):
+            fail("Invalid request")
+            return
+
+        try:
+            self.handler(command, args, respond, fail)
+        except Exception as e:
+            fail(str(e))
+
+    def _send(self, message: dict[str, Any]) -> None:
+        if not self.closed and self.socket.state() == QLocalSocket.ConnectedState:
+            self.socket.write(encode_message(message))
+            self.socket.flush()
+
+
+class IpcServer(QObject):
+    def __init__(self, server: QLocalServer, handler: RequestHandler, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self.server: QLocalServer = server
+        self.handler: RequestHandler = handler
+        self.server.newConnection.connect(self._on_new_connection)
+
+    def _on_new_connection(self) -> None:
+        while self.server.hasPendingConnections():
+            IpcConnection(self.server.nextPendingConnection(), self.handler, self)
+
 
 def pass_to_main(argv: list[str], socket_name: str) -> bool:
-    socket = QLocalSocket()
-    socket.connectToServer(socket_name)
-    if socket.waitForConnected(50):
-        payload = json.dumps(argv[1:]).encode("utf-8")
-        socket.write(payload)
-        socket.flush()
-        socket.waitForBytesWritten(50)
-        return True
-    return False
+    return send_request(socket_name, "open", {"argv": argv[1:]}, timeout=1.0) is not None
 
 
 def start_server(socket_name: str) -> QLocalServer:
@@ -0,0 +1,312 @@
+import json
+import os
+import socket
+import struct
+import sys
+import tempfile
+import time
+from typing import Any
+
+HEADER = struct.Struct(">I")
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+FILE_FLAG_FIRST_PIPE_INSTANCE = 0x00080000
+PIPE_REJECT_REMOTE_CLIENTS = 0x00000008
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_message(message: dict[str, Any]) -> bytes:
+    payload = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    if len(payload) > MAX_MESSAGE_SIZE:
+        raise ProtocolError(f"Message too large: {len(payload)} bytes")
+    return HEADER.pack(len(payload)) + payload
+
+
+class FrameDecoder:
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list[dict[str, Any]]:
+        self._buffer += data
+        messages = []
+        while len(self._buffer) >= HEADER.size:
+            (length,) = HEADER.unpack_from(self._buffer)
+            if length > MAX_MESSAGE_SIZE:
+                raise ProtocolError(f"Message too large: {length} bytes")
+            if len(self._buffer) < HEADER.size + length:
+                break
+
+            payload = bytes(self._buffer[HEADER.size : HEADER.size + length])
+            del self._buffer[: HEADER.size + length]
+            try:
+                message = json.loads(payload.decode("utf-8"))
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                raise ProtocolError(f"Invalid message: {e}") from e
+            if not isinstance(message, dict):
+                raise ProtocolError("Message must be a JSON object")
+            messages.append(message)
+        return messages
+
+
+def local_socket_path(name: str) -> str:
+    if sys.platform == "win32":
+        return rf"\\.\pipe\{name}"
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+class _SocketStream:
+    def __init__(self, sock: socket.socket) -> None:
+        self._socket = sock
+
+    def settimeout(self, timeout: float | None) -> None:
+        self._socket.settimeout(timeout)
+
+    def write(self, data: bytes) -> None:
+        self._socket.sendall(data)
+
+    def read(self, size: int) -> bytes:
+        return self._socket.recv(size)
+
+    def close(self) -> None:
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+
+
+class _PipeStream:
+    def __init__(self, handle: Any, timeout: float | None) -> None:
+        import win32event
+
+        self._handle = handle
+        self._read_event = win32event.CreateEvent(None, True, False, None)
+        self._write_event = win32event.CreateEvent(None, True, False, None)
+        self.settimeout(timeout)
+
+    def settimeout(self, timeout: float | None) -> None:
+        import win32event
+
+        self._timeout_ms: int = win32event.INFINITE if timeout is None else max(1, round(timeout * 1000))
+
+    def _wait(self, overlapped: Any) -> int:
+        import pywintypes
+        import win32event
+        import win32file
+
+        if win32event.WaitForSingleObject(overlapped.hEvent, self._timeout_ms) != win32event.WAIT_OBJECT_0:
+            win32file.CancelIo(self._handle)
+            try:
+                win32file.GetOverlappedResult(self._handle, overlapped, True)
+            except pywintypes.error:
+                pass
+            raise TimeoutError("Timed out waiting for the pipe")
+        return win32file.GetOverlappedResult(self._handle, overlapped, True)
+
+    @staticmethod
+    def _overlapped(event: Any) -> Any:
+        import pywintypes
+
+        overlapped = pywintypes.OVERLAPPED()
+        overlapped.hEvent = event
+        return overlapped
+
+    def write(self, data: bytes) -> None:
+        import pywintypes
+        import win32file
+
+        overlapped = self._overlapped(self._write_event)
+        try:
+            win32file.WriteFile(self._handle, data, overlapped)
+            self._wait(overlapped)
+        except pywintypes.error as e:
+            raise OSError(e.winerror, e.strerror) from e
+
+    def read(self, size: int) -> bytes:
+        import pywintypes
+        import win32file
+        import winerror
+
+        overlapped = self._overlapped(self._read_event)
+        buffer = win32file.AllocateReadBuffer(size)
+        try:
+            win32file.ReadFile(self._handle, buffer, overlapped)
+            count = self._wait(overlapped)
+        except pywintypes.error as e:
+            if e.winerror == winerror.ERROR_BROKEN_PIPE:
+                return b""
+            raise OSError(e.winerror, e.strerror) from e
+        return bytes(buffer[:count])
+
+    def close(self) -> None:
+        self._handle.Close()
+        self._read_event.Close()
+        self._write_event.Close()
+
+
+def _connect_pipe(path: str, timeout: float) -> _PipeStream | None:
+    import pywintypes
+    import win32file
+    import win32pipe
+    import winerror
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            handle = win32file.CreateFile(
+                path,
+                win32file.GENERIC_READ | win32file.GENERIC_WRITE,
+                0,
+                None,
+                win32file.OPEN_EXISTING,
+                win32file.FILE_FLAG_OVERLAPPED,
+                None,
+            )
+            return _PipeStream(handle, timeout)
+        except pywintypes.error as e:
+            if e.winerror != winerror.ERROR_PIPE_BUSY:
+                return None
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Timed out waiting for a free pipe instance")
+        try:
+            win32pipe.WaitNamedPipe(path, max(1, round(remaining * 1000)))
+        except pywintypes.error as e:
+            if e.winerror == winerror.ERROR_SEM_TIMEOUT:
+                raise TimeoutError("Timed out waiting for a free pipe instance") from e
+            return None
+
+
+def connect_stream(name: str, timeout: float) -> _SocketStream | _PipeStream | None:
+    path = local_socket_path(name)
+    if sys.platform == "win32":
+        return _connect_pipe(path, timeout)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return _SocketStream(sock)
+
+
+class LocalListener:
+    def __init__(self, name: str, security: Any = None, timeout: float = 0.5) -> None:
+        self.path: str = local_socket_path(name)
+        self.timeout: float = timeout
+        self._security = security
+        self._pending: tuple[Any, Any] | None = None
+        self._socket: socket.socket | None = None
+
+        if sys.platform == "win32":
+            self._pending = self._create_pipe(True)
+            return
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            self._socket.bind(self.path)
+        finally:
+            os.umask(umask)
+        self._socket.listen()
+        self._socket.settimeout(timeout)
+
+    def _create_pipe(self, first: bool) -> tuple[Any, Any]:
+        import pywintypes
+        import win32event
+        import win32file
+        import win32pipe
+        import winerror
+
+        open_mode = win32pipe.PIPE_ACCESS_DUPLEX | win32file.FILE_FLAG_OVERLAPPED
+        if first:
+            open_mode |= FILE_FLAG_FIRST_PIPE_INSTANCE
+        pipe_mode = win32pipe.PIPE_TYPE_BYTE | win32pipe.PIPE_READMODE_BYTE | PIPE_REJECT_REMOTE_CLIENTS
+        try:
+            handle = win32pipe.CreateNamedPipe(
+                self.path, open_mode, pipe_mode, win32pipe.PIPE_UNLIMITED_INSTANCES, 65536, 65536, 0, self._security
+            )
+        except pywintypes.error as e:
+            raise OSError(e.winerror, e.strerror) from e
+
+        overlapped = pywintypes.OVERLAPPED()
+        overlapped.hEvent = win32event.CreateEvent(None, True, False, None)
+        if win32pipe.ConnectNamedPipe(handle, overlapped) == winerror.ERROR_PIPE_CONNECTED:
+            win32event.SetEvent(overlapped.hEvent)
+        return handle, overlapped
+
+    def accept(self) -> _SocketStream | _PipeStream | None:
+        if self._socket is not None:
+            try:
+                conn, _ = self._socket.accept()
+            except TimeoutError:
+                return None
+            conn.settimeout(self.timeout)
+            return _SocketStream(conn)
+
+        import win32event
+
+        if self._pending is None:
+            self._pending = self._create_pipe(False)
+        handle, overlapped = self._pending
+        if win32event.WaitForSingleObject(overlapped.hEvent, round(self.timeout * 1000)) != win32event.WAIT_OBJECT_0:
+            return None
+        self._pending = None
+        overlapped.hEvent.Close()
+        return _PipeStream(handle, self.timeout)
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            return
+
+        if self._pending is not None:
+            import win32file
+
+            handle, overlapped = self._pending
+            self._pending = None
+            win32file.CancelIo(handle)
+            handle.Close()
+            overlapped.hEvent.Close()
+
+
+def send_request(
+    socket_name: str,
+    command: str,
+    args: dict[str, Any] | None = None,
+    timeout: float = 5.0,
+) -> dict[str, Any] | None:
+    try:
+        stream = connect_stream(socket_name, timeout)
+    except TimeoutError:
+        return {"ok": False, "error": "Timed out waiting for the server"}
+    if stream is None:
+        return None
+
+    decoder = FrameDecoder()
+    try:
+        stream.write(encode_message({"id": 1, "command": command, "args": args or {}}))
+        while True:
+            data = stream.read(65536)
+            if not data:
+                return {"ok": False, "error": "Connection closed before a reply"}
+            messages = decoder.feed(data)
+            if messages:
+                return messages[0]
+    except TimeoutError:
+        return {"ok": False, "error": "Timed out waiting for a reply"}
+    except (OSError, ProtocolError) as e:
+        return {"ok": False, "error": str(e)}
+    finally:
+        stream.close()
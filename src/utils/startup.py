@@ -0,0 +1,47 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def process_start_time() -> float:
+    try:
+        import win32api
+        import win32process
+
+        return win32process.GetProcessTimes(win32api.GetCurrentProcess())["CreationTime"].timestamp()
+    except Exception:
+        return time.time()
+
+
+class StartupProfile:
+    def __init__(self) -> None:
+        self.origin: float = process_start_time()
+        self.phases: list[tuple[str, float]] = []
+        self._last: float = self.origin
+        self.finished: bool = False
+
+    def mark(self, phase: str) -> None:
+        if self.finished:
+            return
+        now = time.time()
+        self.phases.append((phase, (now - self._last) * 1000))
+        self._last = now
+
+    @property
+    def total(self) -> float:
+        return (self._last - self.origin) * 1000
+
+    def report(self) -> str:
+        phases = ", ".join(f"{phase} {ms:.0f} ms" for phase, ms in self.phases)
+        return f"Startup took {self.total:.0f} ms ({phases})"
+
+    def finish(self) -> None:
+        if self.finished:
+            return
+        self.mark("event loop")
+        self.finished = True
+        logger.info(self.report())
+
+
+startup_profile = StartupProfile()
@@ -1,28 +1,101 @@
-import requests
+import json
+import logging
+import os
+import time
+from typing import Any
+
 from packaging import version
 
-from config import APP_NAME, GITHUB_API_LATEST_RELEASE, GITHUB_RELEASES_PAGE
+from config import APP_NAME, GITHUB_RELEASES_PAGE
 
+logger = logging.getLogger(__name__)
 
-def get_latest_version() -> tuple[str | None, str]:
-    try:
-        response = requests.get(GITHUB_API_LATEST_RELEASE)
-        response.raise_for_status()
-        data = response.json()
-    except Exception:
-        return None, GITHUB_RELEASES_PAGE
 
-    tag = data.get("tag_name")
-    if tag and tag.startswith("v"):
-        tag = tag.removeprefix("v")
+class UpdateChecker:
+    def __init__(
+        self,
+        api_url: str,
+        cache_path: str,
+        interval: float = 24 * 3600,
+        timeout: float = 5.0,
+        user_agent: str = APP_NAME,
+    ) -> None:
+        self.api_url: str = api_url
+        self.cache_path: str = cache_path
+        self.interval: float = interval
+        self.timeout: float = timeout
+        self.user_agent: str = user_agent
+
+    def _load_cache(self) -> dict[str, Any]:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return cache if isinstance(cache, dict) and cache.get("url") == self.api_url else {}
+
+    def _save_cache(self, cache: dict[str, Any]) -> None:
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            logger.warning("Failed to write update cache %s", self.cache_path)
+
+    @staticmethod
+    def _parse_release(data: dict[str, Any]) -> tuple[str | None, str]:
+        tag = data.get("tag_name")
+        if tag and tag.startswith("v"):
+            tag = tag.removeprefix("v")
+
+        download_url = GITHUB_RELEASES_PAGE
+        for asset in data.get("assets", []):
+            if asset.get("name", "").lower() == f"{APP_NAME.lower()}.exe":
+                download_url = asset.get("browser_download_url", download_url)
+                break
+
+        return tag, download_url
+
+    def check(self, force: bool = False) -> tuple[str | None, str]:
+        import requests
+
+        cache = self._load_cache()
+        cached = cache.get("tag"), cache.get("download_url") or GITHUB_RELEASES_PAGE
+        now = time.time()
+        if not force and now < cache.get("next_check", 0):
+            return cached
+
+        headers = {"Accept": "application/vnd.github+json", "User-Agent": self.user_agent}
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+
+        try:
+            response = requests.get(self.api_url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.info("Update check failed: %s", e)
+            return cached
 
-    download_url = GITHUB_RELEASES_PAGE
-    for asset in data.get("assets", []):
-        if asset.get("name", "").lower() == f"{APP_NAME.lower()}.exe":
-            download_url = asset.get("browser_download_url", download_url)
-            break
+        cache["url"] = self.api_url
+        if response.status_code == 304:
+            cache["next_check"] = now + self.interval
+        elif response.status_code in (403, 429):
+            reset = response.headers.get("X-RateLimit-Reset", "")
+            cache["next_check"] = float(reset) if reset.isdigit() else now + self.interval
+            logger.info("Update check rate limited until %s", time.ctime(cache["next_check"]))
+        elif response.ok:
+            try:
+                cache["tag"], cache["download_url"] = self._parse_release(response.json())
+            except (AttributeError, ValueError):
+                return cached
+            cache["etag"] = response.headers.get("ETag")
+            cache["next_check"] = now + self.interval
+        else:
+            logger.info("Update check returned HTTP %s", response.status_code)
+            return cached
 
-    return tag, download_url
+        self._save_cache(cache)
+        return cache.get("tag"), cache.get("download_url") or GITHUB_RELEASES_PAGE
 
 
 def is_newer_version(current: str, remote: str) -> bool:
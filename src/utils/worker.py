@@ -0,0 +1,46 @@
+from typing import Any, Callable
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+
+class WorkerSignals(QObject):
+    finished = Signal(object)
+    failed = Signal(object)
+    progress = Signal(int)
+
+
+class Worker(QRunnable):
+    def __init__(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+
+    def run(self) -> None:
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(result)
+
+
+def run_in_background(
+    fn: Callable[..., Any],
+    *args: Any,
+    on_finished: Callable[[Any], None] | None = None,
+    on_failed: Callable[[Exception], None] | None = None,
+    on_progress: Callable[[int], None] | None = None,
+    **kwargs: Any,
+) -> Worker:
+    worker = Worker(fn, *args, **kwargs)
+    if on_progress:
+        worker.kwargs["progress"] = worker.signals.progress.emit
+        worker.signals.progress.connect(on_progress)
+    if on_finished:
+        worker.signals.finished.connect(on_finished)
+    if on_failed:
+        worker.signals.failed.connect(on_failed)
+    QThreadPool.globalInstance().start(worker)
+    return worker
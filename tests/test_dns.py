@@ -0,0 +1,35 @@
+from core.dns import DnsSettings, apply_xray_dns, build_mihomo_dns
+
+BASE = {"inbounds": [], "outbounds": [{"tag": "proxy", "protocol": "vless"}], "routing": {"rules": []}}
+
+
+def test_mihomo_resolves_direct_domains_outside_xray():
+    settings = DnsSettings(upstreams=["https://dns.example/dns-query", "https://1.1.1.1/dns-query", "localhost"])
+
+    dns = build_mihomo_dns(settings, 10853)["dns"]
+
+    assert dns["nameserver"] == ["udp://127.0.0.1:10853"]
+    assert dns["default-nameserver"] == ["1.1.1.1", "8.8.8.8"]
+    assert dns["nameserver-policy"] == {
+        "geosite:private": ["system"],
+        "+.lan": ["system"],
+        "+.local": ["system"],
+        "dns.example": ["system"],
+    }
+    assert dns["fake-ip-filter"] == ["geosite:private", "+.lan", "+.local"]
+
+
+def test_dns_log_only_when_collecting():
+    settings = DnsSettings()
+
+    assert "dnsLog" not in apply_xray_dns(BASE, settings, 10853).get("log", {})
+    assert apply_xray_dns(BASE, settings, 10853, log=True)["log"]["dnsLog"] is True
+
+
+def test_dns_inbound_and_route():
+    config = apply_xray_dns(BASE, DnsSettings(), 10853)
+
+    assert config["inbounds"][-1]["port"] == 10853
+    assert config["outbounds"][-1] == {"tag": "dns-out", "protocol": "dns"}
+    assert config["routing"]["rules"][0] == {"type": "field", "inboundTag": ["dns-in"], "outboundTag": "dns-out"}
+    assert BASE["inbounds"] == []
@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.config import ConfigManager, ImportCancelledError
+
+RELEASE = threading.Event()
+
+
+class Subscriptions(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.startswith("/slow/"):
+            RELEASE.wait(10)
+        if self.path.endswith("/mihomo"):
+            if not self.path.startswith("/tun/"):
+                self.send_error(404)
+                return
+            body = b"mode: rule\n"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        body = json.dumps([{"remarks": self.path, "outbounds": [{"tag": "proxy", "protocol": "vless"}]}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def base_url():
+    RELEASE.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Subscriptions)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    RELEASE.set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(ConfigManager, "get_hwid_headers", staticmethod(lambda: {}))
+    return ConfigManager(
+        "test",
+        str(tmp_path / "subscription.txt"),
+        str(tmp_path / "servers.db"),
+        str(tmp_path / "config.json"),
+        str(tmp_path / "tun.yaml"),
+        str(tmp_path / "subscriptions.json"),
+        str(tmp_path / "cache"),
+    )
+
+
+def test_each_subscription_is_delivered_as_it_completes(manager, base_url):
+    delivered = []
+
+    def on_fetch(subscription):
+        delivered.append(([fetch.url for fetch in subscription.fetches], time.monotonic()))
+
+    start = time.monotonic()
+    subscription = manager.fetch_configs(
+        [f"{base_url}/slow/", f"{base_url}/fast/"], timeout=(5.0, 5.0), deadline=1.0, on_fetch=on_fetch
+    )
+
+    assert [urls for urls, _ in delivered] == [[f"{base_url}/fast/"], [f"{base_url}/slow/"]]
+    assert delivered[0][1] - start < 1.0
+    assert time.monotonic() - start < 3.0
+    assert [fetch.url for fetch in subscription.fetches] == [f"{base_url}/slow/", f"{base_url}/fast/"]
+    assert "1 s" in subscription.errors[f"{base_url}/slow/"]
+    assert subscription.fetches[1].xray_configs[0]["remarks"] == "/fast/json"
+
+
+def test_failed_tun_download_keeps_the_primary_uncommitted(manager, base_url, tmp_path):
+    subscription = manager.fetch_configs([f"{base_url}/primary/", f"{base_url}/extra/"])
+
+    assert "404" in subscription.errors[f"{base_url}/primary/"]
+    assert subscription.tun_config is None
+    assert subscription.fetches[1].error is None
+
+    manager.commit_configs(subscription)
+    assert manager.subscription_urls == [f"{base_url}/extra/"]
+    assert not (tmp_path / "tun.yaml").exists()
+
+
+def test_primary_is_committed_with_its_tun_config(manager, base_url, tmp_path):
+    subscription = manager.fetch_configs([f"{base_url}/tun/", f"{base_url}/extra/"])
+
+    assert subscription.errors == {}
+    assert subscription.tun_config == "mode: rule\n"
+
+    manager.commit_configs(subscription)
+    assert manager.subscription_urls == [f"{base_url}/tun/", f"{base_url}/extra/"]
+    assert (tmp_path / "tun.yaml").read_text(encoding="utf-8") == "mode: rule\n"
+
+
+def test_abandoned_download_is_discarded(manager, base_url):
+    abandoned = threading.Event()
+    abandoned.set()
+
+    with pytest.raises(ImportCancelledError):
+        ConfigManager._download(
+            manager._get_session(), f"{base_url}/late/json", {}, (5.0, 5.0), None, {}, None, abandoned
+        )
+
+
+def test_all_subscriptions_failing_raises(manager, base_url):
+    with pytest.raises(Exception, match="No response"):
+        manager.fetch_configs([f"{base_url}/slow/"], timeout=(5.0, 5.0), deadline=0.5)
@@ -0,0 +1,75 @@
+import threading
+from types import SimpleNamespace
+
+from core.health import HealthMonitor
+from core.latency import LatencyResult
+from core.store import ServerInfo
+from core.url_test import UrlTestError
+
+SERVERS = [ServerInfo("a", "A", ""), ServerInfo("b", "B", ""), ServerInfo("c", "C", "")]
+
+
+def make_monitor(test_servers, latency=None, failure_rate=0.0):
+    monitor = HealthMonitor("127.0.0.1", 1080, test_servers, lambda: SERVERS, lambda: "a", lambda *args: None)
+    monitor.latency = latency
+    monitor.failure_rate = failure_rate
+    return monitor
+
+
+def test_find_fallback_excludes_current_and_picks_fastest():
+    tested = []
+
+    def test_servers(servers):
+        tested.extend(server.id for server in servers)
+        return {"b": LatencyResult(url=400), "c": LatencyResult(url=200)}
+
+    server, ms = make_monitor(test_servers, latency=2000).find_fallback()
+    assert tested == ["b", "c"]
+    assert (server.id, ms) == ("c", 200)
+
+
+def test_find_fallback_requires_improvement_over_proxied_latency():
+    monitor = make_monitor(lambda servers: {"b": LatencyResult(url=800), "c": LatencyResult(url=None)}, latency=1000)
+    assert monitor.find_fallback() is None
+
+    monitor.latency = 2000
+    assert monitor.find_fallback()[0].id == "b"
+
+
+def test_find_fallback_ignores_handshake_only_results():
+    monitor = make_monitor(lambda servers: {"b": LatencyResult(tcp=10, tls=20), "c": LatencyResult()}, latency=2000)
+    assert monitor.find_fallback() is None
+
+
+def test_find_fallback_any_candidate_beats_failing_server():
+    monitor = make_monitor(lambda servers: {"b": LatencyResult(url=3000), "c": LatencyResult()}, failure_rate=1.0)
+    assert monitor.find_fallback()[0].id == "b"
+
+
+def test_find_fallback_survives_test_failure():
+    def test_servers(servers):
+        raise UrlTestError("core failed to start")
+
+    assert make_monitor(test_servers, latency=2000).find_fallback() is None
+
+
+def test_failed_searches_back_off(monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr("core.health.time", SimpleNamespace(monotonic=lambda: clock.now))
+    searched = []
+
+    def test_servers(servers):
+        searched.append(clock.now)
+        return {server.id: LatencyResult() for server in servers}
+
+    monitor = make_monitor(test_servers, failure_rate=1.0)
+    monitor.samples = monitor.min_samples
+    monitor.probe = lambda: None
+    for clock.now in range(0, 900, 30):
+        monitor._check(threading.Event())
+    assert searched == [0, 120, 360, 660]
+
+    monitor.failure_rate, monitor.latency = 0.0, 100
+    monitor.probe = lambda: 100
+    monitor._check(threading.Event())
+    assert monitor._search_delay == monitor.search_cooldown
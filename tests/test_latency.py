@@ -0,0 +1,72 @@
+import socket
+import threading
+
+import pytest
+
+from core.latency import LatencyResult, LatencyTester
+from core.store import ServerInfo
+
+
+@pytest.fixture
+def listener():
+    server = socket.create_server(("127.0.0.1", 0))
+    stop = threading.Event()
+
+    def serve() -> None:
+        server.settimeout(0.05)
+        while not stop.is_set():
+            try:
+                conn, _ = server.accept()
+            except TimeoutError:
+                continue
+            with conn:
+                conn.sendall(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield server.getsockname()[1]
+    stop.set()
+    thread.join(5)
+    server.close()
+
+
+@pytest.fixture
+def closed_port():
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        return server.getsockname()[1]
+
+
+def test_tcp_ping_measures_loopback(listener):
+    ms = LatencyTester(timeout=2.0).tcp_ping("127.0.0.1", listener)
+
+    assert ms is not None and 0 <= ms < 2000
+
+
+def test_tcp_ping_closed_port(closed_port):
+    assert LatencyTester(timeout=0.5).tcp_ping("127.0.0.1", closed_port) is None
+
+
+def test_tls_ping_fails_against_plain_tcp(listener):
+    assert LatencyTester(timeout=2.0).tls_ping("127.0.0.1", listener) is None
+
+
+def test_failed_handshake_hides_the_tcp_time(listener):
+    tester = LatencyTester(timeout=2.0)
+
+    result = tester.test(ServerInfo("s", "S", "", "127.0.0.1", listener, tls=True))
+    assert result.tcp is not None
+    assert result.tls_failed
+    assert result.ms is None
+
+    plain = tester.test(ServerInfo("s", "S", "", "127.0.0.1", listener))
+    assert not plain.tls_failed
+    assert plain.ms == plain.tcp
+
+
+def test_closed_port_has_no_latency(closed_port):
+    assert LatencyTester(timeout=0.5).test(ServerInfo("s", "S", "", "127.0.0.1", closed_port, tls=True)).ms is None
+
+
+def test_url_result_wins():
+    assert LatencyResult(tcp=5, url=120, tls_failed=True).ms == 120
+    assert LatencyResult(tcp=5, tls=9).ms == 9
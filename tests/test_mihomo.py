@@ -0,0 +1,137 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.mihomo import MihomoController, MihomoError
+
+SECRET = "s3cret"
+CONNECTIONS = {"connections": [{}, {}], "uploadTotal": 10, "downloadTotal": 20}
+
+
+class MockController(BaseHTTPRequestHandler):
+    requests: list[dict] = []
+    responses: dict[tuple[str, str], tuple[int, bytes]] = {}
+
+    def _handle(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.requests.append(
+            {
+                "method": self.command,
+                "path": self.path,
+                "authorization": self.headers.get("Authorization"),
+                "body": json.loads(body) if body else None,
+            }
+        )
+
+        if self.headers.get("Authorization") != f"Bearer {SECRET}":
+            status, data = 401, b'{"message": "Unauthorized"}'
+        else:
+            status, data = self.responses.get((self.command, self.path.split("?")[0]), (204, b""))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_PUT = do_PATCH = _handle
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def controller():
+    MockController.requests = []
+    MockController.responses = {
+        ("GET", "/version"): (200, b'{"version": "v1.19.0"}'),
+        ("GET", "/configs"): (200, json.dumps({"mode": "rule", "tun": {"enable": True}}).encode()),
+        ("GET", "/connections"): (200, json.dumps(CONNECTIONS).encode()),
+        ("GET", "/memory"): (200, b'{"inuse": 4096, "oslimit": 0}\n{"inuse": 8192, "oslimit": 0}\n'),
+    }
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockController)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def address(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"{host}:{port}"
+
+
+def test_sends_bearer_secret(controller):
+    assert MihomoController(address(controller), SECRET).available()
+    assert MockController.requests[-1]["authorization"] == f"Bearer {SECRET}"
+
+
+def test_wrong_secret_fails(controller):
+    client = MihomoController(address(controller), "wrong")
+
+    assert not client.available()
+    with pytest.raises(MihomoError):
+        client.disable_tun()
+
+
+def test_reload_puts_config_payload(controller, tmp_path):
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("mixed-port: 7890\ntun:\n  enable: true\n", encoding="utf-8")
+
+    MihomoController(address(controller), SECRET).reload(str(config_path))
+
+    request = MockController.requests[-1]
+    assert request["method"] == "PUT"
+    assert request["path"] == "/configs?force=true"
+    assert request["body"] == {"path": "", "payload": "mixed-port: 7890\ntun:\n  enable: true\n"}
+
+
+def test_reload_missing_config(controller, tmp_path):
+    with pytest.raises(MihomoError):
+        MihomoController(address(controller), SECRET).reload(str(tmp_path / "missing.yaml"))
+    assert MockController.requests == []
+
+
+def test_disable_tun_patches_configs(controller):
+    MihomoController(address(controller), SECRET).disable_tun()
+
+    request = MockController.requests[-1]
+    assert request["method"] == "PATCH"
+    assert request["path"] == "/configs"
+    assert request["body"] == {"tun": {"enable": False}}
+
+
+def test_status(controller):
+    status = MihomoController(address(controller), SECRET).status()
+
+    assert status == {
+        "mode": "rule",
+        "tun": True,
+        "connections": 2,
+        "upload": 10,
+        "download": 20,
+        "memory": 4096,
+    }
+
+
+def test_status_without_memory(controller):
+    MockController.responses[("GET", "/memory")] = (404, b"")
+
+    assert MihomoController(address(controller), SECRET).status()["memory"] is None
+
+
+def test_status_invalid_json(controller):
+    MockController.responses[("GET", "/configs")] = (200, b"not json")
+
+    with pytest.raises(MihomoError):
+        MihomoController(address(controller), SECRET).status()
+
+
+def test_unreachable_controller():
+    with ThreadingHTTPServer(("127.0.0.1", 0), MockController) as server:
+        unused = address(server)
+
+    assert not MihomoController(unused, SECRET, timeout=0.5).available()
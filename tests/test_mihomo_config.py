@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from core.mihomo_config import TunConfigBuilder
+
+
+@pytest.fixture
+def builder(tmp_path):
+    (tmp_path / "seed").mkdir()
+    (tmp_path / "home").mkdir()
+    return TunConfigBuilder(
+        str(tmp_path / "home"),
+        str(tmp_path / "seed"),
+        str(tmp_path / "source.yaml"),
+        str(tmp_path / "overrides.yaml"),
+        "test",
+    )
+
+
+def write(path, data: bytes, mtime: float) -> None:
+    path.write_bytes(data)
+    os.utime(path, (mtime, mtime))
+
+
+def test_seed_copies_missing_and_updated_geodata(builder, tmp_path):
+    seed, home = tmp_path / "seed", tmp_path / "home"
+    write(seed / "geoip.dat", b"new geoip", 2_000_000)
+    write(seed / "geosite.dat", b"new geosite", 2_000_000)
+    write(seed / "readme.txt", b"ignored", 2_000_000)
+    write(home / "geoip.dat", b"old", 1_000_000)
+
+    builder.seed()
+
+    assert (home / "geoip.dat").read_bytes() == b"new geoip"
+    assert (home / "geosite.dat").read_bytes() == b"new geosite"
+    assert not (home / "readme.txt").exists()
+
+
+def test_seed_keeps_newer_or_identical_targets(builder, tmp_path):
+    seed, home = tmp_path / "seed", tmp_path / "home"
+    write(seed / "geoip.dat", b"bundled", 1_000_000)
+    write(home / "geoip.dat", b"auto-updated by mihomo", 2_000_000)
+    write(seed / "country.mmdb", b"same", 1_000_000)
+    write(home / "country.mmdb", b"same", 1_000_000)
+
+    builder.seed()
+
+    assert (home / "geoip.dat").read_bytes() == b"auto-updated by mihomo"
+    assert os.stat(home / "country.mmdb").st_mtime == 1_000_000
+
+
+def test_seed_repairs_truncated_copy(builder, tmp_path):
+    seed, home = tmp_path / "seed", tmp_path / "home"
+    write(seed / "geosite.dat", b"complete file", 1_000_000)
+    write(home / "geosite.dat", b"compl", 1_000_000)
+
+    builder.seed()
+
+    assert (home / "geosite.dat").read_bytes() == b"complete file"
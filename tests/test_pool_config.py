@@ -0,0 +1,110 @@
+import pytest
+
+from core.config import POOL_BALANCER_TAG, POOL_OUTBOUND_PREFIX, ConfigManager
+from core.store import server_id
+
+
+def make_config(address: str, rules: list[dict] | None = None) -> dict:
+    return {
+        "remarks": address,
+        "inbounds": [{"tag": "socks", "protocol": "socks", "port": 2080}],
+        "outbounds": [
+            {
+                "tag": "proxy",
+                "protocol": "vless",
+                "settings": {"vnext": [{"address": address, "port": 443, "users": [{"id": "u"}]}]},
+            },
+            {"tag": "direct", "protocol": "freedom"},
+            {"tag": "block", "protocol": "blackhole"},
+        ],
+        "routing": {"rules": rules or []},
+    }
+
+
+def test_outbound_tags():
+    configs = [make_config("a.example"), make_config("b.example"), make_config("c.example")]
+
+    pool = ConfigManager.build_pool_config(configs)
+
+    tags = [outbound["tag"] for outbound in pool["outbounds"]]
+    assert tags == [
+        f"{POOL_OUTBOUND_PREFIX}0",
+        f"{POOL_OUTBOUND_PREFIX}1",
+        f"{POOL_OUTBOUND_PREFIX}2",
+        "direct",
+        "block",
+    ]
+    addresses = [outbound["settings"]["vnext"][0]["address"] for outbound in pool["outbounds"][:3]]
+    assert addresses == ["a.example", "b.example", "c.example"]
+    assert pool["pool"] == {"strategy": "leastPing", "servers": [server_id(config) for config in configs]}
+
+
+def test_balancer_and_default_rule():
+    pool = ConfigManager.build_pool_config([make_config("a.example"), make_config("b.example")])
+
+    assert pool["routing"]["balancers"] == [
+        {
+            "tag": POOL_BALANCER_TAG,
+            "selector": [POOL_OUTBOUND_PREFIX],
+            "strategy": {"type": "leastPing"},
+            "fallbackTag": f"{POOL_OUTBOUND_PREFIX}0",
+        }
+    ]
+    assert pool["routing"]["rules"][-1] == {"type": "field", "network": "tcp,udp", "balancerTag": POOL_BALANCER_TAG}
+
+
+def test_rules_targeting_proxy_use_balancer():
+    rules = [
+        {"type": "field", "domain": ["example.com"], "outboundTag": "proxy"},
+        {"type": "field", "ip": ["geoip:private"], "outboundTag": "direct"},
+    ]
+
+    pool = ConfigManager.build_pool_config([make_config("a.example", rules), make_config("b.example")])
+
+    assert pool["routing"]["rules"][0] == {"type": "field", "domain": ["example.com"], "balancerTag": POOL_BALANCER_TAG}
+    assert pool["routing"]["rules"][1]["outboundTag"] == "direct"
+
+
+def test_least_ping_observatory():
+    pool = ConfigManager.build_pool_config(
+        [make_config("a.example"), make_config("b.example")], probe_url="http://probe.test/204", probe_interval="30s"
+    )
+
+    assert pool["observatory"] == {
+        "subjectSelector": [POOL_OUTBOUND_PREFIX],
+        "probeUrl": "http://probe.test/204",
+        "probeInterval": "30s",
+        "enableConcurrency": True,
+    }
+    assert "burstObservatory" not in pool
+
+
+def test_least_load_burst_observatory():
+    pool = ConfigManager.build_pool_config([make_config("a.example"), make_config("b.example")], "leastLoad")
+
+    assert pool["routing"]["balancers"][0]["strategy"] == {"type": "leastLoad"}
+    assert pool["burstObservatory"]["subjectSelector"] == [POOL_OUTBOUND_PREFIX]
+    assert pool["burstObservatory"]["pingConfig"]["destination"] == "https://www.gstatic.com/generate_204"
+    assert "observatory" not in pool
+
+
+def test_input_configs_are_not_modified():
+    configs = [make_config("a.example", [{"type": "field", "port": "53", "outboundTag": "proxy"}])]
+
+    ConfigManager.build_pool_config(configs)
+
+    assert configs[0]["routing"]["rules"][0]["outboundTag"] == "proxy"
+    assert configs[0]["outbounds"][0]["tag"] == "proxy"
+
+
+def test_rejects_unknown_strategy():
+    with pytest.raises(ValueError):
+        ConfigManager.build_pool_config([make_config("a.example")], "random")
+
+
+def test_rejects_pool_without_proxies():
+    config = make_config("a.example")
+    config["outbounds"] = config["outbounds"][1:]
+
+    with pytest.raises(ValueError):
+        ConfigManager.build_pool_config([config])
@@ -0,0 +1,43 @@
+import time
+
+from core.resolver import EndpointResolver
+
+
+def make_resolver(tmp_path, answers: list[list[str]], servers: list[str] | None = None) -> EndpointResolver:
+    resolver = EndpointResolver(
+        str(tmp_path / "endpoints.json"), ["https://doh.example/dns-query"] if servers is None else servers
+    )
+    queue = iter(answers)
+    resolver._query = lambda server, host: (next(queue), 300)
+    return resolver
+
+
+def test_rotated_answers_keep_the_pin(tmp_path):
+    resolver = make_resolver(tmp_path, [["10.0.0.1", "10.0.0.2"], ["10.0.0.2", "10.0.0.1"], ["10.0.0.3", "10.0.0.1"]])
+
+    assert resolver.refresh({"a.example"}) == {"a.example"}
+    assert resolver.lookup("a.example") == "10.0.0.1"
+
+    resolver._cache["a.example"]["expires"] = time.time()
+    assert resolver.refresh({"a.example"}) == set()
+    assert resolver.lookup("a.example") == "10.0.0.1"
+
+    resolver._cache["a.example"]["expires"] = time.time()
+    assert resolver.refresh({"a.example"}) == set()
+    assert resolver.lookup("a.example") == "10.0.0.1"
+
+
+def test_pin_moves_when_it_leaves_the_answer_set(tmp_path):
+    resolver = make_resolver(tmp_path, [["10.0.0.1", "10.0.0.2"], ["10.0.0.3", "10.0.0.2"]])
+    resolver.refresh({"a.example"})
+
+    resolver._cache["a.example"]["expires"] = time.time()
+    assert resolver.refresh({"a.example"}) == {"a.example"}
+    assert resolver.lookup("a.example") == "10.0.0.3"
+
+
+def test_no_servers(tmp_path):
+    resolver = make_resolver(tmp_path, [], servers=[])
+
+    assert resolver.resolve("a.example") is None
+    assert resolver.refresh({"a.example"}) == set()
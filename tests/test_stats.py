@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from core.config import ConfigManager
+from core.stats import StatsCollector
+
+
+class Metrics(BaseHTTPRequestHandler):
+    stats: dict = {}
+
+    def do_GET(self) -> None:
+        if self.path != "/debug/vars":
+            self.send_error(404)
+            return
+        body = json.dumps({"cmdline": ["xray"], "stats": Metrics.stats}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def metrics():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Metrics)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield f"127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def counters(proxy: tuple[int, int], direct: tuple[int, int]) -> dict:
+    return {
+        "inbound": {"socks": {"uplink": 5, "downlink": 5}},
+        "outbound": {
+            "proxy": {"uplink": proxy[0], "downlink": proxy[1]},
+            "direct": {"uplink": direct[0], "downlink": direct[1]},
+            "api": {"uplink": 999, "downlink": 999},
+            "metrics": {"uplink": 999, "downlink": 999},
+        },
+    }
+
+
+def test_rates_from_metrics_endpoint(metrics, monkeypatch):
+    collector = StatsCollector(metrics)
+    clock = iter([100.0, 102.0])
+    monkeypatch.setattr("core.stats.time", SimpleNamespace(monotonic=lambda: next(clock), time=time.time))
+
+    Metrics.stats = counters((1000, 4000), (0, 0))
+    collector.poll()
+    Metrics.stats = counters((3000, 10000), (200, 400))
+    sample = collector.poll()
+
+    assert sample.outbounds == {"proxy": (1000.0, 3000.0), "direct": (100.0, 200.0)}
+    assert (sample.uplink, sample.downlink) == (1100.0, 3200.0)
+    assert list(collector.history) == [sample]
+
+
+def test_unreachable_endpoint_raises(metrics):
+    with pytest.raises(RuntimeError, match="Stats query failed"):
+        StatsCollector("127.0.0.1:1", timeout=0.5).query()
+
+
+def test_metrics_inbound_is_routed(tmp_path):
+    manager = ConfigManager(
+        "test",
+        str(tmp_path / "subscription.txt"),
+        str(tmp_path / "servers.db"),
+        str(tmp_path / "config.json"),
+        str(tmp_path / "tun.yaml"),
+        str(tmp_path / "subscriptions.json"),
+        str(tmp_path / "cache"),
+        api_port=10085,
+        metrics_port=10086,
+    )
+
+    config = manager.build_xray_config({"outbounds": [{"tag": "proxy", "protocol": "vless"}]})
+
+    assert config["metrics"] == {"tag": "metrics"}
+    assert {inbound["tag"]: inbound["port"] for inbound in config["inbounds"]} == {"api": 10085, "metrics": 10086}
+    assert config["routing"]["rules"][:2] == [
+        {"type": "field", "inboundTag": ["api"], "outboundTag": "api"},
+        {"type": "field", "inboundTag": ["metrics"], "outboundTag": "metrics"},
+    ]
@@ -0,0 +1,76 @@
+import json
+import logging
+import threading
+
+from core.config import ConfigManager
+from core.store import ServerStore, server_id
+
+
+def make_config(remark: str, address: str) -> dict:
+    return {
+        "remarks": remark,
+        "outbounds": [
+            {"tag": "proxy", "protocol": "vless", "settings": {"vnext": [{"address": address, "port": 443}]}},
+            {"tag": "direct", "protocol": "freedom"},
+        ],
+    }
+
+
+def test_identical_outbounds_are_logged_and_skipped(tmp_path, caplog):
+    store = ServerStore(str(tmp_path / "servers.db"))
+
+    with caplog.at_level(logging.WARNING, logger="core.store"):
+        infos = store.replace(
+            [make_config("A", "a.example"), make_config("B", "a.example"), make_config("C", "c.example")]
+        )
+
+    assert [info.remark for info in infos] == ["A", "C"]
+    assert [server.remark for server in store.servers()] == ["A", "C"]
+    assert "'B'" in caplog.text and "'A'" in caplog.text
+
+
+def test_concurrent_replace_and_reads(tmp_path):
+    store = ServerStore(str(tmp_path / "servers.db"))
+    batches = [[make_config(f"{i}-{j}", f"{i}-{j}.example") for j in range(20)] for i in range(2)]
+    errors = []
+
+    def writer():
+        for i in range(50):
+            store.replace(batches[i % 2])
+
+    def reader():
+        try:
+            for _ in range(500):
+                servers = store.servers()
+                assert len(servers) in (0, 20)
+                for server in servers[:3]:
+                    store.info(server.id)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer), threading.Thread(target=reader), threading.Thread(target=reader)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+
+def test_pre_store_pool_remarks_are_migrated(tmp_path):
+    configs = [make_config("A", "a.example"), make_config("B", "b.example"), make_config("C", "c.example")]
+    ServerStore(str(tmp_path / "servers.db")).replace(configs)
+    pool = ConfigManager.build_pool_config(configs[:2])
+    pool["pool"]["servers"] = ["A", "B"]
+    (tmp_path / "config.json").write_text(json.dumps(pool), encoding="utf-8")
+
+    manager = ConfigManager(
+        "test",
+        str(tmp_path / "subscription.txt"),
+        str(tmp_path / "servers.db"),
+        str(tmp_path / "config.json"),
+        str(tmp_path / "tun.yaml"),
+        str(tmp_path / "subscriptions.json"),
+        str(tmp_path / "cache"),
+    )
+
+    assert manager.current_pool == [server_id(configs[0]), server_id(configs[1])]
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+from PySide6.QtGui import QIcon
+from PySide6.QtWidgets import QApplication, QWidget
+
+from core.store import ServerInfo
+from ui.tray import Tray
+
+
+class Window(QWidget):
+    def _quit(self) -> None:
+        pass
+
+    def _select_server(self, server_id: str) -> None:
+        pass
+
+
+@pytest.fixture
+def tray():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication([])
+    parent = Window()
+    yield Tray(parent, QIcon())
+    parent.deleteLater()
+    app.processEvents()
+
+
+def menu_texts(tray: Tray) -> list[str]:
+    return [action.text() for action in tray.server_menu.actions() if not action.isSeparator()]
+
+
+def test_placeholder_shown_when_servers_disappear(tray):
+    tray.update_server_menu([ServerInfo("a", "Alpha", "Alpha"), ServerInfo("b", "Beta", "Beta")])
+    assert menu_texts(tray) == ["Alpha", "Beta"]
+
+    tray.update_server_menu([])
+    assert menu_texts(tray) == ["No servers available"]
+
+    tray.update_server_menu([ServerInfo("c", "Gamma", "Gamma")])
+    assert menu_texts(tray) == ["Gamma"]
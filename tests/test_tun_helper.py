@@ -0,0 +1,234 @@
+import os
+import stat
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import uuid
+
+import pytest
+
+from core.tun_helper import (
+    TunHelperClient,
+    TunHelperError,
+    TunHelperServer,
+    controller_arguments,
+    is_admin_only_path,
+    secure_directory,
+)
+from utils.protocol import FrameDecoder, connect_stream, encode_message, local_socket_path
+
+STAND_IN = textwrap.dedent("""
+    import sys
+    import time
+
+    config = sys.argv[sys.argv.index("-f") + 1]
+    print("started", " ".join(sys.argv[1:]), flush=True)
+    with open(config, encoding="utf-8") as f:
+        if "exit" in f.read():
+            sys.exit(3)
+    while True:
+        time.sleep(1)
+    """)
+
+
+def write_executable(directory, source: str) -> str:
+    script = directory / "mihomo.py"
+    script.write_text(source, encoding="utf-8")
+    if os.name == "nt":
+        executable = directory / "mihomo.cmd"
+        executable.write_text(f'@"{sys.executable}" "{script}" %*\r\n', encoding="utf-8")
+    else:
+        executable = directory / "mihomo"
+        executable.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n', encoding="utf-8")
+        executable.chmod(0o755)
+    return str(executable)
+
+
+def wait_for(predicate, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture(autouse=True)
+def no_window(monkeypatch):
+    monkeypatch.setattr(subprocess, "CREATE_NO_WINDOW", getattr(subprocess, "CREATE_NO_WINDOW", 0), raising=False)
+
+
+@pytest.fixture
+def helper(tmp_path):
+    directory = str(tmp_path / "helper")
+    secure_directory(directory)
+    server = TunHelperServer(f"tun-helper-{uuid.uuid4().hex[:8]}", write_executable(tmp_path, STAND_IN), directory)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join(5)
+
+
+def test_controller_arguments():
+    assert controller_arguments({}) == []
+    assert controller_arguments({"controller": "127.0.0.1:9097", "secret": "abc_DEF-1"}) == [
+        "-ext-ctl",
+        "127.0.0.1:9097",
+        "-secret",
+        "abc_DEF-1",
+    ]
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        {"controller": "0.0.0.0:9097", "secret": "abc"},
+        {"controller": "192.168.1.2:9097", "secret": "abc"},
+        {"controller": "127.0.0.1:port", "secret": "abc"},
+        {"controller": "127.0.0.1:9097", "secret": ""},
+        {"controller": "127.0.0.1:9097", "secret": "abc -d C:\\"},
+    ],
+)
+def test_controller_arguments_rejects(args):
+    with pytest.raises((TunHelperError, ValueError)):
+        controller_arguments(args)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="the pipe DACL is checked on Windows only")
+def test_endpoint_and_directory_are_owner_only(helper):
+    assert stat.S_IMODE(os.stat(local_socket_path(helper.pipe_name)).st_mode) & 0o077 == 0
+    assert stat.S_IMODE(os.stat(helper.directory).st_mode) == 0o700
+
+
+def test_framing_handles_batched_and_split_messages(helper):
+    first = encode_message({"id": 1, "command": "ping"})
+    second = encode_message({"id": 2, "command": "status"})
+
+    decoder = FrameDecoder()
+    messages: list[dict] = []
+    stream = connect_stream(helper.pipe_name, 5)
+    try:
+        stream.write(first + second[:3])
+        time.sleep(0.1)
+        stream.write(second[3:])
+        while len(messages) < 2:
+            messages.extend(decoder.feed(stream.read(65536)))
+    finally:
+        stream.close()
+
+    assert [message["id"] for message in messages] == [1, 2]
+    assert messages[1]["result"] == {"running": False}
+
+
+def test_rejects_oversized_frame(helper):
+    stream = connect_stream(helper.pipe_name, 5)
+    try:
+        stream.write((64 * 1024 * 1024).to_bytes(4, "big"))
+        assert stream.read(1) == b""
+    finally:
+        stream.close()
+
+
+def test_unknown_command_and_bad_arguments(helper):
+    client = TunHelperClient(helper.pipe_name, "task")
+
+    with pytest.raises(TunHelperError, match="Unknown command"):
+        client.request("format")
+    with pytest.raises(TunHelperError, match="Invalid arguments"):
+        client.request("start")
+    with pytest.raises(TunHelperError, match="Invalid arguments"):
+        client.request("start", config=["mode: rule"])
+    with pytest.raises(TunHelperError, match="loopback"):
+        client.request("start", config="mode: rule\n", controller="10.0.0.1:9097", secret="abc")
+
+
+def test_start_reload_stop(helper):
+    config_path = os.path.join(helper.directory, "config.yaml")
+    client = TunHelperClient(helper.pipe_name, "task")
+    lines: list[str] = []
+    exits: list[int | None] = []
+
+    assert client.available()
+    client.subscribe(lines.append, exits.append)
+    started = client.request("start", config="mixed-port: 7890\n")
+    assert wait_for(lambda: lines)
+    assert lines[0] == f"started -d {helper.directory} -f {config_path}"
+    assert client.request("status") == {"running": True}
+    assert client.request("start", config="mixed-port: 7890\n") == started
+
+    reloaded = client.request("reload", config="mixed-port: 7891\n")
+    assert reloaded["pid"] != started["pid"]
+    assert wait_for(lambda: len(lines) == 2)
+    with open(config_path, encoding="utf-8") as f:
+        assert f.read() == "mixed-port: 7891\n"
+
+    client.request("stop")
+    assert client.request("status")["running"] is False
+    assert exits == []
+
+
+def test_start_ignores_client_paths(helper, tmp_path):
+    client = TunHelperClient(helper.pipe_name, "task")
+    lines: list[str] = []
+
+    client.subscribe(lines.append, lambda returncode: None)
+    client.request("start", config="mode: rule\n", home=str(tmp_path), path=str(tmp_path / "evil.yaml"))
+
+    assert wait_for(lambda: lines)
+    assert lines[0] == f"started -d {helper.directory} -f {os.path.join(helper.directory, 'config.yaml')}"
+    assert not (tmp_path / "evil.yaml").exists()
+    client.request("stop")
+
+
+def test_exit_is_delivered_once(helper):
+    client = TunHelperClient(helper.pipe_name, "task")
+    exits: list[int | None] = []
+
+    client.subscribe(lambda line: None, exits.append)
+    client.request("start", config="exit\n")
+    assert wait_for(lambda: exits)
+    helper.shutdown()
+    time.sleep(1.0)
+
+    assert exits == [3]
+
+
+def test_connection_loss_reports_unknown_exit(helper):
+    client = TunHelperClient(helper.pipe_name, "task")
+    exits: list[int | None] = []
+
+    client.subscribe(lambda line: None, exits.append)
+    helper.shutdown()
+
+    assert wait_for(lambda: exits)
+    assert exits == [None]
+
+
+def test_client_without_helper():
+    client = TunHelperClient(f"tun-helper-{uuid.uuid4().hex[:8]}", "task")
+
+    assert not client.available()
+    with pytest.raises(TunHelperError):
+        client.request("ping")
+
+
+def test_refuses_script_and_user_writable_task_targets(tmp_path, monkeypatch):
+    monkeypatch.setenv("ProgramFiles", str(tmp_path / "Program Files"))
+    monkeypatch.delenv("ProgramFiles(x86)", raising=False)
+    monkeypatch.delenv("ProgramW6432", raising=False)
+    installed = tmp_path / "Program Files" / "XrayGUI"
+
+    assert is_admin_only_path(str(installed / "XrayGUI.exe"))
+    assert not is_admin_only_path(str(tmp_path / "Downloads" / "XrayGUI" / "XrayGUI.exe"))
+    assert not is_admin_only_path(str(tmp_path / "Program Files"))
+
+    def client(command: list[str], bin_dir) -> TunHelperClient:
+        return TunHelperClient("tun-helper", "task", command, [str(bin_dir)])
+
+    assert client([str(installed / "XrayGUI.exe"), "--tun-helper"], installed / "_internal" / "bin").is_safe()
+    assert not client([sys.executable, str(installed / "app.py"), "--tun-helper"], installed / "bin").is_safe()
+    assert not client([str(installed / "XrayGUI.exe"), "--tun-helper"], tmp_path / "bin").is_safe()
+    assert not client([str(tmp_path / "XrayGUI.exe"), "--tun-helper"], installed / "bin").is_safe()
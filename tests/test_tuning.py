@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from core.store import ServerInfo
+from core.tuning import TuningManager
+
+SERVER = ServerInfo("s1", "Server", "group")
+
+
+def make_config(flow: str = "", rules: list[dict] | None = None) -> dict:
+    return {
+        "outbounds": [
+            {
+                "tag": "proxy",
+                "protocol": "vless",
+                "settings": {"vnext": [{"address": "a.example", "port": 443, "users": [{"id": "u", "flow": flow}]}]},
+            },
+            {"tag": "direct", "protocol": "freedom"},
+        ],
+        "routing": {"rules": rules or []},
+    }
+
+
+@pytest.fixture
+def manager(tmp_path):
+    path = tmp_path / "tuning.json"
+    profiles = {"fast": {"sockopt": {"tcpNoDelay": True}}, "mux": {"mux": {"enabled": True, "concurrency": 8}}}
+    path.write_text(json.dumps({"profiles": profiles, "default": "fast"}), encoding="utf-8")
+    return TuningManager(str(path))
+
+
+def test_profile_is_applied(manager):
+    tuned = manager.apply(make_config(), SERVER)
+
+    assert tuned["tuning"] == "fast"
+    assert tuned["outbounds"][0]["streamSettings"]["sockopt"] == {"tcpNoDelay": True}
+    assert "streamSettings" not in tuned["outbounds"][1]
+
+
+def test_errors_already_in_the_config_do_not_reject_the_profile(manager):
+    config = make_config(rules=[{"type": "field", "domain": ["example.com"], "outboundTag": "missing"}])
+
+    tuned = manager.apply(config, SERVER)
+
+    assert tuned["tuning"] == "fast"
+
+
+def test_errors_introduced_by_the_profile_reject_it(manager):
+    manager.assign("mux", server_id=SERVER.id)
+    config = make_config(flow="xtls-rprx-vision", rules=[{"type": "field", "outboundTag": "missing"}])
+
+    assert manager.apply(config, SERVER) is config
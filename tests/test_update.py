@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from config import GITHUB_RELEASES_PAGE
+from utils.update import UpdateChecker, is_newer_version
+
+ETAG = '"release-1"'
+RELEASE = {
+    "tag_name": "v2.1.0",
+    "assets": [
+        {"name": "XrayGUI.zip", "browser_download_url": "https://example.test/XrayGUI.zip"},
+        {"name": "XrayGUI.exe", "browser_download_url": "https://example.test/XrayGUI.exe"},
+    ],
+}
+
+
+class Releases(BaseHTTPRequestHandler):
+    requests: list[dict] = []
+    delay: float = 0.0
+    status: int = 200
+
+    def do_GET(self) -> None:
+        Releases.requests.append(dict(self.headers))
+        time.sleep(Releases.delay)
+        if Releases.status != 200:
+            self._reply(Releases.status, b"", {"X-RateLimit-Reset": str(int(time.time()) + 600)})
+        elif self.headers.get("If-None-Match") == ETAG:
+            self._reply(304, b"", {"ETag": ETAG})
+        else:
+            self._reply(200, json.dumps(RELEASE).encode(), {"ETag": ETAG})
+
+    def _reply(self, status: int, body: bytes, headers: dict[str, str]) -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def api_url():
+    Releases.requests, Releases.delay, Releases.status = [], 0.0, 200
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Releases)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/repos/strohsnow/XrayGUI/releases/latest"
+    server.shutdown()
+    server.server_close()
+
+
+def test_parses_release(api_url, tmp_path):
+    checker = UpdateChecker(api_url, str(tmp_path / "update.json"))
+
+    assert checker.check() == ("2.1.0", "https://example.test/XrayGUI.exe")
+    assert Releases.requests[0]["Accept"] == "application/vnd.github+json"
+    assert "If-None-Match" not in Releases.requests[0]
+
+
+def test_revalidates_with_etag(api_url, tmp_path):
+    checker = UpdateChecker(api_url, str(tmp_path / "update.json"))
+    checker.check()
+
+    assert checker.check(force=True) == ("2.1.0", "https://example.test/XrayGUI.exe")
+    assert Releases.requests[1]["If-None-Match"] == ETAG
+
+
+def test_cache_skips_requests_until_interval(api_url, tmp_path):
+    cache_path = str(tmp_path / "update.json")
+    UpdateChecker(api_url, cache_path).check()
+
+    assert UpdateChecker(api_url, cache_path).check() == ("2.1.0", "https://example.test/XrayGUI.exe")
+    assert len(Releases.requests) == 1
+
+    UpdateChecker(api_url, cache_path, interval=0).check()
+    assert len(Releases.requests) == 1
+
+    with open(cache_path, encoding="utf-8") as f:
+        cache = json.load(f)
+    cache["next_check"] = 0
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    UpdateChecker(api_url, cache_path).check()
+    assert len(Releases.requests) == 2
+
+
+def test_cache_ignored_for_other_url(api_url, tmp_path):
+    cache_path = str(tmp_path / "update.json")
+    UpdateChecker(api_url, cache_path).check()
+
+    UpdateChecker(f"{api_url}?other", cache_path).check()
+    assert len(Releases.requests) == 2
+
+
+def test_rate_limit_defers_next_check(api_url, tmp_path):
+    Releases.status = 403
+    cache_path = str(tmp_path / "update.json")
+
+    assert UpdateChecker(api_url, cache_path).check() == (None, GITHUB_RELEASES_PAGE)
+    UpdateChecker(api_url, cache_path).check()
+    assert len(Releases.requests) == 1
+
+
+def test_timeout_returns_cached_release(api_url, tmp_path):
+    cache_path = str(tmp_path / "update.json")
+    UpdateChecker(api_url, cache_path).check()
+    Releases.delay = 1.0
+
+    start = time.monotonic()
+    result = UpdateChecker(api_url, cache_path, timeout=0.2).check(force=True)
+
+    assert result == ("2.1.0", "https://example.test/XrayGUI.exe")
+    assert time.monotonic() - start < 1.0
+
+
+def test_unreachable_without_cache(tmp_path):
+    with ThreadingHTTPServer(("127.0.0.1", 0), Releases) as server:
+        url = f"http://127.0.0.1:{server.server_address[1]}/latest"
+
+    assert UpdateChecker(url, str(tmp_path / "update.json"), timeout=0.5).check() == (None, GITHUB_RELEASES_PAGE)
+
+
+def test_is_newer_version():
+    assert is_newer_version("2.0.0", "2.1.0")
+    assert not is_newer_version("2.1.0", "2.1.0")
+    assert not is_newer_version("2.1.0", "not a version")
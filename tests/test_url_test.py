@@ -0,0 +1,142 @@
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.url_test import UrlTester, UrlTestError
+
+STUB_CORE = textwrap.dedent("""
+    import json
+    import sys
+    import threading
+    import urllib.request
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    with open(sys.argv[sys.argv.index("-c") + 1], encoding="utf-8") as f:
+        config = json.load(f)
+    outbounds = {outbound["tag"]: outbound for outbound in config["outbounds"]}
+    routes = {rule["inboundTag"][0]: outbounds[rule["outboundTag"]] for rule in config["routing"]["rules"]}
+
+
+    def make_handler(outbound):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                address = outbound["settings"]["vnext"][0]["address"]
+                if address == "dead.invalid":
+                    self.send_error(502)
+                    return
+                with urllib.request.urlopen(self.path, timeout=5) as response:
+                    status = response.status
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+    servers = []
+    for inbound in config["inbounds"]:
+        handler = make_handler(routes[inbound["tag"]])
+        servers.append(ThreadingHTTPServer((inbound["listen"], inbound["port"]), handler))
+    for server in servers[1:]:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    servers[0].serve_forever()
+    """)
+FAILING_CORE = 'import sys\nprint("Failed to start: app/proxyman/inbound: address already in use")\nsys.exit(23)\n'
+
+
+class Target(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self) -> None:
+        Target.hits += 1
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def write_core(directory, source: str) -> str:
+    script = directory / "core.py"
+    script.write_text(source, encoding="utf-8")
+    if os.name == "nt":
+        executable = directory / "core.cmd"
+        executable.write_text(f'@"{sys.executable}" "{script}" %*\r\n', encoding="utf-8")
+    else:
+        executable = directory / "core"
+        executable.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n', encoding="utf-8")
+        executable.chmod(0o755)
+    return str(executable)
+
+
+def server_config(address: str) -> dict:
+    return {
+        "outbounds": [
+            {"tag": "proxy", "protocol": "vless", "settings": {"vnext": [{"address": address, "port": 443}]}},
+            {"tag": "direct", "protocol": "freedom"},
+        ]
+    }
+
+
+@pytest.fixture(autouse=True)
+def no_window(monkeypatch):
+    monkeypatch.setattr(subprocess, "CREATE_NO_WINDOW", getattr(subprocess, "CREATE_NO_WINDOW", 0), raising=False)
+
+
+@pytest.fixture
+def target():
+    Target.hits = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Target)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/generate_204"
+    server.shutdown()
+    server.server_close()
+
+
+def test_build_config_routes_each_inbound_to_its_outbound():
+    tester = UrlTester("xray")
+    outbounds = [server_config("a.example")["outbounds"][0], server_config("b.example")["outbounds"][0]]
+
+    config = tester.build_config(outbounds, [20001, 20002])
+
+    assert [inbound["port"] for inbound in config["inbounds"]] == [20001, 20002]
+    assert [outbound["tag"] for outbound in config["outbounds"]] == ["test-out-0", "test-out-1"]
+    assert config["routing"]["rules"][1] == {"type": "field", "inboundTag": ["test-in-1"], "outboundTag": "test-out-1"}
+
+
+def test_measures_each_server_through_the_core(tmp_path, target):
+    tester = UrlTester(write_core(tmp_path, STUB_CORE), url=target, timeout=5.0, startup_timeout=10.0)
+
+    results = tester.test_all(
+        {
+            "alive": server_config("a.example"),
+            "dead": server_config("dead.invalid"),
+            "service-only": {"outbounds": [{"tag": "direct", "protocol": "freedom"}]},
+        }
+    )
+
+    assert results["alive"].url is not None
+    assert results["dead"].url is None
+    assert results["service-only"].url is None
+    assert Target.hits == 1
+
+
+def test_core_start_failure_is_reported(tmp_path, target):
+    tester = UrlTester(write_core(tmp_path, FAILING_CORE), url=target, startup_timeout=5.0, start_attempts=2)
+
+    with pytest.raises(UrlTestError, match="address already in use"):
+        tester.test_all({"alive": server_config("a.example")})
+    assert Target.hits == 0
+
+
+def test_missing_core_is_reported(tmp_path):
+    with pytest.raises(UrlTestError):
+        UrlTester(str(tmp_path / "missing")).test_all({"alive": server_config("a.example")})
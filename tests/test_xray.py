@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from core.xray import XrayManager
+
+
+def make_config(address: str) -> dict:
+    return {
+        "outbounds": [
+            {"tag": "proxy", "protocol": "vless", "settings": {"vnext": [{"address": address, "port": 443}]}},
+            {"tag": "direct", "protocol": "freedom"},
+        ],
+        "routing": {
+            "domainStrategy": "IPIfNonMatch",
+            "rules": [
+                {"type": "field", "domain": ["example.com"], "outboundTag": "proxy"},
+                {"type": "field", "ip": ["geoip:private"], "outboundTag": "direct"},
+            ],
+        },
+    }
+
+
+class FakeXray(XrayManager):
+    def __init__(self, failing: set[str] | None = None) -> None:
+        super().__init__("xray", "config.json", ".", None, api_address="127.0.0.1:10085")
+        self.calls: list[tuple] = []
+        self.failing: set[str] = failing or set()
+
+    def is_running(self) -> bool:
+        return True
+
+    def _api(self, command: str, *args: str) -> bool:
+        if args and args[-1].endswith(".json"):
+            with open(args[-1], encoding="utf-8") as f:
+                args = (*args[:-1], json.load(f))
+        self.calls.append((command, *args))
+        return command not in self.failing
+
+
+def test_switch_adds_new_outbound_before_removing_old():
+    xray = FakeXray()
+
+    assert xray.switch_outbound(make_config("b.example"))
+
+    assert [call[0] for call in xray.calls] == ["ado", "adrules", "rmo"]
+    (added,) = xray.calls[0][1]["outbounds"]
+    assert added["tag"] == "proxy-swap"
+    assert added["settings"]["vnext"][0]["address"] == "b.example"
+
+    routing = xray.calls[1][1]["routing"]
+    assert routing["domainStrategy"] == "IPIfNonMatch"
+    assert [rule["outboundTag"] for rule in routing["rules"]] == ["proxy-swap", "direct", "proxy-swap"]
+    assert routing["rules"][-1]["network"] == "tcp,udp"
+    assert xray.calls[2] == ("rmo", "proxy")
+
+
+def test_switch_alternates_tags():
+    xray = FakeXray()
+    assert xray.switch_outbound(make_config("b.example"))
+    xray.calls.clear()
+
+    assert xray.switch_outbound(make_config("c.example"))
+
+    assert xray.calls[0][1]["outbounds"][0]["tag"] == "proxy"
+    assert xray.calls[1][1]["routing"]["rules"][0]["outboundTag"] == "proxy"
+    assert xray.calls[2] == ("rmo", "proxy-swap")
+
+
+@pytest.mark.parametrize(("failing", "expected"), [({"ado"}, ["ado"]), ({"adrules"}, ["ado", "adrules", "rmo"])])
+def test_failed_switch_keeps_the_old_outbound(failing, expected):
+    xray = FakeXray(failing)
+
+    assert not xray.switch_outbound(make_config("b.example"))
+
+    assert [call[0] for call in xray.calls] == expected
+    if "rmo" in expected:
+        assert xray.calls[-1] == ("rmo", "proxy-swap")
+    xray.failing.clear()
+    xray.calls.clear()
+    assert xray.switch_outbound(make_config("b.example"))
+    assert xray.calls[-1] == ("rmo", "proxy")